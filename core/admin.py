@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Utilisateur, Client, Animal, Reservation, Categorie, Fournisseur, Produit, Log, RapportEnvoye
+from .models import Utilisateur, Client, Animal, Reservation, Categorie, Fournisseur, Produit, Log, RapportEnvoye, PageViewCount, Facture, LigneFacture, Vente, LigneVente, StockAlert, MetricRollup
 
 admin.site.register(Utilisateur)
 admin.site.register(Client)
@@ -10,3 +10,10 @@ admin.site.register(Fournisseur)
 admin.site.register(Produit)
 admin.site.register(Log)
 admin.site.register(RapportEnvoye)
+admin.site.register(PageViewCount)
+admin.site.register(Facture)
+admin.site.register(LigneFacture)
+admin.site.register(Vente)
+admin.site.register(LigneVente)
+admin.site.register(StockAlert)
+admin.site.register(MetricRollup)
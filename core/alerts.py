@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .models import Produit, StockAlert
+from .utils import log_expiry_alert, log_stock_alert
+
+# Low-stock threshold of the products and categories without their own
+DEFAULT_STOCK_ALERT_THRESHOLD = 10
+# Products expiring within this many days (or expired) get an expiry alert
+DEFAULT_EXPIRY_ALERT_DAYS = 30
+# Products evaluated per batch by the sweeps
+EVALUATION_BATCH_SIZE = 1000
+
+
+def default_threshold():
+    return getattr(settings, 'STOCK_ALERT_THRESHOLD', DEFAULT_STOCK_ALERT_THRESHOLD)
+
+
+def expiry_limit(today=None):
+    """Last expiry date that raises an alert"""
+    today = today or timezone.localdate()
+    return today + timedelta(days=getattr(settings, 'STOCK_EXPIRY_ALERT_DAYS', DEFAULT_EXPIRY_ALERT_DAYS))
+
+
+def open_alerts(alert_type=None):
+    qs = StockAlert.objects.filter(date_resolution__isnull=True)
+    if alert_type:
+        qs = qs.filter(type=alert_type)
+    return qs
+
+
+def evaluate_products(produit_ids, today=None):
+    """
+    Open the alerts these products now deserve and resolve the ones they no
+    longer do: one read of the products, one of their open alerts, and at
+    most one INSERT and one UPDATE. Returns (opened, resolved).
+    """
+    produit_ids = list(produit_ids)
+    if not produit_ids:
+        return 0, 0
+    limit = expiry_limit(today)
+    fallback = default_threshold()
+
+    rows = Produit.objects.filter(pk__in=produit_ids).values_list(
+        'id', 'nom', 'quantite', 'date_expiration', 'seuil_stock', 'categorie__seuil_stock',
+    )
+    current = {
+        (produit_id, alert_type): alert_id
+        for alert_id, produit_id, alert_type in open_alerts().filter(produit_id__in=produit_ids).values_list('id', 'produit_id', 'type')
+    }
+
+    to_open, wanted = [], set()
+    for produit_id, nom, quantite, date_expiration, seuil, seuil_categorie in rows:
+        seuil = seuil if seuil is not None else seuil_categorie if seuil_categorie is not None else fallback
+        if quantite <= seuil:
+            wanted.add((produit_id, StockAlert.LOW_STOCK))
+            if (produit_id, StockAlert.LOW_STOCK) not in current:
+                to_open.append((nom, StockAlert(produit_id=produit_id, type=StockAlert.LOW_STOCK, quantite=quantite, seuil=seuil)))
+        if date_expiration and date_expiration <= limit:
+            wanted.add((produit_id, StockAlert.EXPIRING))
+            if (produit_id, StockAlert.EXPIRING) not in current:
+                to_open.append((nom, StockAlert(produit_id=produit_id, type=StockAlert.EXPIRING, quantite=quantite,
+                                                date_expiration=date_expiration)))
+
+    resolved = [alert_id for key, alert_id in current.items() if key not in wanted]
+    if resolved:
+        StockAlert.objects.filter(pk__in=resolved, date_resolution__isnull=True).update(date_resolution=timezone.now())
+    if to_open:
+        # A concurrent evaluation may have opened the same alert: the
+        # partial unique constraint keeps only one
+        StockAlert.objects.bulk_create([alert for _, alert in to_open], ignore_conflicts=True)
+        for nom, alert in to_open:
+            if alert.type == StockAlert.LOW_STOCK:
+                log_stock_alert(None, nom, alert.quantite, alert.seuil)
+            else:
+                log_expiry_alert(None, nom, alert.date_expiration)
+    return len(to_open), len(resolved)
+
+
+def _evaluate_in_batches(produit_ids, today=None):
+    opened = resolved = 0
+    for start in range(0, len(produit_ids), EVALUATION_BATCH_SIZE):
+        batch_opened, batch_resolved = evaluate_products(produit_ids[start:start + EVALUATION_BATCH_SIZE], today)
+        opened += batch_opened
+        resolved += batch_resolved
+    return opened, resolved
+
+
+def sweep_expiry(today=None):
+    """
+    Daily pass (manage.py sweep_stock_alerts) for what time alone changes:
+    products entering the expiry window (a range scan of the date_expiration
+    index) without an open alert, and open expiry alerts whose product left
+    it. Returns (opened, resolved).
+    """
+    limit = expiry_limit(today)
+    has_open_alert = Exists(open_alerts(StockAlert.EXPIRING).filter(produit_id=OuterRef('pk')))
+    entering = Produit.objects.filter(date_expiration__lte=limit).exclude(has_open_alert).values_list('id', flat=True)
+    leaving = open_alerts(StockAlert.EXPIRING).filter(produit__date_expiration__gt=limit).values_list('produit_id', flat=True)
+    return _evaluate_in_batches(sorted(set(entering) | set(leaving)), today)
+
+
+def sweep_all(today=None):
+    """Evaluate every product (after bulk loads, threshold changes or to repair)"""
+    return _evaluate_in_batches(list(Produit.objects.order_by('pk').values_list('id', flat=True)), today)
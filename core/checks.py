@@ -0,0 +1,25 @@
+import sys
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# Backends private to one process: an invalidation made by one worker is
+# never seen by the others
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """User role versions, fragment generations and stats need a cache shared by every worker"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', PROCESS_LOCAL_CACHES[0])
+    if backend not in PROCESS_LOCAL_CACHES or 'test' in sys.argv:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is private to each process.',
+        hint='With several workers, role changes, stock edits and dashboard invalidations only reach the '
+             'worker that made them: configure a shared cache (Redis, Memcached, file or database).',
+        id='core.W001',
+    )]
@@ -0,0 +1,9 @@
+from .permissions import get_user_permissions
+
+
+def user_permissions(request):
+    """
+    Expose the current user's role, theme and capability flags
+    (can_manage_users, can_view_logs, ...) to every template
+    """
+    return get_user_permissions(request) or {}
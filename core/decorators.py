@@ -2,7 +2,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from functools import wraps
 from django.http import HttpResponseForbidden
-from .models import UserProfile
+from .permissions import get_user_role
 
 def role_required(allowed_roles):
     """
@@ -14,13 +14,8 @@ def role_required(allowed_roles):
             if not request.user.is_authenticated:
                 return redirect('login')
             
-            # Get user role from profile
-            if hasattr(request.user, 'profile'):
-                user_role = request.user.profile.role
-            else:
-                # Create profile if it doesn't exist
-                UserProfile.objects.create(user=request.user)
-                user_role = request.user.profile.role
+            # Get user role (cached per request and in the session)
+            user_role = get_user_role(request)
             
             if user_role in allowed_roles or request.user.is_superuser:
                 return view_func(request, *args, **kwargs)
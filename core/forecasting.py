@@ -0,0 +1,223 @@
+import math
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import LigneVente, Produit
+
+try:
+    import numpy as np
+except ImportError:  # optional: forecasting is unavailable without it
+    np = None
+
+# Sales history read by the demand model (days before today)
+DEFAULT_HISTORY_DAYS = 730
+# Weight of a day's sales halves every this many days back: recent
+# consumption counts more than last year's
+DEFAULT_HALF_LIFE_DAYS = 90
+# Days between ordering from a supplier and receiving the goods
+DEFAULT_LEAD_TIME_DAYS = 7
+# Days of consumption an order should cover after it arrives
+DEFAULT_COVER_DAYS = 30
+# Safety stock in standard deviations of the lead-time demand (1.65: ~95%
+# of the lead times without stockout)
+DEFAULT_SERVICE_FACTOR = 1.65
+# The demand model changes once a day (it only reads past days)
+DEFAULT_MODEL_CACHE_TIMEOUT = 86400
+
+
+class ForecastUnavailable(Exception):
+    """NumPy is not installed"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _require_numpy():
+    if np is None:
+        raise ForecastUnavailable('Stock forecasting requires NumPy (pip install numpy).')
+
+
+def _model_cache_key(today, history_days, half_life):
+    return f'forecast:model:{today.isoformat()}:{history_days}:{half_life}'
+
+
+def build_demand_model(today=None, history_days=None, half_life=None):
+    """
+    Daily consumption rate and its standard deviation for every product,
+    from the sales of the `history_days` days before today.
+
+    The sale lines are summed into a products x days matrix and every
+    statistic is a weighted reduction over that matrix: no Python loop over
+    products or days. Days before a product's history starts don't count as zero sales.
+    """
+    _require_numpy()
+    today = today or timezone.localdate()
+    history_days = history_days or _setting('FORECAST_HISTORY_DAYS', DEFAULT_HISTORY_DAYS)
+    half_life = half_life or _setting('FORECAST_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS)
+    start = today - timedelta(days=history_days)
+    # Plain datetime range on date_vente, so its index is used
+    start_at = timezone.make_aware(datetime.combine(start, time.min))
+    end_at = timezone.make_aware(datetime.combine(today, time.min))
+
+    products = list(Produit.objects.order_by('pk').values_list('pk', 'date_ajout'))
+    ids = np.fromiter((pk for pk, _ in products), dtype=np.int64, count=len(products))
+    added = np.fromiter(
+        (min(max(0, (date_ajout - start).days), history_days) if date_ajout else 0 for _, date_ajout in products),
+        dtype=np.int64, count=len(products),
+    )
+
+    # Raw lines, binned into days by NumPy: grouping by day in SQL runs a
+    # date conversion function per row (a Python function on SQLite)
+    rows = (
+        LigneVente.objects
+        .filter(vente__date_vente__gte=start_at, vente__date_vente__lt=end_at, produit__isnull=False)
+        .values_list('produit_id', 'vente__date_vente', 'quantite')
+    )
+    produit_ids, timestamps, quantities = [], [], []
+    for produit_id, date_vente, quantite in rows.iterator(chunk_size=10000):
+        produit_ids.append(produit_id)
+        timestamps.append(date_vente.timestamp())
+        quantities.append(quantite)
+    sales = np.zeros((len(ids), history_days), dtype=np.float64)
+    if produit_ids and len(ids):
+        produit_ids = np.array(produit_ids, dtype=np.int64)
+        row_index = np.minimum(np.searchsorted(ids, produit_ids), len(ids) - 1)
+        # Local days, with today's UTC offset (a DST change moves an hour
+        # of sales to the neighbouring day)
+        origin = start_at.timestamp() + start_at.utcoffset().total_seconds() - end_at.utcoffset().total_seconds()
+        day_index = ((np.array(timestamps) - origin) // 86400).astype(np.int64)
+        known = (ids[row_index] == produit_ids) & (day_index >= 0) & (day_index < history_days)
+        # Sum the quantities per (product, day) cell of the flattened matrix
+        sales = np.bincount(
+            row_index[known] * history_days + day_index[known],
+            weights=np.array(quantities, dtype=np.float64)[known],
+            minlength=len(ids) * history_days,
+        ).reshape(len(ids), history_days)
+
+    # A product's history starts when it was added, or at its first sale
+    # if earlier (imported or seeded products)
+    sold = sales > 0
+    first_sale = np.where(sold.any(axis=1), sold.argmax(axis=1), history_days)
+    first_day = np.minimum(added, first_sale)
+
+    # Weight of each day, the most recent last; the weighted sums are
+    # matrix-vector products, the weight total of a product a suffix sum
+    decay = np.power(0.5, np.arange(history_days - 1, -1, -1, dtype=np.float64) / half_life)
+    suffix = np.concatenate((np.cumsum(decay[::-1])[::-1], [0.0]))
+    weight_sums = suffix[first_day]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = np.where(weight_sums > 0, (sales @ decay) / weight_sums, 0.0)
+        mean_square = np.where(weight_sums > 0, ((sales * sales) @ decay) / weight_sums, 0.0)
+    return {
+        'date': today.isoformat(),
+        'history_days': history_days,
+        'ids': ids,
+        'rate': rate,
+        'std': np.sqrt(np.maximum(mean_square - rate * rate, 0.0)),
+    }
+
+
+def get_demand_model(today=None, refresh=False):
+    """Today's demand model, built at most once a day (cached)"""
+    today = today or timezone.localdate()
+    key = _model_cache_key(
+        today,
+        _setting('FORECAST_HISTORY_DAYS', DEFAULT_HISTORY_DAYS),
+        _setting('FORECAST_HALF_LIFE_DAYS', DEFAULT_HALF_LIFE_DAYS),
+    )
+    model = None if refresh else cache.get(key)
+    if model is None:
+        model = build_demand_model(today)
+        cache.set(key, model, _setting('FORECAST_MODEL_CACHE_TIMEOUT', DEFAULT_MODEL_CACHE_TIMEOUT))
+    return model
+
+
+def forecast(supplier_id=None, reorder_only=False, limit=None, today=None, refresh=False):
+    """
+    Days until stockout and suggested order (order-up-to level: demand over
+    lead time + cover period, plus safety stock, minus the current stock)
+    of every product, from the cached demand model and the live stock.
+    Returns {'date', 'products', 'suppliers'}: the products most urgent
+    first (only those to reorder with `reorder_only`, at most `limit`),
+    the supplier totals by order cost.
+    """
+    _require_numpy()
+    model = get_demand_model(today, refresh=refresh)
+    lead_time = _setting('REORDER_LEAD_TIME_DAYS', DEFAULT_LEAD_TIME_DAYS)
+    cover = _setting('REORDER_COVER_DAYS', DEFAULT_COVER_DAYS)
+    service_factor = _setting('REORDER_SERVICE_FACTOR', DEFAULT_SERVICE_FACTOR)
+
+    stock = Produit.objects.order_by('pk').values_list('pk', 'nom', 'quantite', 'prix', 'fournisseur_id', 'fournisseur__nom')
+    if supplier_id:
+        stock = stock.filter(fournisseur_id=supplier_id)
+    stock = list(stock)
+    if not stock:
+        return {'date': model['date'], 'products': [], 'suppliers': []}
+
+    ids = np.fromiter((row[0] for row in stock), dtype=np.int64, count=len(stock))
+    quantity = np.fromiter((row[2] for row in stock), dtype=np.float64, count=len(stock))
+    price = np.fromiter((row[3] for row in stock), dtype=np.float64, count=len(stock))
+    # Products added since the model was built have no history yet
+    rate, std = np.zeros(len(ids)), np.zeros(len(ids))
+    if len(model['ids']):
+        position = np.minimum(np.searchsorted(model['ids'], ids), len(model['ids']) - 1)
+        modelled = model['ids'][position] == ids
+        rate[modelled] = model['rate'][position[modelled]]
+        std[modelled] = model['std'][position[modelled]]
+
+    with np.errstate(divide='ignore'):
+        days_left = np.where(rate > 0, quantity / rate, np.inf)
+    safety_stock = service_factor * std * math.sqrt(lead_time)
+    reorder_point = rate * lead_time + safety_stock
+    order = np.maximum(0.0, np.ceil(rate * (lead_time + cover) + safety_stock - quantity))
+    order = np.where(quantity <= reorder_point, order, 0.0)
+
+    today = timezone.localdate() if today is None else today
+    selected = np.lexsort((ids, days_left))
+    if reorder_only:
+        selected = selected[order[selected] > 0]
+    products = []
+    for index in selected[:limit]:
+        row = stock[index]
+        days = days_left[index]
+        products.append({
+            'id': row[0],
+            'nom': row[1],
+            'fournisseur_id': row[4],
+            'fournisseur': row[5],
+            'quantite': row[2],
+            'daily_rate': round(float(rate[index]), 3),
+            'days_until_stockout': None if math.isinf(days) else round(float(days), 1),
+            'stockout_date': None if math.isinf(days) or days > 3650 else (today + timedelta(days=int(days))).isoformat(),
+            'reorder_point': round(float(reorder_point[index]), 1),
+            'suggested_order': int(order[index]),
+        })
+
+    # Per-supplier totals, one bincount per figure
+    supplier_ids, supplier_index = np.unique(
+        np.fromiter((row[4] for row in stock), dtype=np.int64, count=len(stock)), return_inverse=True,
+    )
+    names = {row[4]: row[5] for row in stock}
+    skus = np.bincount(supplier_index, weights=(order > 0).astype(np.float64), minlength=len(supplier_ids))
+    units = np.bincount(supplier_index, weights=order, minlength=len(supplier_ids))
+    cost = np.bincount(supplier_index, weights=order * price, minlength=len(supplier_ids))
+    at_risk = np.bincount(supplier_index, weights=(days_left <= lead_time).astype(np.float64), minlength=len(supplier_ids))
+    suppliers = sorted(
+        (
+            {
+                'id': int(supplier),
+                'nom': names[supplier],
+                'products_to_reorder': int(skus[index]),
+                'units': int(units[index]),
+                'cost': round(float(cost[index]), 2),
+                'stockout_within_lead_time': int(at_risk[index]),
+            }
+            for index, supplier in enumerate(supplier_ids)
+        ),
+        key=lambda supplier: (-supplier['cost'], supplier['id']),
+    )
+    return {'date': model['date'], 'products': products, 'suppliers': suppliers}
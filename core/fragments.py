@@ -0,0 +1,68 @@
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .transactions import on_commit_batch
+
+# Models whose rows appear in cached template fragments ({% cache %} in
+# stock.html / store.html); each has its own generation counter
+FRAGMENT_MODELS = ('produit', 'categorie', 'fournisseur')
+DEFAULT_FRAGMENT_CACHE_TIMEOUT = 600
+
+
+def _generation_key(model_name):
+    return f'fragments:{model_name}:generation'
+
+
+def _new_generation():
+    # Time-based, so a lost counter never resurrects old fragments
+    return time.time_ns()
+
+
+def fragment_generations():
+    """
+    Current generation of every FRAGMENT_MODELS entry (one cache round trip).
+    Kept in the shared cache (settings.CACHES), so an edit in any worker
+    stales the fragments of all of them.
+    """
+    keys = {_generation_key(name): name for name in FRAGMENT_MODELS}
+    found = cache.get_many(keys)
+    generations = {}
+    for key, name in keys.items():
+        if key not in found:
+            cache.add(key, _new_generation(), None)
+            found[key] = cache.get(key)
+        generations[name] = found[key]
+    return generations
+
+
+def fragment_cache_context():
+    """
+    Template context of the cached fragments: the fragments vary on the
+    generations of the models they show, so a change makes them unreachable
+    """
+    return {
+        'fragment_generations': fragment_generations(),
+        'fragment_timeout': getattr(settings, 'FRAGMENT_CACHE_TIMEOUT', DEFAULT_FRAGMENT_CACHE_TIMEOUT),
+    }
+
+
+def _flush_generation(model_name, items):
+    _bump_generation(model_name)
+
+
+def _bump_generation(model_name):
+    key = _generation_key(model_name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _new_generation(), None)
+
+
+def invalidate_fragments(*model_names):
+    """Stale the fragments showing these models once the surrounding transaction commits"""
+    for model_name in model_names:
+        # Once per transaction and model, however many rows it changes
+        on_commit_batch(('fragments', model_name), partial(_flush_generation, model_name))
@@ -0,0 +1,150 @@
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps, features
+
+from .fragments import invalidate_fragments
+
+# Rendition name -> maximum width/height in pixels
+RENDITION_SIZES = {
+    'thumb': 120,   # stock table (60px at 2x)
+    'card': 480,    # store product cards
+    'full': 1200,   # product details / zoom
+}
+RENDITION_DIR = 'products/renditions'
+DEFAULT_QUALITY = 80
+DEFAULT_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _image_format():
+    return ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+
+def rendition_name(digest, rendition, extension):
+    """Content-hashed file name: the same source always gives the same names"""
+    return f'{RENDITION_DIR}/{digest[:16]}-{rendition}.{extension}'
+
+
+def build_renditions(image_name, storage=default_storage, overwrite=False):
+    """
+    Resize and recompress one stored image into every rendition.
+    Returns the dict stored in Produit.image_renditions.
+    """
+    with storage.open(image_name, 'rb') as handle:
+        data = handle.read()
+    digest = hashlib.sha256(data).hexdigest()
+    image_format, extension = _image_format()
+    quality = getattr(settings, 'IMAGE_RENDITION_QUALITY', DEFAULT_QUALITY)
+
+    with Image.open(io.BytesIO(data)) as source:
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ('RGBA', 'LA') or 'transparency' in source.info
+        if has_alpha and image_format == 'WEBP':
+            source = source.convert('RGBA')
+        elif has_alpha:
+            # JPEG has no alpha channel: flatten onto white
+            rgba = source.convert('RGBA')
+            source = Image.new('RGB', rgba.size, 'white')
+            source.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            source = source.convert('RGB')
+
+        renditions = {'source': image_name, 'hash': digest}
+        for rendition, size in RENDITION_SIZES.items():
+            name = rendition_name(digest, rendition, extension)
+            resized = source.copy()
+            resized.thumbnail((size, size), Image.LANCZOS)
+            # Identical uploads share their renditions
+            if overwrite or not storage.exists(name):
+                if overwrite:
+                    storage.delete(name)
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, quality=quality, optimize=True)
+                storage.save(name, ContentFile(buffer.getvalue()))
+            renditions[rendition] = {'name': name, 'width': resized.width, 'height': resized.height}
+    return renditions
+
+
+def process_produit_image(produit_id, image_name, overwrite=False):
+    """Build the renditions of a product image and store them on the product"""
+    from .models import Produit
+
+    try:
+        renditions = build_renditions(image_name, overwrite=overwrite)
+        # Only if the image wasn't replaced in the meantime
+        if Produit.objects.filter(pk=produit_id, image=image_name).update(image_renditions=renditions):
+            # update() sends no post_save: the cached product fragments still use the original
+            invalidate_fragments('produit')
+        return renditions
+    except Exception as e:
+        # The original image keeps being served
+        print(f"Image processing failed: {e}")
+        return None
+    finally:
+        if not getattr(settings, 'IMAGE_PROCESSING_SYNC', False):
+            # Release the worker thread's database connection
+            connection.close()
+
+
+def get_executor():
+    """Shared worker pool, so uploads never wait for the resizing"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_WORKERS', DEFAULT_WORKERS),
+                thread_name_prefix='image-renditions',
+            )
+        return _executor
+
+
+def schedule_renditions(produit):
+    """
+    Queue the rendition build of a product's image once the surrounding
+    transaction commits (run inline with IMAGE_PROCESSING_SYNC)
+    """
+    produit_id, image_name = produit.pk, produit.image.name
+
+    def submit():
+        if getattr(settings, 'IMAGE_PROCESSING_SYNC', False):
+            process_produit_image(produit_id, image_name)
+        else:
+            get_executor().submit(process_produit_image, produit_id, image_name)
+    transaction.on_commit(submit)
+
+
+def referenced_renditions():
+    """Every rendition file name used by a product"""
+    from .models import Produit
+
+    names = set()
+    for renditions in Produit.objects.exclude(image_renditions={}).values_list('image_renditions', flat=True):
+        for rendition in RENDITION_SIZES:
+            if rendition in renditions:
+                names.add(renditions[rendition]['name'])
+    return names
+
+
+def prune_renditions(storage=default_storage):
+    """Delete the rendition files no product refers to; returns how many"""
+    try:
+        _, files = storage.listdir(RENDITION_DIR)
+    except FileNotFoundError:
+        return 0
+    referenced = referenced_renditions()
+    removed = 0
+    for filename in files:
+        name = f'{RENDITION_DIR}/{filename}'
+        if name not in referenced:
+            storage.delete(name)
+            removed += 1
+    return removed
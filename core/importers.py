@@ -0,0 +1,299 @@
+import csv
+import io
+from abc import ABC, abstractmethod
+from itertools import chain
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, transaction
+
+from .alerts import evaluate_products
+from .fragments import invalidate_fragments
+from .inventory import add_inventory_rows
+from .models import Animal, Categorie, Client, Fournisseur, Produit
+from .rollups import add_rollup_rows
+from .search import index_new_objects
+from .stats import invalidate_dashboard_stats
+
+IMPORT_CHUNK_SIZE = 2000
+# Errors kept in the report (all of them are counted)
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportFormatError(Exception):
+    """The file itself can't be imported (empty, missing columns...)"""
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'message': message})
+
+    def as_dict(self):
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def open_csv(binary_file):
+    """Decode an uploaded/opened binary file as a text stream, line by line"""
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
+
+
+class CsvImporter(ABC):
+    """
+    Streaming CSV import of one model.
+
+    Rows are read and validated CHUNK_SIZE at a time; the foreign keys of a
+    whole chunk are resolved with one query per related model, then the valid
+    rows are inserted with one bulk_create in a transaction. Invalid rows are
+    reported by line number and skipped. The header row names the columns
+    (case-insensitive, export headers or field names); `,`, `;` and tab
+    delimiters are detected.
+    """
+
+    model = None
+    search_key = None
+    # field -> accepted header names, in lower case
+    columns = {}
+    optional_columns = ()
+
+    def __init__(self, chunk_size=IMPORT_CHUNK_SIZE):
+        self.chunk_size = chunk_size
+
+    def run(self, stream):
+        first_line = stream.readline()
+        if not first_line.strip():
+            raise ImportFormatError('The file is empty.')
+        try:
+            dialect = csv.Sniffer().sniff(first_line, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(chain([first_line], stream), dialect)
+        positions = self.map_header(next(reader))
+
+        report = ImportReport()
+        chunk = []
+        for line, row in enumerate(reader, start=2):
+            if not any(cell.strip() for cell in row):
+                continue
+            chunk.append((line, {
+                field: row[index].strip() if index < len(row) else ''
+                for field, index in positions.items()
+            }))
+            if len(chunk) >= self.chunk_size:
+                self.import_chunk(chunk, report)
+                chunk = []
+        if chunk:
+            self.import_chunk(chunk, report)
+
+        if report.created:
+            invalidate_dashboard_stats()
+        return report
+
+    def map_header(self, header):
+        """Column position of every field"""
+        names = [name.strip().lower() for name in header]
+        positions = {}
+        for field, aliases in self.columns.items():
+            for index, name in enumerate(names):
+                if name in aliases:
+                    positions[field] = index
+                    break
+        missing = [aliases[0] for field, aliases in self.columns.items()
+                   if field not in positions and field not in self.optional_columns]
+        if missing:
+            raise ImportFormatError(f"Missing column(s): {', '.join(missing)}.")
+        return positions
+
+    def import_chunk(self, chunk, report):
+        lookups = self.resolve([values for _, values in chunk])
+        objects, lines = [], []
+        for line, values in chunk:
+            try:
+                objects.append(self.build(values, lookups))
+                lines.append(line)
+            except ValidationError as e:
+                report.add_error(line, ' '.join(e.messages))
+        if not objects:
+            return
+
+        try:
+            with transaction.atomic():
+                self.prepare(objects)
+                self.model.objects.bulk_create(objects)
+                # bulk_create sends no post_save: keep the derived data in sync here
+                index_new_objects(self.search_key, objects)
+                self.after_create(objects)
+        except DatabaseError as e:
+            # The invalid rows are already reported
+            for line in lines:
+                report.add_error(line, f'Database error: {e}')
+            return
+        report.created += len(objects)
+
+    def clean_fields(self, values, field_names, errors=None):
+        """
+        Validate values with their model fields. Raises one ValidationError
+        naming every invalid column (plus any `errors` already found).
+        """
+        errors = list(errors or [])
+        cleaned = {}
+        for name in field_names:
+            field = self.model._meta.get_field(name)
+            value = values.get(name, '')
+            if value == '' and field.null:
+                cleaned[name] = None
+                continue
+            try:
+                cleaned[name] = field.clean(value, None)
+            except ValidationError as e:
+                errors.append(f"{self.columns[name][0].capitalize()}: {' '.join(e.messages)}")
+        if errors:
+            raise ValidationError(errors)
+        return cleaned
+
+    def resolve(self, rows):
+        """Batched lookups for a chunk of rows"""
+        return {}
+
+    @abstractmethod
+    def build(self, values, lookups):
+        """
+        Unsaved model instance of one row's values, raising ValidationError
+        (see clean_fields) if the row is invalid
+        """
+
+    def prepare(self, objects):
+        """Last step before the insert, inside the chunk transaction"""
+
+    def after_create(self, objects):
+        """Called with the inserted objects, inside the chunk transaction"""
+
+
+class ClientImporter(CsvImporter):
+    model = Client
+    search_key = 'client'
+    columns = {
+        'prenom': ('first name', 'prenom', 'prénom'),
+        'nom': ('last name', 'nom'),
+        'telephone': ('phone', 'telephone', 'téléphone'),
+        'email': ('email', 'e-mail'),
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seen_emails = set()
+
+    def resolve(self, rows):
+        emails = {values['email'] for values in rows if values['email']}
+        return {'existing': set(Client.objects.filter(email__in=emails).values_list('email', flat=True))}
+
+    def build(self, values, lookups):
+        errors = []
+        email = values['email']
+        if email in lookups['existing'] or email in self.seen_emails:
+            errors.append(f'Email: a client with the email {email} already exists.')
+        client = Client(**self.clean_fields(values, ('prenom', 'nom', 'telephone', 'email'), errors))
+        self.seen_emails.add(client.email)
+        return client
+
+
+class AnimalImporter(CsvImporter):
+    model = Animal
+    search_key = 'animal'
+    columns = {
+        'nom': ('name', 'nom'),
+        'type': ('type', 'species', 'espèce'),
+        'race': ('breed', 'race'),
+        'age': ('age', 'âge'),
+        'client_email': ('client email', 'email client', 'client_email', 'email'),
+    }
+
+    def resolve(self, rows):
+        emails = {values['client_email'] for values in rows if values['client_email']}
+        clients = {}
+        # Several clients may share an email: the oldest one wins
+        for client_id, email in Client.objects.filter(email__in=emails).order_by('id').values_list('id', 'email'):
+            clients.setdefault(email, client_id)
+        return {'clients': clients}
+
+    def build(self, values, lookups):
+        errors = []
+        client_id = lookups['clients'].get(values['client_email'])
+        if client_id is None:
+            errors.append(f"Client email: no client with the email {values['client_email'] or '(empty)'}.")
+        return Animal(client_id=client_id, **self.clean_fields(values, ('nom', 'type', 'race', 'age'), errors))
+
+    def after_create(self, objects):
+        add_rollup_rows('animaux', objects)
+
+
+class ProduitImporter(CsvImporter):
+    model = Produit
+    search_key = 'produit'
+    columns = {
+        'nom': ('name', 'nom'),
+        'categorie': ('category', 'categorie', 'catégorie'),
+        'quantite': ('quantity', 'quantite', 'quantité'),
+        'prix': ('price', 'prix'),
+        'date_expiration': ('expiration', 'expiration date', 'date_expiration'),
+        'fournisseur': ('supplier', 'fournisseur'),
+        'description': ('description',),
+    }
+    optional_columns = ('description',)
+
+    def resolve(self, rows):
+        categories = {}
+        for categorie_id, nom in Categorie.objects.filter(
+            nom__in={values['categorie'] for values in rows}
+        ).order_by('id').values_list('id', 'nom'):
+            categories.setdefault(nom, categorie_id)
+        suppliers = {}
+        for fournisseur_id, nom in Fournisseur.objects.filter(
+            nom__in={values['fournisseur'] for values in rows}
+        ).order_by('id').values_list('id', 'nom'):
+            suppliers.setdefault(nom, fournisseur_id)
+        return {'categories': categories, 'suppliers': suppliers}
+
+    def build(self, values, lookups):
+        errors = []
+        if not values['categorie']:
+            errors.append('Category: This field cannot be blank.')
+        fournisseur_id = lookups['suppliers'].get(values['fournisseur'])
+        if fournisseur_id is None:
+            errors.append(f"Supplier: unknown supplier {values['fournisseur'] or '(empty)'}.")
+        produit = Produit(
+            fournisseur_id=fournisseur_id,
+            **self.clean_fields(values, ('nom', 'quantite', 'prix', 'date_expiration', 'description'), errors),
+        )
+        # New categories are created in prepare(), once the row is known to be valid
+        produit.categorie_id = lookups['categories'].get(values['categorie'])
+        produit._categorie_nom = values['categorie']
+        return produit
+
+    def prepare(self, objects):
+        missing = {obj._categorie_nom for obj in objects if obj.categorie_id is None}
+        if not missing:
+            return
+        created = Categorie.objects.bulk_create([Categorie(nom=nom) for nom in sorted(missing)])
+        invalidate_fragments('categorie')
+        ids = {categorie.nom: categorie.pk for categorie in created}
+        for obj in objects:
+            if obj.categorie_id is None:
+                obj.categorie_id = ids[obj._categorie_nom]
+
+    def after_create(self, objects):
+        add_inventory_rows((obj.quantite, obj.prix) for obj in objects)
+        invalidate_fragments('produit')
+        evaluate_products(obj.pk for obj in objects)
+
+
+IMPORTERS = {
+    'clients': ClientImporter,
+    'animals': AnimalImporter,
+    'products': ProduitImporter,
+}
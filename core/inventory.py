@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+
+from .models import InventoryStats, Produit
+
+INVENTORY_STATS_PK = 1
+
+
+def compute_inventory_stats(queryset=None):
+    """
+    Aggregate the stock header figures straight from the Produit table
+    (optionally restricted to a filtered queryset). Low stock is counted
+    from the open stock alerts (see core/alerts.py).
+    """
+    qs = Produit.objects.all() if queryset is None else queryset
+    money = DecimalField(max_digits=20, decimal_places=2)
+    return qs.aggregate(
+        total_products=Count('id'),
+        total_value=Coalesce(Sum(F('prix') * F('quantite'), output_field=money), Decimal('0'), output_field=money),
+    )
+
+
+def rebuild_inventory_stats():
+    """
+    Recompute the materialized record from scratch.
+    Returns (previous figures or None, rebuilt figures).
+    """
+    with transaction.atomic():
+        previous = InventoryStats.objects.select_for_update().filter(pk=INVENTORY_STATS_PK).values(
+            'total_products', 'total_value'
+        ).first()
+        figures = compute_inventory_stats()
+        InventoryStats.objects.update_or_create(pk=INVENTORY_STATS_PK, defaults=figures)
+    return previous, figures
+
+
+def get_inventory_stats():
+    """Read the materialized record (building it on first use)"""
+    stats = InventoryStats.objects.filter(pk=INVENTORY_STATS_PK).values(
+        'total_products', 'total_value'
+    ).first()
+    if stats is None:
+        _, stats = rebuild_inventory_stats()
+    return stats
+
+
+def _row_figures(quantite, prix):
+    quantite = int(quantite)
+    return {
+        'total_products': 1,
+        'total_value': Decimal(str(prix)) * quantite,
+    }
+
+
+def apply_inventory_delta(old=None, new=None):
+    """
+    Move the materialized figures from one product state to another.
+    `old`/`new` are (quantite, prix) tuples, None for creation/deletion.
+    """
+    apply_inventory_changes([(old, new)])
+
+
+def apply_inventory_changes(changes):
+    """
+    Several apply_inventory_delta() moves in one update, for queryset
+    update()s (which send no post_save). `changes` are (old, new) pairs.
+    """
+    delta = {'total_products': 0, 'total_value': Decimal('0')}
+    for old, new in changes:
+        if old is not None:
+            for key, value in _row_figures(*old).items():
+                delta[key] -= value
+        if new is not None:
+            for key, value in _row_figures(*new).items():
+                delta[key] += value
+    _apply_delta(delta)
+
+
+def add_inventory_rows(rows):
+    """
+    Add new products to the materialized figures in one update, for
+    bulk_create (which sends no post_save). `rows` are (quantite, prix) tuples.
+    """
+    delta = {'total_products': 0, 'total_value': Decimal('0')}
+    for row in rows:
+        for key, value in _row_figures(*row).items():
+            delta[key] += value
+    _apply_delta(delta)
+
+
+def _apply_delta(delta):
+    if not any(delta.values()):
+        return
+
+    updated = InventoryStats.objects.filter(pk=INVENTORY_STATS_PK).update(
+        total_products=F('total_products') + delta['total_products'],
+        total_value=F('total_value') + delta['total_value'],
+    )
+    if not updated:
+        rebuild_inventory_stats()
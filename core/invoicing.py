@@ -0,0 +1,317 @@
+import calendar
+import hashlib
+import json
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Sum
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Facture, LigneFacture, Reservation
+from .pdf import PAGE_HEIGHT, PAGE_WIDTH, PdfDocument
+
+# Price of a reservation's service (MAD, before VAT), matched
+# case-insensitively; SERVICE_PRICES entries take precedence
+DEFAULT_SERVICE_PRICES = {
+    'Consultation': Decimal('250'),
+    'Vaccination': Decimal('200'),
+    'Contrôle': Decimal('150'),
+    'Toilettage': Decimal('300'),
+    'Détartrage': Decimal('400'),
+    'Chirurgie': Decimal('1500'),
+}
+DEFAULT_SERVICE_PRICE = Decimal('250')
+# VAT rate of new invoices, in percent (INVOICE_VAT_RATE)
+DEFAULT_VAT_RATE = 20
+DEFAULT_CLINIC_NAME = 'VetStock'
+# Reservations with these statuses are billed by the monthly batch
+BILLABLE_STATUSES = ('Completed',)
+
+INVOICE_DIR = 'factures'
+# Part of every rendering's hash: bump it when the layout changes so that
+# all invoices are rendered again
+RENDER_VERSION = 1
+# Invoices loaded, rendered and saved together
+RENDER_BATCH_SIZE = 500
+# Clients invoiced per transaction by the monthly batch
+INVOICE_BATCH_SIZE = 500
+
+CENT = Decimal('0.01')
+
+
+def service_price(service):
+    prices = {name.lower(): Decimal(price) for name, price in DEFAULT_SERVICE_PRICES.items()}
+    prices.update({name.lower(): Decimal(price) for name, price in getattr(settings, 'SERVICE_PRICES', {}).items()})
+    return prices.get((service or '').strip().lower(), DEFAULT_SERVICE_PRICE)
+
+
+def parse_month(value):
+    """'YYYY-MM' as (year, month); raises ValueError"""
+    try:
+        parsed = datetime.strptime(value.strip(), '%Y-%m')
+    except (AttributeError, ValueError):
+        raise ValueError(f'Invalid month {value!r}, expected YYYY-MM.')
+    return parsed.year, parsed.month
+
+
+def month_invoices(year, month):
+    """Invoices issued during a month"""
+    return Facture.objects.filter(date_emission__year=year, date_emission__month=month)
+
+
+def month_numero(year, month, client_id):
+    """Number of a client's monthly invoice: running the batch twice reuses it"""
+    return f'F{year}{month:02d}-{client_id:06d}'
+
+
+def recalculate_totals(facture_ids):
+    """Recompute the totals of these invoices from their lines (one aggregate query)"""
+    line_total = ExpressionWrapper(F('quantite') * F('prix_unitaire'), output_field=DecimalField(max_digits=14, decimal_places=2))
+    totals = dict(
+        LigneFacture.objects.filter(facture_id__in=facture_ids)
+        .values('facture_id').annotate(total=Sum(line_total)).values_list('facture_id', 'total')
+    )
+    factures = list(Facture.objects.filter(pk__in=facture_ids).only('id', 'taux_tva'))
+    for facture in factures:
+        facture.total_ht = Decimal(totals.get(facture.pk) or 0).quantize(CENT, ROUND_HALF_UP)
+        facture.total_tva = (facture.total_ht * facture.taux_tva / 100).quantize(CENT, ROUND_HALF_UP)
+        facture.total_ttc = facture.total_ht + facture.total_tva
+    Facture.objects.bulk_update(factures, ['total_ht', 'total_tva', 'total_ttc'])
+
+
+def create_month_invoices(year, month):
+    """
+    Invoice the billable reservations of a month not billed yet: one invoice
+    per client (reused if the batch already ran), one line per reservation.
+    Returns (invoices touched, lines created).
+    """
+    tz = timezone.get_current_timezone()
+    start = datetime(year, month, 1, tzinfo=tz)
+    last_day = calendar.monthrange(year, month)[1]
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=tz)
+    vat = Decimal(getattr(settings, 'INVOICE_VAT_RATE', DEFAULT_VAT_RATE))
+
+    rows = (
+        Reservation.objects
+        .filter(statut__in=BILLABLE_STATUSES, date_reservation__gte=start, date_reservation__lt=end,
+                lignes_facture__isnull=True)
+        .order_by('client_id', 'date_reservation')
+        .values_list('id', 'client_id', 'service', 'date_reservation', 'animal__nom')
+    )
+    by_client = defaultdict(list)
+    for row in rows.iterator():
+        by_client[row[1]].append(row)
+
+    client_ids = list(by_client)
+    touched = created = 0
+    for index in range(0, len(client_ids), INVOICE_BATCH_SIZE):
+        batch = client_ids[index:index + INVOICE_BATCH_SIZE]
+        numeros = {month_numero(year, month, client_id): client_id for client_id in batch}
+        with transaction.atomic():
+            factures = {
+                facture.client_id: facture
+                for facture in Facture.objects.filter(numero__in=numeros).only('id', 'client_id')
+            }
+            missing = [
+                Facture(numero=numero, client_id=client_id, date_emission=date(year, month, last_day), taux_tva=vat)
+                for numero, client_id in numeros.items() if client_id not in factures
+            ]
+            for facture in Facture.objects.bulk_create(missing):
+                factures[facture.client_id] = facture
+            lignes = [
+                LigneFacture(
+                    facture_id=factures[client_id].pk,
+                    reservation_id=res_id,
+                    description=f"{service} - {animal_nom} ({timezone.localtime(date_reservation):%d/%m/%Y})",
+                    quantite=1,
+                    prix_unitaire=service_price(service),
+                )
+                for client_id in batch
+                for res_id, _, service, date_reservation, animal_nom in by_client[client_id]
+            ]
+            LigneFacture.objects.bulk_create(lignes)
+            recalculate_totals([facture.pk for facture in factures.values()])
+        touched += len(factures)
+        created += len(lignes)
+    return touched, created
+
+
+def _money(value):
+    return f'{Decimal(value).quantize(CENT, ROUND_HALF_UP):.2f}'
+
+
+def invoice_payload(facture):
+    """
+    Everything a rendering shows, as plain JSON-compatible data (sent to
+    the render processes, and hashed to name the output files)
+    """
+    client = facture.client
+    return {
+        'render_version': RENDER_VERSION,
+        'clinic': getattr(settings, 'CLINIC_NAME', DEFAULT_CLINIC_NAME),
+        'numero': facture.numero,
+        'date_emission': facture.date_emission.strftime('%d/%m/%Y'),
+        'statut': facture.statut,
+        'client': {
+            'nom': f'{client.prenom} {client.nom}',
+            'telephone': client.telephone,
+            'email': client.email,
+        },
+        'lignes': [
+            {
+                'description': ligne.description,
+                'quantite': ligne.quantite,
+                'prix_unitaire': _money(ligne.prix_unitaire),
+                'total': _money(ligne.total),
+            }
+            for ligne in facture.lignes.all()
+        ],
+        'taux_tva': f'{facture.taux_tva.normalize():f}',
+        'total_ht': _money(facture.total_ht),
+        'total_tva': _money(facture.total_tva),
+        'total_ttc': _money(facture.total_ttc),
+    }
+
+
+def payload_digest(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def output_names(digest):
+    """Content-addressed file names of a rendering"""
+    base = f'{INVOICE_DIR}/{digest[:2]}/{digest}'
+    return f'{base}.pdf', f'{base}.html'
+
+
+def build_invoice_pdf(payload):
+    pdf = PdfDocument()
+    left, right = 50, PAGE_WIDTH - 50
+    columns = (right - 190, right - 95, right)  # right edges of quantity, unit price, total
+
+    def table_header(y):
+        pdf.rect(left, y - 6, right - left, 20)
+        pdf.text(left + 6, y, 'Article', 10, bold=True)
+        for x, label in zip(columns, ('Quantité', 'Prix unitaire', 'Total')):
+            pdf.text(x - 6, y, label, 10, bold=True, align='right')
+        return y - 24
+
+    y = PAGE_HEIGHT - 60
+    pdf.text(left, y, payload['clinic'], 18, bold=True)
+    pdf.text(right, y, f"Facture {payload['numero']}", 14, bold=True, align='right')
+    y -= 20
+    pdf.text(right, y, f"Date : {payload['date_emission']}", 10, align='right')
+    y -= 40
+    pdf.text(left, y, 'Informations du Client', 12, bold=True)
+    for label, value in (('Nom', payload['client']['nom']), ('Téléphone', payload['client']['telephone']),
+                         ('Email', payload['client']['email'])):
+        y -= 16
+        pdf.text(left, y, f'{label} : {value}', 10)
+    y = table_header(y - 36)
+
+    for ligne in payload['lignes']:
+        if y < 150:
+            pdf.add_page()
+            y = table_header(PAGE_HEIGHT - 60)
+        description = ligne['description']
+        if len(description) > 60:
+            description = description[:59] + '…'
+        pdf.text(left + 6, y, description, 10)
+        for x, value in zip(columns, (str(ligne['quantite']), f"{ligne['prix_unitaire']} MAD", f"{ligne['total']} MAD")):
+            pdf.text(x - 6, y, value, 10, align='right')
+        pdf.line(left, y - 6, right, y - 6, gray=0.85)
+        y -= 20
+
+    y -= 16
+    for label, value, bold in (('Sous-total', payload['total_ht'], False),
+                               (f"TVA ({payload['taux_tva']}%)", payload['total_tva'], False),
+                               ('Total à payer', payload['total_ttc'], True)):
+        pdf.text(columns[1] - 6, y, label, 11, bold=bold, align='right')
+        pdf.text(right - 6, y, f'{value} MAD', 11, bold=bold, align='right')
+        y -= 18
+    pdf.text(PAGE_WIDTH / 2, 40, 'Merci pour votre confiance', 9, align='center')
+    return pdf.render()
+
+
+def render_payload(payload, digest):
+    """
+    Write the PDF and HTML renderings of one invoice (in a render process).
+    Files already present have the same content: they are kept.
+    """
+    pdf_name, html_name = output_names(digest)
+    if not default_storage.exists(pdf_name):
+        default_storage.save(pdf_name, ContentFile(build_invoice_pdf(payload)))
+    if not default_storage.exists(html_name):
+        html = render_to_string('core/invoice_document.html', {'facture': payload})
+        default_storage.save(html_name, ContentFile(html.encode('utf-8')))
+    return pdf_name, html_name
+
+
+def _render_job(job):
+    pk, payload, digest = job
+    return pk, digest, render_payload(payload, digest)
+
+
+def render_invoices(queryset, workers=None, force=False, stdout=None):
+    """
+    Render the invoices of a queryset in a process pool, RENDER_BATCH_SIZE at
+    a time. Invoices whose content hash and files didn't change are skipped.
+    Returns (rendered, skipped).
+    """
+    workers = workers or getattr(settings, 'INVOICE_RENDER_WORKERS', None) or os.cpu_count() or 1
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True))
+    rendered = skipped = 0
+    executor = None
+    # The workers inherit the configured Django of a fork; spawned ones
+    # (the only start method on Windows) would import the models without
+    # django.setup(): render serially there
+    if workers > 1 and len(ids) > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+    try:
+        for index in range(0, len(ids), RENDER_BATCH_SIZE):
+            batch = Facture.objects.filter(pk__in=ids[index:index + RENDER_BATCH_SIZE]).select_related('client').prefetch_related('lignes')
+            jobs = []
+            for facture in batch:
+                payload = invoice_payload(facture)
+                digest = payload_digest(payload)
+                if (not force and facture.empreinte == digest and facture.fichier_pdf
+                        and default_storage.exists(facture.fichier_pdf) and default_storage.exists(facture.fichier_html)):
+                    skipped += 1
+                    continue
+                jobs.append((facture.pk, payload, digest))
+            if not jobs:
+                continue
+
+            if executor is not None:
+                results = list(executor.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+            else:
+                results = [_render_job(job) for job in jobs]
+            now = timezone.now()
+            Facture.objects.bulk_update([
+                Facture(pk=pk, empreinte=digest, fichier_pdf=pdf_name, fichier_html=html_name, date_rendu=now)
+                for pk, digest, (pdf_name, html_name) in results
+            ], ['empreinte', 'fichier_pdf', 'fichier_html', 'date_rendu'])
+            rendered += len(results)
+            if stdout is not None:
+                stdout.write(f'  {rendered + skipped}/{len(ids)} invoices')
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return rendered, skipped
+
+
+def ensure_rendered(facture):
+    """Render one invoice if needed (inline); returns the refreshed invoice"""
+    render_invoices(Facture.objects.filter(pk=facture.pk), workers=1)
+    facture.refresh_from_db()
+    return facture
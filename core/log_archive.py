@@ -0,0 +1,181 @@
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Log
+from .search import remove_objects
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory lock, don't run the command twice at once
+    fcntl = None
+
+DEFAULT_RETENTION_DAYS = 90
+DEFAULT_BATCH_SIZE = 5000
+
+ARCHIVE_FIELDS = (
+    'id', 'user_id', 'user__username', 'user__first_name', 'user__last_name', 'action',
+    'description', 'table_cible', 'id_element', 'ip_address', 'user_agent', 'date_action',
+)
+
+
+def archive_dir():
+    return Path(getattr(settings, 'LOG_ARCHIVE_DIR', Path(settings.BASE_DIR) / 'log_archive'))
+
+
+def archive_path(day):
+    """Date-partitioned archive file: <LOG_ARCHIVE_DIR>/YYYY/MM/logs-YYYY-MM-DD.jsonl.gz"""
+    return archive_dir() / f'{day:%Y}' / f'{day:%m}' / f'logs-{day:%Y-%m-%d}.jsonl.gz'
+
+
+def _serialize(row):
+    full_name = f"{row['user__first_name'] or ''} {row['user__last_name'] or ''}".strip()
+    return {
+        'id': row['id'],
+        'user_id': row['user_id'],
+        'user': (full_name or row['user__username']) if row['user_id'] else None,
+        'action': row['action'],
+        'description': row['description'],
+        'table_cible': row['table_cible'],
+        'id_element': row['id_element'],
+        'ip_address': row['ip_address'],
+        'user_agent': row['user_agent'],
+        'date_action': row['date_action'].isoformat(),
+    }
+
+
+@contextmanager
+def archive_lock():
+    """Advisory lock so overlapping scheduled runs don't archive the same rows twice"""
+    directory = archive_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        yield
+
+
+def _append_day(day, entries):
+    path = archive_path(day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Appending adds a gzip member; readers see one continuous stream
+    with gzip.open(path, 'at', encoding='utf-8') as handle:
+        for entry in entries:
+            handle.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+            handle.write('\n')
+        handle.flush()
+    with open(path, 'rb') as raw:
+        os.fsync(raw.fileno())
+
+
+def archive_logs(older_than_days=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Move Log rows older than the retention period into the archive files.
+
+    Each batch is written (and fsynced) to the archive before its rows are
+    deleted in one transaction, so a crash can at worst duplicate a batch in
+    the archive (readers skip duplicate ids), never lose it.
+    Returns the number of archived rows.
+    """
+    if older_than_days is None:
+        older_than_days = getattr(settings, 'LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS)
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    old_logs = Log.objects.filter(date_action__lt=cutoff)
+
+    if dry_run:
+        return old_logs.count()
+
+    table = connection.ops.quote_name(Log._meta.db_table)
+    archived = 0
+    with archive_lock():
+        while True:
+            rows = list(old_logs.order_by('date_action', 'id').values(*ARCHIVE_FIELDS)[:batch_size])
+            if not rows:
+                break
+
+            by_day = {}
+            for row in rows:
+                day = timezone.localtime(row['date_action']).date()
+                by_day.setdefault(day, []).append(_serialize(row))
+            for day, entries in by_day.items():
+                _append_day(day, entries)
+
+            ids = [row['id'] for row in rows]
+            with transaction.atomic():
+                # Plain DELETE: the ORM would load and signal every row
+                with connection.cursor() as cursor:
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f'DELETE FROM {table} WHERE id IN ({placeholders})', ids)
+                remove_objects('log', ids)
+            archived += len(ids)
+    return archived
+
+
+def archived_days(start=None, end=None):
+    """Dates that have an archive file, optionally within [start, end]"""
+    days = []
+    for path in archive_dir().glob('*/*/logs-*.jsonl.gz'):
+        try:
+            day = date.fromisoformat(path.name[len('logs-'):-len('.jsonl.gz')])
+        except ValueError:
+            continue
+        if (start is None or day >= start) and (end is None or day <= end):
+            days.append(day)
+    return sorted(days)
+
+
+def _read_day(day):
+    seen = set()
+    with gzip.open(archive_path(day), 'rt', encoding='utf-8') as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry['id'] in seen:
+                continue
+            seen.add(entry['id'])
+            entry['date_action'] = parse_datetime(entry['date_action'])
+            yield entry
+
+
+def _matches(entry, search_query):
+    needle = search_query.lower()
+    return any(
+        needle in str(entry.get(field) or '').lower()
+        for field in ('user', 'action', 'description', 'table_cible')
+    )
+
+
+def iter_archived_logs(start=None, end=None, search_query='', newest_first=False):
+    """
+    Stream archived log entries (dicts) for the days in [start, end]
+    straight from the archive files, without touching the database.
+    Memory use is bounded by one day of entries when newest_first is set.
+    """
+    days = archived_days(start, end)
+    if newest_first:
+        days.reverse()
+    for day in days:
+        entries = _read_day(day)
+        if newest_first:
+            entries = reversed(list(entries))
+        for entry in entries:
+            if search_query and not _matches(entry, search_query):
+                continue
+            yield entry
+
+
+def parse_archive_day(value):
+    """Parse a YYYY-MM-DD request parameter, or None"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+    except ValueError:
+        return None
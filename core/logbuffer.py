@@ -0,0 +1,192 @@
+import atexit
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .search import index_objects
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 2.0
+DEFAULT_MAX_SIZE = 10000
+DEFAULT_PAGE_VIEW_BUCKET_SECONDS = 3600
+
+
+class LogBuffer:
+    """
+    In-process buffer for activity log entries.
+
+    Entries are queued in memory and written with a single bulk_create when
+    LOG_BUFFER_BATCH_SIZE entries are waiting or every LOG_BUFFER_FLUSH_INTERVAL
+    seconds, whichever comes first, by a background flusher thread. Pending
+    entries are flushed at interpreter shutdown, which is how short-lived
+    processes such as management commands write theirs. With LOG_BUFFER_SYNC
+    enabled (the test runner, or override_settings) entries are saved
+    immediately instead.
+
+    It also aggregates page views into per (user, view name, time bucket)
+    counters, flushed the same way as PageViewCount rows.
+    """
+
+    def __init__(self):
+        self._entries = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._page_views = {}
+        self.flushed_count = 0
+        self.dropped_count = 0
+        self.failed_flushes = 0
+        self.page_views_flushed = 0
+
+    @property
+    def sync(self):
+        return getattr(settings, 'LOG_BUFFER_SYNC', False)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'LOG_BUFFER_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'LOG_BUFFER_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'LOG_BUFFER_MAX_SIZE', DEFAULT_MAX_SIZE)
+
+    @property
+    def page_view_bucket_seconds(self):
+        return getattr(settings, 'PAGE_VIEW_BUCKET_SECONDS', DEFAULT_PAGE_VIEW_BUCKET_SECONDS)
+
+    def add(self, entry):
+        """Queue an unsaved Log instance (or save it right away in sync mode)"""
+        if self.sync:
+            entry.save()
+            self.flushed_count += 1
+            return
+
+        with self._lock:
+            if len(self._entries) >= self.max_size:
+                # Never block a request on logging: drop and count instead
+                self.dropped_count += 1
+                return
+            self._entries.append(entry)
+            depth = len(self._entries)
+
+        self._ensure_flusher()
+        if depth >= self.batch_size:
+            self._wakeup.set()
+
+    def count_page_view(self, user_id, view_name):
+        """Count one page view in the current time bucket"""
+        seconds = self.page_view_bucket_seconds
+        now = timezone.now().timestamp()
+        bucket_start = datetime.fromtimestamp(now - now % seconds, tz=dt_timezone.utc)
+        key = (user_id, view_name[:200], bucket_start)
+
+        with self._lock:
+            self._page_views[key] = self._page_views.get(key, 0) + 1
+        if self.sync:
+            self.flush_page_views()
+        else:
+            self._ensure_flusher()
+
+    def flush_page_views(self):
+        """Add the pending page view counts to their PageViewCount rows"""
+        from .models import PageViewCount
+
+        with self._lock:
+            counters, self._page_views = self._page_views, {}
+        if not counters:
+            return
+        try:
+            with transaction.atomic():
+                # Make sure every bucket row exists, then add to it: safe
+                # against other processes flushing the same buckets
+                PageViewCount.objects.bulk_create([
+                    PageViewCount(user_id=user_id, view_name=view_name, bucket_start=bucket_start)
+                    for user_id, view_name, bucket_start in counters
+                ], ignore_conflicts=True)
+                for (user_id, view_name, bucket_start), count in counters.items():
+                    PageViewCount.objects.filter(
+                        user_id=user_id, view_name=view_name, bucket_start=bucket_start,
+                    ).update(count=F('count') + count)
+            self.page_views_flushed += sum(counters.values())
+        except Exception as e:
+            # If logging fails, don't break the main functionality
+            self.failed_flushes += 1
+            self.dropped_count += sum(counters.values())
+            print(f"Logging failed: {e}")
+
+    def flush(self):
+        """Write every queued entry, one bulk_create per batch"""
+        from .models import Log
+
+        self.flush_page_views()
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [self._entries.popleft() for _ in range(min(self.batch_size, len(self._entries)))]
+                if not batch:
+                    break
+                try:
+                    with transaction.atomic():
+                        Log.objects.bulk_create(batch)
+                        # bulk_create sends no post_save: index the new rows here
+                        index_objects('log', [entry.pk for entry in batch])
+                    self.flushed_count += len(batch)
+                except Exception as e:
+                    # If logging fails, don't break the main functionality
+                    self.failed_flushes += 1
+                    self.dropped_count += len(batch)
+                    print(f"Logging failed: {e}")
+                    break
+
+    def stats(self):
+        """Counters for monitoring the buffer"""
+        with self._lock:
+            depth = len(self._entries)
+            pending_page_views = sum(self._page_views.values())
+        return {
+            'queue_depth': depth,
+            'pending_page_views': pending_page_views,
+            'page_views_flushed': self.page_views_flushed,
+            'flushed': self.flushed_count,
+            'dropped': self.dropped_count,
+            'failed_flushes': self.failed_flushes,
+            'max_size': self.max_size,
+            'sync': self.sync,
+        }
+
+    def _ensure_flusher(self):
+        # (Re)start the flusher thread, e.g. in a freshly forked worker process
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='log-buffer-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            # Release this thread's database connection between flushes
+            connection.close()
+
+
+log_buffer = LogBuffer()
+
+# Safe flush of pending entries at shutdown
+atexit.register(log_buffer.flush)
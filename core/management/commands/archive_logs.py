@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.log_archive import DEFAULT_BATCH_SIZE, DEFAULT_RETENTION_DAYS, archive_dir, archive_logs
+
+
+class Command(BaseCommand):
+    help = 'Move activity logs older than the retention period into compressed daily archive files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=getattr(settings, 'LOG_RETENTION_DAYS', DEFAULT_RETENTION_DAYS),
+            help='Archive logs older than this many days (default: LOG_RETENTION_DAYS)',
+        )
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would be archived')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+        try:
+            count = archive_logs(
+                older_than_days=options['days'],
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        except BlockingIOError:
+            raise CommandError('Another archive_logs run is in progress.')
+
+        if options['dry_run']:
+            self.stdout.write(f"{count} log(s) older than {options['days']} days would be archived.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Archived {count} log(s) to {archive_dir()}'))
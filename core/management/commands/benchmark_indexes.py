@@ -0,0 +1,116 @@
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Log, Produit, Reservation
+from core.seeding import seed_dataset
+
+# (table, columns) of the indexes tuned for the hot queries of core/views.py
+TUNED_INDEXES = [
+    ('core_log', ['date_action']),
+    ('core_log', ['action', 'date_action']),
+    ('core_log', ['user_id', 'date_action']),
+    ('core_reservation', ['date_reservation']),
+    ('core_produit', ['quantite']),
+    ('core_produit', ['date_expiration']),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def hot_queries():
+    """The filter/sort queries the views actually run, as querysets"""
+    now = timezone.now()
+    today = timezone.make_aware(timezone.datetime.combine(now.date(), timezone.datetime.min.time()))
+    user_id = User.objects.order_by('id').values_list('id', flat=True).first()
+    return [
+        ('dashboard recent logs', Log.objects.order_by('-date_action')[:3]),
+        ('logs page', Log.objects.order_by('-date_action', '-id')[:51]),
+        ('logs by action', Log.objects.filter(action='login').order_by('-date_action')[:50]),
+        ('logs by user', Log.objects.filter(user_id=user_id).order_by('-date_action')[:50]),
+        ('calendar month', Reservation.objects.filter(
+            date_reservation__gte=today, date_reservation__lt=today + timedelta(days=31),
+        ).order_by('date_reservation')),
+        ('upcoming appointments', Reservation.objects.filter(
+            date_reservation__gte=today, date_reservation__lt=today + timedelta(days=2),
+        ).order_by('date_reservation')[:5]),
+        ('low stock alerts', Produit.objects.filter(quantite__lte=5).order_by('quantite')[:5]),
+        ('expiring soon', Produit.objects.filter(date_expiration__lte=now.date() + timedelta(days=30))),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Show the query plans and timings of the hot queries with and without '
+        'the tuned indexes, on a seeded database (rolled back afterwards)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logs', type=int, default=200000, help='Log rows to seed')
+        parser.add_argument('--reservations', type=int, default=100000, help='Reservation rows to seed')
+        parser.add_argument('--products', type=int, default=5000, help='Produit rows to seed')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per query (best time is kept)')
+        parser.add_argument('--no-seed', action='store_true', help='Benchmark the existing data only')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if not options['no_seed']:
+                    self.seed(options)
+                self.report('with tuned indexes', options['repeat'])
+                self.drop_tuned_indexes()
+                self.report('without tuned indexes', options['repeat'])
+                raise Rollback
+        except Rollback:
+            self.stdout.write('Seeded rows and dropped indexes rolled back.')
+
+    def seed(self, options):
+        counts = {
+            'users': 5,
+            'clients': 1000,
+            'animals': 2500,
+            'reservations': options['reservations'],
+            'products': options['products'],
+            'logs': options['logs'],
+        }
+        self.stdout.write(f"Seeding {options['logs']} logs, {options['reservations']} reservations, "
+                          f"{options['products']} products...")
+        # Search indexes and statistics aren't queried here: skip their rebuild
+        seed_dataset(counts, refresh=False)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def drop_tuned_indexes(self):
+        with connection.cursor() as cursor:
+            for table, columns in TUNED_INDEXES:
+                constraints = connection.introspection.get_constraints(cursor, table)
+                for name, info in constraints.items():
+                    if info['index'] and not info['unique'] and not info['primary_key'] and info['columns'] == columns:
+                        cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+
+    def report(self, title, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {title} ==='))
+        for label, qs in hot_queries():
+            best = None
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(qs.all())
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            self.stdout.write(self.style.SUCCESS(f'{label}: {best * 1000:.2f} ms'))
+            for line in self.query_plan(qs, title):
+                self.stdout.write(f'    {line}')
+
+    def query_plan(self, qs, title):
+        # The comment makes each phase a distinct statement: cached EXPLAIN
+        # statements are not re-planned after the indexes are dropped.
+        sql, params = qs.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} {sql} /* {title} */', params)
+            return [row[-1] for row in cursor.fetchall()]
@@ -0,0 +1,351 @@
+import csv
+import io
+import json
+import statistics
+import subprocess
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.metrics import RequestMetrics
+from core.models import (
+    Animal, Categorie, Client as ClientModel, Facture, Fournisseur, Log, Produit, Reservation, UserProfile,
+)
+from core.urls import urlpatterns
+
+# Maximum SQL queries per request for every URL name of core/urls.py.
+# Independent of the data volume: a view that grows with the number of rows
+# (N+1 queries) fails its budget on any realistic dataset.
+VIEW_QUERY_BUDGETS = {
+    None: 2,  # / redirect
+    'login': 4,
+    'dashboard': 15,
+    'reservation': 10,
+    'stock': 12,
+    'store': 10,
+    'logs': 8,
+    'clients': 6,
+    'animals': 6,
+    'facture': 6,
+    'invoice_document': 10,
+    'report': 8,
+    'settings': 5,
+    'export_clients_csv': 6,
+    'export_animals_csv': 6,
+    'export_reservations_csv': 6,
+    'export_products_csv': 6,
+    'export_logs_csv': 6,
+    'export_reports_csv': 6,
+    'import_clients_csv': 14,
+    'import_animals_csv': 18,
+    'import_products_csv': 24,
+    'bulk_delete_clients': 40,
+    'bulk_delete_animals': 30,
+    'bulk_delete_reservations': 25,
+    'users': 10,
+    'export_users_csv': 6,
+    'all_appointments': 6,
+    'free_slots': 6,
+    'checkout': 20,
+    'forecast': 6,
+    'delete_category': 12,
+    'delete_supplier': 12,
+}
+
+# URLs that can't be requested without side effects on the benchmark session
+SKIPPED_VIEWS = {
+    'logout': 'ends the benchmark session',
+}
+
+# URLs with path parameters: Command method returning their kwargs from
+# the current rows (SkipView if there is none)
+URL_KWARGS = {
+    'invoice_document': 'invoice_kwargs',
+}
+
+# POST-only endpoints: Command method returning (URL kwargs, client.post()
+# arguments). Called in a transaction rolled back after the response, so
+# the rows it creates and the request's writes leave no trace
+POST_REQUESTS = {
+    'bulk_delete_clients': 'bulk_delete_request',
+    'bulk_delete_animals': 'bulk_delete_request',
+    'bulk_delete_reservations': 'bulk_delete_request',
+    'import_clients_csv': 'import_request',
+    'import_animals_csv': 'import_request',
+    'import_products_csv': 'import_request',
+    'checkout': 'checkout_request',
+    'delete_category': 'delete_category_request',
+    'delete_supplier': 'delete_supplier_request',
+}
+
+# Bulk deletes post the ids of the first BULK_DELETE_SIZE rows of the model
+BULK_DELETE_SIZE = 50
+BULK_DELETE_VIEWS = {
+    'bulk_delete_clients': (ClientModel, 'client_ids'),
+    'bulk_delete_animals': (Animal, 'animal_ids'),
+    'bulk_delete_reservations': (Reservation, 'reservation_ids'),
+}
+
+# CSV imports upload IMPORT_ROWS valid rows
+IMPORT_ROWS = 50
+
+BENCHMARK_USERNAME = 'benchmark'
+# Users listed by the users page at least: a per-row query shows in its budget
+BENCHMARK_MIN_USERS = 20
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class SkipView(Exception):
+    """The database has no rows to build the request of a view with"""
+
+
+def _row_counts():
+    return {model.__name__: model.objects.count() for model in (ClientModel, Animal, Reservation, Produit, Log)}
+
+
+class Command(BaseCommand):
+    help = (
+        'Time every URL of core/urls.py against the current database (see seed_data), '
+        'check the per-view query budgets and save the results for later comparison'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Timed requests per URL (after one warm-up)')
+        parser.add_argument('--only', nargs='*', default=[], help='URL names to benchmark (default: all)')
+        parser.add_argument('--skip', nargs='*', default=[], help='URL names to leave out')
+        parser.add_argument('--output', help='Results JSON file (default: benchmark_results/views-<time>.json)')
+        parser.add_argument('--compare', help='Previous results JSON file to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative slowdown reported as a regression when comparing (default 0.2)')
+        parser.add_argument('--no-assert', action='store_true', help="Don't fail when a query budget is exceeded")
+
+    def handle(self, *args, **options):
+        client = Client()
+        client.force_login(self.benchmark_user())
+        self.ensure_users()
+
+        results = {}
+        for name, pattern in self.urls(options['only'], options['skip']):
+            label = name or self.path(pattern)
+            if name in SKIPPED_VIEWS:
+                self.stdout.write(f'{label}: skipped ({SKIPPED_VIEWS[name]})')
+                continue
+            try:
+                result = self.measure(client, pattern, options['repeat'])
+            except SkipView as e:
+                self.stdout.write(f'{label}: skipped ({e})')
+                continue
+            result['budget'] = VIEW_QUERY_BUDGETS.get(name)
+            result['within_budget'] = result['budget'] is None or result['queries'] <= result['budget']
+            # Errors (404, 405, 500...) time a code path the users never take
+            result['status_ok'] = 200 <= result['status'] < 400
+            results[label] = result
+
+            line = (f"{label}: {result['status']} {result['median_ms']:.1f} ms (best {result['best_ms']:.1f}), "
+                    f"{result['queries']} queries / budget {result['budget']}, db {result['db_ms']:.1f} ms")
+            style = self.style.SUCCESS if result['within_budget'] and result['status_ok'] else self.style.ERROR
+            self.stdout.write(style(line))
+
+        output = self.save(results, options['output'])
+        self.stdout.write(f'Results saved to {output}')
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['tolerance'])
+
+        failed = [label for label, result in results.items() if not result['status_ok']]
+        if failed:
+            raise CommandError(f"Unexpected status: {', '.join(failed)}")
+        over_budget = [label for label, result in results.items() if not result['within_budget']]
+        if over_budget and not options['no_assert']:
+            raise CommandError(f"Query budget exceeded: {', '.join(over_budget)}")
+
+    def benchmark_user(self):
+        user, created = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={'is_superuser': True, 'is_staff': True, 'first_name': 'Benchmark'},
+        )
+        if created:
+            user.set_unusable_password()
+            user.save()
+        UserProfile.objects.update_or_create(user=user, defaults={'role': 'admin'})
+        return user
+
+    def ensure_users(self):
+        missing = BENCHMARK_MIN_USERS - User.objects.count()
+        for i in range(missing):
+            user = User(username=f'{BENCHMARK_USERNAME}_user{i}', first_name='Benchmark')
+            user.set_unusable_password()
+            user.save()  # the post_save signal creates the profile
+
+    def urls(self, only, skip):
+        """(name, URL pattern) of every core URL"""
+        for pattern in urlpatterns:
+            name = pattern.name
+            if (only and name not in only) or name in skip:
+                continue
+            yield name, pattern
+
+    def path(self, pattern, kwargs=None):
+        if pattern.name is None:
+            return '/' + str(pattern.pattern)
+        return reverse(pattern.name, kwargs=kwargs)
+
+    def invoice_kwargs(self):
+        facture = Facture.objects.order_by('pk').first()
+        if facture is None:
+            raise SkipView('no invoice in the database, create one from /facture/')
+        return {'pk': facture.pk, 'fmt': 'pdf'}
+
+    def bulk_delete_request(self, name):
+        model, key = BULK_DELETE_VIEWS[name]
+        ids = list(model.objects.order_by('pk').values_list('pk', flat=True)[:BULK_DELETE_SIZE])
+        if not ids:
+            raise SkipView(f'no {model._meta.verbose_name} in the database')
+        return {}, {'data': json.dumps({key: ids}), 'content_type': 'application/json'}
+
+    def import_request(self, name):
+        if name == 'import_clients_csv':
+            header = ['first name', 'last name', 'phone', 'email']
+            rows = [['Benchmark', f'Client {i}', '0600000000', f'{BENCHMARK_USERNAME}{i}@example.com']
+                    for i in range(IMPORT_ROWS)]
+        elif name == 'import_animals_csv':
+            owner = ClientModel.objects.create(
+                nom='Benchmark', prenom='Client', telephone='0600000000', email=f'{BENCHMARK_USERNAME}@example.com',
+            )
+            header = ['name', 'type', 'breed', 'age', 'client email']
+            rows = [[f'Animal {i}', 'Chien', 'Labrador', '3', owner.email] for i in range(IMPORT_ROWS)]
+        else:
+            supplier = self.new_supplier()
+            # Well stocked: no alert, whose log entry would be one INSERT per
+            # row here (synchronous logs) instead of a buffered batch
+            header = ['name', 'category', 'quantity', 'price', 'expiration', 'supplier']
+            rows = [[f'Produit {i}', 'Benchmark', '1000', '25.00', '2030-01-01', supplier.nom]
+                    for i in range(IMPORT_ROWS)]
+        content = io.StringIO()
+        writer = csv.writer(content)
+        writer.writerow(header)
+        writer.writerows(rows)
+        upload = SimpleUploadedFile(f'{name}.csv', content.getvalue().encode('utf-8'), content_type='text/csv')
+        return {}, {'data': {'file': upload}}
+
+    def checkout_request(self, name):
+        produit_id = Produit.objects.filter(quantite__gt=0).order_by('pk').values_list('pk', flat=True).first()
+        if produit_id is None:
+            raise SkipView('no product in stock')
+        body = {'items': [{'id': produit_id, 'quantity': 1}]}
+        return {}, {'data': json.dumps(body), 'content_type': 'application/json'}
+
+    def delete_category_request(self, name):
+        return {'category_id': Categorie.objects.create(nom='Benchmark').pk}, {}
+
+    def delete_supplier_request(self, name):
+        return {'supplier_id': self.new_supplier().pk}, {}
+
+    def new_supplier(self):
+        return Fournisseur.objects.create(
+            nom='Benchmark', telephone='0600000000', email=f'{BENCHMARK_USERNAME}@example.com', adresse='-',
+        )
+
+    def request(self, client, pattern):
+        name = pattern.name
+        metrics = RequestMetrics()
+        with ExitStack() as stack:
+            if name in POST_REQUESTS:
+                stack.enter_context(transaction.atomic())
+                stack.callback(transaction.set_rollback, True)
+                # Logs are written synchronously so they are rolled back too
+                stack.enter_context(override_settings(LOG_BUFFER_SYNC=True))
+                kwargs, post = getattr(self, POST_REQUESTS[name])(name)
+                path = self.path(pattern, kwargs)
+            else:
+                kwargs = getattr(self, URL_KWARGS[name])() if name in URL_KWARGS else None
+                path = self.path(pattern, kwargs)
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            start = time.perf_counter()
+            if name in POST_REQUESTS:
+                response = client.post(path, **post)
+            else:
+                response = client.get(path)
+            # Streamed exports run their queries while being consumed
+            size = len(b''.join(response.streaming_content) if response.streaming else response.content)
+            elapsed = time.perf_counter() - start
+        return path, response, size, elapsed, metrics
+
+    def measure(self, client, pattern, repeat):
+        self.request(client, pattern)  # warm-up: caches, connections, template loading
+        timings = []
+        for _ in range(max(1, repeat)):
+            path, response, size, elapsed, metrics = self.request(client, pattern)
+            timings.append(elapsed)
+        return {
+            'path': path,
+            'method': 'POST' if pattern.name in POST_REQUESTS else 'GET',
+            'status': response.status_code,
+            'bytes': size,
+            'queries': metrics.query_count,
+            'db_ms': round(metrics.db_time * 1000, 3),
+            'median_ms': round(statistics.median(timings) * 1000, 3),
+            'best_ms': round(min(timings) * 1000, 3),
+        }
+
+    def save(self, results, output):
+        if output:
+            path = Path(output)
+        else:
+            path = Path(settings.BASE_DIR) / 'benchmark_results' / f'views-{timezone.now():%Y%m%d-%H%M%S}.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'created': timezone.now().isoformat(),
+            'commit': _git_commit(),
+            'database': _row_counts(),
+            'results': results,
+        }
+        path.write_text(json.dumps(data, indent=2))
+        return path
+
+    def compare(self, results, previous_file, tolerance):
+        try:
+            previous = json.loads(Path(previous_file).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read {previous_file}: {e}')
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n=== compared with {previous.get('commit') or previous_file} ({previous.get('created')}) ==="
+        ))
+        # Log rows grow with every run (page views), the other tables shouldn't
+        current = _row_counts()
+        if any(previous.get('database', {}).get(table) != count for table, count in current.items() if table != 'Log'):
+            self.stdout.write(self.style.WARNING('Row counts differ from the previous run: timings are not comparable.'))
+
+        for label, result in results.items():
+            old = previous.get('results', {}).get(label)
+            if old is None:
+                self.stdout.write(f'{label}: new')
+                continue
+            query_delta = result['queries'] - old['queries']
+            ratio = result['median_ms'] / old['median_ms'] if old['median_ms'] else 1.0
+            regression = query_delta > 0 or (
+                ratio > 1 + tolerance and result['median_ms'] - old['median_ms'] > 1
+            )
+            line = (f"{label}: {old['median_ms']:.1f} -> {result['median_ms']:.1f} ms ({(ratio - 1) * 100:+.0f}%), "
+                    f"queries {old['queries']} -> {result['queries']}")
+            self.stdout.write(self.style.ERROR(f'{line}  REGRESSION') if regression else line)
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.forecasting import ForecastUnavailable, forecast
+
+
+class Command(BaseCommand):
+    help = "Forecast every product's stockout date and print the suggested orders per supplier"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--supplier', type=int, help='Only this supplier (Fournisseur id)')
+        parser.add_argument('--limit', type=int, default=50, help='Products listed (most urgent first, default 50)')
+        parser.add_argument('--refresh', action='store_true',
+                            help="Rebuild today's demand model instead of reading the cached one")
+
+    def handle(self, *args, **options):
+        try:
+            result = forecast(supplier_id=options['supplier'], reorder_only=True, limit=options['limit'], refresh=options['refresh'])
+        except ForecastUnavailable as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Forecast of {result['date']}")
+        for supplier in result['suppliers']:
+            if supplier['products_to_reorder']:
+                self.stdout.write(
+                    f"{supplier['nom']}: {supplier['products_to_reorder']} product(s), {supplier['units']} unit(s), "
+                    f"{supplier['cost']:.2f} MAD ({supplier['stockout_within_lead_time']} out of stock within the lead time)"
+                )
+        for product in result['products']:
+            days = product['days_until_stockout']
+            self.stdout.write(
+                f"  {product['nom']} [{product['fournisseur']}]: {product['quantite']} in stock, "
+                f"{product['daily_rate']}/day, {'no consumption' if days is None else f'{days} day(s) left'}, "
+                f"order {product['suggested_order']}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"{len(result['products'])} product(s) to reorder listed."))
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.invoicing import create_month_invoices, month_invoices, parse_month, render_invoices
+
+
+class Command(BaseCommand):
+    help = "Invoice a month's completed reservations (one invoice per client) and render the PDF/HTML files"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Month to invoice, as YYYY-MM (default: last month)')
+        parser.add_argument('--no-render', action='store_true', help='Only create the invoices')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'INVOICE_RENDER_WORKERS', None),
+            help='Render processes (default: INVOICE_RENDER_WORKERS, or one per CPU)',
+        )
+
+    def handle(self, *args, **options):
+        if options['month']:
+            try:
+                year, month = parse_month(options['month'])
+            except ValueError as e:
+                raise CommandError(str(e))
+        else:
+            today = timezone.localdate()
+            year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+
+        invoices, lines = create_month_invoices(year, month)
+        self.stdout.write(self.style.SUCCESS(f'{year}-{month:02d}: {lines} reservation(s) billed on {invoices} invoice(s).'))
+        if not options['no_render']:
+            rendered, skipped = render_invoices(month_invoices(year, month), workers=options['workers'], stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} invoice(s), {skipped} unchanged.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import IMPORT_CHUNK_SIZE, IMPORTERS, ImportFormatError, open_csv
+from core.utils import log_import
+
+
+class Command(BaseCommand):
+    help = 'Import clients, animals or products from a CSV file (same columns as the CSV exports)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(IMPORTERS), help='What the file contains')
+        parser.add_argument('path', help='CSV file (UTF-8, header row required)')
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='Rows per bulk_create')
+
+    def handle(self, *args, **options):
+        importer = IMPORTERS[options['kind']](chunk_size=options['chunk_size'])
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as handle:
+                report = importer.run(open_csv(handle))
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['path']}: {e}")
+        except (ImportFormatError, UnicodeDecodeError) as e:
+            raise CommandError(f'Import failed: {e}')
+        elapsed = time.perf_counter() - start
+
+        log_import(None, importer.model.__name__, report.created, report.error_count)
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"Line {error['line']}: {error['message']}"))
+        if report.error_count > len(report.errors):
+            self.stdout.write(self.style.WARNING(f'... {report.error_count - len(report.errors)} more error(s)'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report.created} {options["kind"]} in {elapsed:.1f} s, {report.error_count} row(s) rejected.'
+        ))
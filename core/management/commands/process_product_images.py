@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.images import DEFAULT_WORKERS, process_produit_image, prune_renditions
+from core.models import Produit
+
+
+class Command(BaseCommand):
+    help = 'Build the missing or outdated renditions of the product images (existing uploads, failed runs)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild the renditions of every product image (e.g. after changing IMAGE_RENDITION_QUALITY)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'IMAGE_WORKERS', DEFAULT_WORKERS),
+            help='Parallel image workers (default: IMAGE_WORKERS)',
+        )
+        parser.add_argument('--prune', action='store_true', help='Delete rendition files no product uses anymore')
+
+    def handle(self, *args, **options):
+        products = Produit.objects.exclude(image='').exclude(image__isnull=True).values_list('pk', 'image', 'image_renditions')
+        pending = [
+            (pk, image) for pk, image, renditions in products.iterator()
+            if options['force'] or (renditions or {}).get('source') != image
+        ]
+
+        processed = 0
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            for result in executor.map(lambda item: process_produit_image(*item, overwrite=options['force']), pending):
+                if result is not None:
+                    processed += 1
+        self.stdout.write(self.style.SUCCESS(f'Processed {processed}/{len(pending)} product image(s).'))
+
+        if options['prune']:
+            self.stdout.write(f'Deleted {prune_renditions()} unused rendition file(s).')
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.inventory import INVENTORY_STATS_PK, compute_inventory_stats, rebuild_inventory_stats
+from core.models import InventoryStats
+
+FIELDS = ('total_products', 'total_value')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized inventory statistics and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only compare the stored figures with the Produit table; exit with an error on drift',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            stored = InventoryStats.objects.filter(pk=INVENTORY_STATS_PK).values(*FIELDS).first()
+            actual = compute_inventory_stats()
+        else:
+            stored, actual = rebuild_inventory_stats()
+
+        if stored is None:
+            drift = ['no inventory statistics record']
+        else:
+            drift = [
+                f"{field}: stored {stored[field]}, actual {actual[field]}"
+                for field in FIELDS
+                if stored[field] != actual[field]
+            ]
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Inventory statistics are in sync.'))
+            return
+
+        for line in drift:
+            self.stdout.write(self.style.WARNING(f'Drift - {line}'))
+        if options['check']:
+            raise CommandError('Inventory statistics drifted; run rebuild_inventory_stats to fix them.')
+        self.stdout.write(self.style.SUCCESS('Inventory statistics rebuilt.'))
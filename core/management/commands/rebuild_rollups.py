@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.rollups import ROLLUP_METRICS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Backfill the report chart rollups from their source tables (once after migrating, or to repair drift)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'metrics',
+            nargs='*',
+            help=f"Metrics to rebuild (default: all of {', '.join(ROLLUP_METRICS)})",
+        )
+
+    def handle(self, *args, **options):
+        keys = options['metrics'] or list(ROLLUP_METRICS)
+        unknown = [key for key in keys if key not in ROLLUP_METRICS]
+        if unknown:
+            raise CommandError(f"Unknown metric(s): {', '.join(unknown)}")
+
+        for key in keys:
+            started = time.monotonic()
+            rows = rebuild_rollups([key])[key]
+            self.stdout.write(self.style.SUCCESS(f'{key}: {rows} rollup row(s) in {time.monotonic() - started:.1f}s'))
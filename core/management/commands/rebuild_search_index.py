@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.search import SEARCH_INDEXES, rebuild_index, search_enabled
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search indexes from the database tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes',
+            nargs='*',
+            help=f"Indexes to rebuild (default: all of {', '.join(SEARCH_INDEXES)})",
+        )
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('Full-text search indexes are only available on SQLite.')
+
+        keys = options['indexes'] or list(SEARCH_INDEXES)
+        unknown = [key for key in keys if key not in SEARCH_INDEXES]
+        if unknown:
+            raise CommandError(f"Unknown index(es): {', '.join(unknown)}")
+
+        for key in keys:
+            count = rebuild_index(key)
+            self.stdout.write(self.style.SUCCESS(f'{key}: indexed {count} row(s)'))
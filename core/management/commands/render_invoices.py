@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.invoicing import month_invoices, parse_month, render_invoices
+from core.models import Facture
+
+
+class Command(BaseCommand):
+    help = 'Render the PDF/HTML files of the invoices that changed since their last rendering'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', help='Only the invoices issued this month (YYYY-MM)')
+        parser.add_argument('--force', action='store_true', help='Render every invoice again, even unchanged ones')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'INVOICE_RENDER_WORKERS', None),
+            help='Render processes (default: INVOICE_RENDER_WORKERS, or one per CPU)',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        queryset = Facture.objects.all()
+        if options['month']:
+            try:
+                queryset = month_invoices(*parse_month(options['month']))
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        rendered, skipped = render_invoices(queryset, workers=options['workers'], force=options['force'], stdout=self.stdout)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} invoice(s), {skipped} unchanged.'))
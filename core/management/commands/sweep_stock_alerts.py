@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.alerts import sweep_all, sweep_expiry
+
+
+class Command(BaseCommand):
+    help = 'Open the expiry alerts of the products entering the expiry window (run daily, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Re-evaluate every product, low stock included (repairs the alerts after bulk changes)')
+
+    def handle(self, *args, **options):
+        opened, resolved = sweep_all() if options['full'] else sweep_expiry()
+        self.stdout.write(self.style.SUCCESS(f'Stock alerts: {opened} opened, {resolved} resolved.'))
@@ -0,0 +1,90 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from django.template.backends.django import DjangoTemplates, Template
+
+_current_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Per-request counters: SQL queries and their time, template render time.
+
+    Installed as a connection execute_wrapper by RequestMetricsMiddleware;
+    it only adds a perf_counter() pair and a tuple append per query.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.query_count = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.statements = []
+        self._template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.query_count += 1
+            self.db_time += duration
+            self.statements.append((sql, duration))
+
+    @property
+    def total_time(self):
+        return time.perf_counter() - self.start
+
+    def repeated_statements(self, limit=5):
+        """Most repeated SQL statements (parameters left out): N+1 suspects"""
+        counts = Counter(sql for sql, _ in self.statements)
+        return [(sql, count) for sql, count in counts.most_common(limit) if count > 1]
+
+    def slowest_statements(self, limit=5):
+        return sorted(self.statements, key=lambda statement: statement[1], reverse=True)[:limit]
+
+
+def current_metrics():
+    """Metrics of the request being processed in this thread, if any"""
+    return _current_metrics.get()
+
+
+def start_request_metrics():
+    metrics = RequestMetrics()
+    return metrics, _current_metrics.set(metrics)
+
+
+def stop_request_metrics(token):
+    _current_metrics.reset(token)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        metrics = current_metrics()
+        if metrics is None:
+            return super().render(context, request)
+        # Only time the outermost render (e.g. render_to_string inside a tag)
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if not metrics._template_depth:
+                metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates backend recording template render time in the
+    current request metrics (queries run by lazy querysets while
+    rendering are included)
+    """
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
@@ -4,8 +4,24 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.utils import timezone
 from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
 from .utils import log_activity
+from .logbuffer import log_buffer
+from .metrics import start_request_metrics, stop_request_metrics
+from contextlib import ExitStack
 import datetime
+import logging
+import mimetypes
+import os
+import random
+
+perf_logger = logging.getLogger('core.perf')
 
 class ActivityLoggingMiddleware(MiddlewareMixin):
     """
@@ -33,13 +49,25 @@ class ActivityLoggingMiddleware(MiddlewareMixin):
             ]
             
             if not any(skip_view in view_name for skip_view in skip_views):
-                # Log the page view
-                log_activity(
-                    request=request,
-                    action='view',
-                    description=f"Viewed page: {view_name}",
-                    table_cible='page_view'
-                )
+                if getattr(settings, 'ACTIVITY_LOG_PAGE_VIEWS', 'full') == 'aggregate':
+                    # Count the view; only a sample is also logged in full
+                    log_buffer.count_page_view(request.user.id, view_name)
+                    sample_rate = getattr(settings, 'PAGE_VIEW_SAMPLE_RATE', 0)
+                    if sample_rate and random.random() < sample_rate:
+                        log_activity(
+                            request=request,
+                            action='view',
+                            description=f"Viewed page: {view_name} (sampled)",
+                            table_cible='page_view'
+                        )
+                else:
+                    # Log the page view
+                    log_activity(
+                        request=request,
+                        action='view',
+                        description=f"Viewed page: {view_name}",
+                        table_cible='page_view'
+                    )
                 
                 # Mark as logged to prevent duplicate entries
                 request._activity_logged = True
@@ -50,10 +78,24 @@ class ActivityLoggingMiddleware(MiddlewareMixin):
 class AutoLogoutMiddleware(MiddlewareMixin):
     """
     Middleware to automatically logout users after inactivity
+
+    The last activity timestamp is only written back to the session when it
+    moved forward by more than AUTO_LOGOUT_GRANULARITY seconds, so most
+    requests leave the session unmodified and cause no session write.
+    Since the stored timestamp can lag by up to one granularity, users are
+    logged out once idle for AUTO_LOGOUT_DELAY plus that granularity at most,
+    never before AUTO_LOGOUT_DELAY.
     """
 
     def process_request(self, request):
         if hasattr(request, 'user') and request.user.is_authenticated:
+            now = timezone.now()
+            elapsed = None
+
+            # Timeout in seconds (default: 30 minutes)
+            timeout = getattr(settings, 'AUTO_LOGOUT_DELAY', 1800)
+            granularity = getattr(settings, 'AUTO_LOGOUT_GRANULARITY', 60)
+
             # Get the last activity time from session
             last_activity = request.session.get('last_activity')
 
@@ -61,13 +103,9 @@ class AutoLogoutMiddleware(MiddlewareMixin):
                 # Convert string back to datetime and check inactivity
                 try:
                     last_activity = datetime.datetime.fromisoformat(last_activity)
-                    now = timezone.now()
                     elapsed = (now - last_activity).total_seconds()
 
-                    # Timeout in seconds (default: 30 minutes)
-                    timeout = getattr(settings, 'AUTO_LOGOUT_DELAY', 1800)
-
-                    if elapsed > timeout:
+                    if elapsed > timeout + granularity:
                         # Log and perform auto logout
                         log_activity(
                             request=request,
@@ -83,9 +121,124 @@ class AutoLogoutMiddleware(MiddlewareMixin):
 
                 except (ValueError, TypeError):
                     # Ignore parsing issues and reset timestamp below
-                    pass
+                    elapsed = None
 
-            # Update last activity time
-            request.session['last_activity'] = timezone.now().isoformat()
+            # Update last activity time, only once per granularity period
+            if elapsed is None or elapsed >= granularity:
+                request.session['last_activity'] = now.isoformat()
 
         return None
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware recording per-request SQL query count, DB time, template
+    render time and total time.
+
+    The figures are sent as a Server-Timing header (visible in the browser
+    dev tools) and requests over the PERF_QUERY_BUDGET / PERF_TIME_BUDGET_MS
+    budgets are logged to the 'core.perf' logger with their most repeated
+    and slowest SQL statements.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not getattr(settings, 'PERF_METRICS_ENABLED', True):
+            return self.get_response(request)
+
+        metrics, token = start_request_metrics()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            stop_request_metrics(token)
+
+        total_time = metrics.total_time
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.query_count} queries"',
+            f'tpl;dur={metrics.template_time * 1000:.1f};desc="Templates"',
+            f'total;dur={total_time * 1000:.1f};desc="Total"',
+        ])
+        self.check_budgets(request, metrics, total_time)
+        return response
+
+    def check_budgets(self, request, metrics, total_time):
+        query_budget = getattr(settings, 'PERF_QUERY_BUDGET', None)
+        time_budget = getattr(settings, 'PERF_TIME_BUDGET_MS', None)
+        over_queries = query_budget is not None and metrics.query_count > query_budget
+        over_time = time_budget is not None and total_time * 1000 > time_budget
+        if not (over_queries or over_time):
+            return
+
+        lines = [
+            f"{request.method} {request.path} over budget: {metrics.query_count} queries "
+            f"(db {metrics.db_time * 1000:.1f} ms), templates {metrics.template_time * 1000:.1f} ms, "
+            f"total {total_time * 1000:.1f} ms"
+        ]
+        for sql, count in metrics.repeated_statements():
+            lines.append(f"  x{count}: {sql}")
+        for sql, duration in metrics.slowest_statements():
+            lines.append(f"  {duration * 1000:.1f} ms: {sql}")
+        perf_logger.warning('\n'.join(lines))
+
+
+class StaticAssetsMiddleware:
+    """
+    Serve the collected static files (STATIC_ROOT, see core/staticfiles.py).
+
+    Content-hashed names never change content: they are sent with a one year
+    immutable Cache-Control, so repeat page loads don't even revalidate them.
+    The precompressed .br/.gz variant is sent when the browser accepts it.
+    Other files must be revalidated (Last-Modified / If-Modified-Since).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.prefix = settings.STATIC_URL if settings.STATIC_URL.startswith('/') else '/' + settings.STATIC_URL
+        self.root = getattr(settings, 'STATIC_ROOT', None)
+        # Hashed names of the manifest, loaded once per process
+        self.hashed_names = frozenset(staticfiles_storage.hashed_files.values())
+
+    def __call__(self, request):
+        if self.root and request.method in ('GET', 'HEAD') and request.path.startswith(self.prefix):
+            response = self.serve(request, request.path[len(self.prefix):])
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request, name):
+        try:
+            path = safe_join(self.root, name)
+        except SuspiciousFileOperation:
+            return None
+        if not name or not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        immutable = name in self.hashed_names
+        if not immutable and not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), int(stat.st_mtime)):
+            return HttpResponseNotModified()
+
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        accepted = {encoding.split(';')[0].strip() for encoding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(',')}
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if candidate in accepted and os.path.isfile(path + suffix):
+                encoding, path = candidate, path + suffix
+                break
+
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if immutable:
+            response['Cache-Control'] = 'public, max-age=31536000, immutable'
+        else:
+            response['Cache-Control'] = 'public, max-age=0, must-revalidate'
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_produit_description_produit_image'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='reservation',
+            name='date_reservation',
+            field=models.DateTimeField(db_index=True),
+        ),
+    ]
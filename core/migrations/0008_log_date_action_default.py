@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_reservation_date_reservation_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='log',
+            name='date_action',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
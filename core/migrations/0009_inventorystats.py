@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:04
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_inventory_stats(apps, schema_editor):
+    Produit = apps.get_model('core', 'Produit')
+    InventoryStats = apps.get_model('core', 'InventoryStats')
+    money = DecimalField(max_digits=20, decimal_places=2)
+    figures = Produit.objects.aggregate(
+        total_products=Count('id'),
+        low_stock_count=Count('id', filter=Q(quantite__lte=10)),
+        total_value=Coalesce(Sum(F('prix') * F('quantite'), output_field=money), Decimal('0'), output_field=money),
+    )
+    InventoryStats.objects.update_or_create(pk=1, defaults=figures)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_log_date_action_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_products', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('total_value', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'inventory stats',
+            },
+        ),
+        migrations.RunPython(build_inventory_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# Frozen copy of core.search.SEARCH_INDEXES at the time of this migration
+SEARCH_INDEXES = {
+    'client': ('core', 'Client', ['nom', 'prenom', 'telephone', 'email']),
+    'animal': ('core', 'Animal', ['nom', 'type', 'race', 'client__nom', 'client__prenom']),
+    'reservation': ('core', 'Reservation', ['client__nom', 'client__prenom', 'animal__nom', 'service', 'statut']),
+    'produit': ('core', 'Produit', ['nom', 'categorie__nom', 'fournisseur__nom', 'description']),
+    'rapport': ('core', 'RapportEnvoye', ['user__username', 'user__first_name', 'user__last_name', 'sujet', 'destinataire']),
+    'user': ('auth', 'User', ['username', 'first_name', 'last_name', 'email', 'profile__role']),
+    'log': ('core', 'Log', ['user__username', 'user__first_name', 'user__last_name', 'action', 'description', 'table_cible']),
+}
+
+
+def create_search_indexes(apps, schema_editor):
+    # FTS5 is SQLite only; other databases fall back to icontains filters
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for key, (app_label, model_name, fields) in SEARCH_INDEXES.items():
+            table = f'core_search_{key}'
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                f"body, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+            )
+            model = apps.get_model(app_label, model_name)
+            rows = model.objects.order_by('pk').values_list('pk', *fields).iterator(chunk_size=500)
+            batch = []
+            for row in rows:
+                batch.append((row[0], ' '.join(str(value) for value in row[1:] if value not in (None, ''))))
+                if len(batch) >= 500:
+                    cursor.executemany(f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)', batch)
+                    batch = []
+            if batch:
+                cursor.executemany(f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)', batch)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for key in SEARCH_INDEXES:
+            cursor.execute(f'DROP TABLE IF EXISTS core_search_{key}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_inventorystats'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['date_action'], name='core_log_date_action_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['action', 'date_action'], name='core_log_action_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='log',
+            index=models.Index(fields=['user', 'date_action'], name='core_log_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['quantite'], name='core_produit_quantite_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['date_expiration'], name='core_produit_expiration_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_hot_column_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PageViewCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_name', models.CharField(max_length=200)),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-bucket_start'],
+                'indexes': [models.Index(fields=['bucket_start'], name='core_pageview_bucket_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'view_name', 'bucket_start'), name='core_pageview_unique_bucket')],
+            },
+        ),
+    ]
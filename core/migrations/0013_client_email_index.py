@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_pageviewcount'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='client',
+            name='email',
+            field=models.EmailField(db_index=True, max_length=254),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_client_email_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='image_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import DateTimeField, ExpressionWrapper, F
+
+# Frozen copy of core.scheduling.DEFAULT_SERVICE_DURATIONS
+SERVICE_DURATIONS = {
+    'Consultation': 30,
+    'Vaccination': 15,
+    'Contrôle': 20,
+    'Toilettage': 60,
+    'Détartrage': 45,
+    'Chirurgie': 120,
+}
+DEFAULT_DURATION = 30
+
+
+def fill_durations(apps, schema_editor):
+    Reservation = apps.get_model('core', 'Reservation')
+    for service, minutes in SERVICE_DURATIONS.items():
+        Reservation.objects.filter(service__iexact=service).update(duree_minutes=minutes)
+    for minutes in set(SERVICE_DURATIONS.values()) | {DEFAULT_DURATION}:
+        Reservation.objects.filter(duree_minutes=minutes).update(date_fin=ExpressionWrapper(
+            F('date_reservation') + timedelta(minutes=minutes), output_field=DateTimeField(),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_produit_image_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='duree_minutes',
+            field=models.PositiveIntegerField(default=30),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='date_fin',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(fill_durations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='date_fin',
+            field=models.DateTimeField(),
+        ),
+        # Replaced by the composite index, which has the same leading column
+        migrations.AlterField(
+            model_name='reservation',
+            name='date_reservation',
+            field=models.DateTimeField(),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['date_reservation', 'date_fin'], name='reservation_interval_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:34
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_reservation_duration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Facture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=30, unique=True)),
+                ('date_emission', models.DateField(default=django.utils.timezone.localdate)),
+                ('statut', models.CharField(choices=[('Draft', 'Draft'), ('Issued', 'Issued'), ('Paid', 'Paid'), ('Cancelled', 'Cancelled')], default='Issued', max_length=20)),
+                ('taux_tva', models.DecimalField(decimal_places=2, default=20, max_digits=5)),
+                ('total_ht', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_tva', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_ttc', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('empreinte', models.CharField(blank=True, max_length=64)),
+                ('fichier_pdf', models.CharField(blank=True, max_length=255)),
+                ('fichier_html', models.CharField(blank=True, max_length=255)),
+                ('date_rendu', models.DateTimeField(blank=True, null=True)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='factures', to='core.client')),
+            ],
+            options={
+                'ordering': ['-date_emission', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneFacture',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('description', models.CharField(max_length=255)),
+                ('quantite', models.PositiveIntegerField(default=1)),
+                ('prix_unitaire', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('facture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='core.facture')),
+                ('produit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lignes_facture', to='core.produit')),
+                ('reservation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lignes_facture', to='core.reservation')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='facture',
+            index=models.Index(fields=['date_emission'], name='core_facture_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lignefacture',
+            constraint=models.UniqueConstraint(condition=models.Q(('reservation__isnull', False)), fields=('reservation',), name='core_lignefacture_unique_reservation'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:39
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_facture'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Vente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_vente', models.DateTimeField(default=django.utils.timezone.now)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventes', to='core.client')),
+                ('facture', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventes', to='core.facture')),
+                ('vendeur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date_vente'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LigneVente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom_produit', models.CharField(max_length=100)),
+                ('quantite', models.PositiveIntegerField()),
+                ('prix_unitaire', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('produit', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lignes_vente', to='core.produit')),
+                ('vente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lignes', to='core.vente')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='vente',
+            index=models.Index(fields=['date_vente'], name='core_vente_date_idx'),
+        ),
+    ]
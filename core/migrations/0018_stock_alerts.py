@@ -0,0 +1,65 @@
+from datetime import timedelta
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BATCH_SIZE = 1000
+
+
+def open_initial_alerts(apps, schema_editor):
+    """Alerts of the existing products (no product/category thresholds yet)"""
+    Produit = apps.get_model('core', 'Produit')
+    StockAlert = apps.get_model('core', 'StockAlert')
+    threshold = getattr(settings, 'STOCK_ALERT_THRESHOLD', 10)
+    limit = timezone.localdate() + timedelta(days=getattr(settings, 'STOCK_EXPIRY_ALERT_DAYS', 30))
+
+    low = Produit.objects.filter(quantite__lte=threshold).values_list('id', 'quantite')
+    alerts = [StockAlert(produit_id=pk, type='low_stock', quantite=quantite, seuil=threshold) for pk, quantite in low.iterator()]
+    expiring = Produit.objects.filter(date_expiration__lte=limit).values_list('id', 'quantite', 'date_expiration')
+    alerts += [
+        StockAlert(produit_id=pk, type='expiring', quantite=quantite, date_expiration=date_expiration)
+        for pk, quantite, date_expiration in expiring.iterator()
+    ]
+    StockAlert.objects.bulk_create(alerts, batch_size=BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_vente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categorie',
+            name='seuil_stock',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='produit',
+            name='seuil_stock',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('low_stock', 'Low stock'), ('expiring', 'Expiring soon')], max_length=20)),
+                ('quantite', models.PositiveIntegerField()),
+                ('seuil', models.PositiveIntegerField(blank=True, null=True)),
+                ('date_expiration', models.DateField(blank=True, null=True)),
+                ('date_ouverture', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_resolution', models.DateTimeField(blank=True, null=True)),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes', to='core.produit')),
+            ],
+            options={
+                'ordering': ['-date_ouverture'],
+                'indexes': [models.Index(condition=models.Q(('date_resolution__isnull', True)), fields=['type', 'date_ouverture'], name='core_stockalert_open_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('date_resolution__isnull', True)), fields=('produit', 'type'), name='core_stockalert_unique_open')],
+            },
+        ),
+        migrations.RunPython(open_initial_alerts, migrations.RunPython.noop),
+    ]
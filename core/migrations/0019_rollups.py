@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:54
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import DateField, Min, OuterRef, Subquery
+from django.db.models.functions import Cast, Coalesce, Least
+from django.utils import timezone
+
+
+def date_existing_animals(apps, schema_editor):
+    """Existing animals were registered at the latest by their first appointment"""
+    Animal = apps.get_model('core', 'Animal')
+    Reservation = apps.get_model('core', 'Reservation')
+    today = timezone.localdate()
+    first_visit = (
+        Reservation.objects.filter(animal=OuterRef('pk')).order_by()
+        .values('animal').annotate(first=Min('date_reservation')).values('first')
+    )
+    Animal.objects.update(date_ajout=Coalesce(Least(Cast(Subquery(first_visit), DateField()), today), today))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='date_ajout',
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(date_existing_animals, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='MetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metrique', models.CharField(max_length=50)),
+                ('periode', models.CharField(choices=[('day', 'Day'), ('week', 'Week'), ('month', 'Month')], max_length=10)),
+                ('debut', models.DateField()),
+                ('dimension', models.CharField(blank=True, default='', max_length=100)),
+                ('nombre', models.IntegerField(default=0)),
+                ('somme', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'ordering': ['metrique', 'periode', 'debut'],
+                'constraints': [models.UniqueConstraint(fields=('metrique', 'periode', 'debut', 'dimension'), name='core_rollup_unique_bucket')],
+            },
+        ),
+    ]
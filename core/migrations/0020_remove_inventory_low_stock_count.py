@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_rollups'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='inventorystats',
+            name='low_stock_count',
+        ),
+    ]
@@ -2,6 +2,9 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from datetime import timedelta
 
 class UserProfile(models.Model):
     ROLE_CHOICES = [
@@ -63,7 +66,8 @@ class Client(models.Model):
     nom = models.CharField(max_length=100)
     prenom = models.CharField(max_length=100)
     telephone = models.CharField(max_length=20)
-    email = models.EmailField()
+    # Indexed: CSV imports resolve clients by email
+    email = models.EmailField(db_index=True)
 
     def __str__(self):
         return f"{self.prenom} {self.nom}"
@@ -74,6 +78,8 @@ class Animal(models.Model):
     race = models.CharField(max_length=50)
     age = models.PositiveIntegerField()
     client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='animaux')
+    # Registration day (new animals per month, see core/rollups.py)
+    date_ajout = models.DateField(default=timezone.localdate)
 
     def __str__(self):
         return self.nom
@@ -81,16 +87,32 @@ class Animal(models.Model):
 class Reservation(models.Model):
     client = models.ForeignKey(Client, on_delete=models.CASCADE)
     animal = models.ForeignKey(Animal, on_delete=models.CASCADE)
+    # Indexed by reservation_interval_idx (leading column)
     date_reservation = models.DateTimeField()
+    # Length of the appointment; date_fin is derived from it on save
+    duree_minutes = models.PositiveIntegerField(default=30)
+    date_fin = models.DateTimeField()
     service = models.CharField(max_length=100)
     statut = models.CharField(max_length=50)
     note = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Date range lists and overlap checks (see core/scheduling.py)
+            models.Index(fields=['date_reservation', 'date_fin'], name='reservation_interval_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.date_fin = self.date_reservation + timedelta(minutes=self.duree_minutes)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Reservation {self.id} - {self.client}"
 
 class Categorie(models.Model):
     nom = models.CharField(max_length=100)
+    # Low-stock alert threshold of the category's products (blank: STOCK_ALERT_THRESHOLD)
+    seuil_stock = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.nom
@@ -113,11 +135,55 @@ class Produit(models.Model):
     date_expiration = models.DateField()
     fournisseur = models.ForeignKey(Fournisseur, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Resized copies of `image` built by core/images.py: {'source', 'hash', 'thumb': {'name', 'width', 'height'}, ...}
+    image_renditions = models.JSONField(default=dict, blank=True)
     description = models.TextField(blank=True, null=True)
+    # Low-stock alert threshold (blank: the category's)
+    seuil_stock = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Low-stock alerts and expiring-soon counts
+            models.Index(fields=['quantite'], name='core_produit_quantite_idx'),
+            models.Index(fields=['date_expiration'], name='core_produit_expiration_idx'),
+        ]
 
     def __str__(self):
         return self.nom
 
+    def _rendition(self, name):
+        renditions = self.image_renditions or {}
+        # Stale renditions (image replaced, not processed yet) are ignored
+        if not self.image or renditions.get('source') != self.image.name:
+            return None
+        return renditions.get(name)
+
+    def image_url_for(self, name):
+        """URL of a rendition ('thumb', 'card', 'full'), or of the original until it is processed"""
+        if not self.image:
+            return ''
+        rendition = self._rendition(name)
+        return default_storage.url(rendition['name']) if rendition else self.image.url
+
+    @property
+    def image_thumb_url(self):
+        return self.image_url_for('thumb')
+
+    @property
+    def image_card_url(self):
+        return self.image_url_for('card')
+
+    @property
+    def image_srcset(self):
+        """srcset of every rendition, e.g. 'a-thumb.webp 120w, a-card.webp 480w, ...'"""
+        from .images import RENDITION_SIZES
+        candidates = []
+        for name in RENDITION_SIZES:
+            rendition = self._rendition(name)
+            if rendition:
+                candidates.append(f"{default_storage.url(rendition['name'])} {rendition['width']}w")
+        return ', '.join(candidates)
+
 class Log(models.Model):
     ACTION_CHOICES = [
         ('login', 'User Login'),
@@ -144,10 +210,17 @@ class Log(models.Model):
     id_element = models.PositiveIntegerField(null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True, null=True)
-    date_action = models.DateTimeField(auto_now_add=True)
+    date_action = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-date_action']
+        indexes = [
+            # Default ordering, recent logs and the logs page
+            models.Index(fields=['date_action'], name='core_log_date_action_idx'),
+            # Filters by action / by user, newest first
+            models.Index(fields=['action', 'date_action'], name='core_log_action_date_idx'),
+            models.Index(fields=['user', 'date_action'], name='core_log_user_date_idx'),
+        ]
     
     def __str__(self):
         user_name = self.user.get_full_name() if self.user else 'Anonymous'
@@ -162,3 +235,220 @@ class RapportEnvoye(models.Model):
 
     def __str__(self):
         return self.sujet
+
+class InventoryStats(models.Model):
+    """
+    Materialized stock header figures, kept up to date incrementally by the
+    Produit signals (see core/inventory.py). Single row, pk=1.
+    """
+    total_products = models.IntegerField(default=0)
+    total_value = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'inventory stats'
+
+    def __str__(self):
+        return f"Inventory: {self.total_products} products, {self.total_value} MAD"
+
+class PageViewCount(models.Model):
+    """
+    Page views aggregated per user, view name and time bucket, written by the
+    activity log buffer instead of one Log row per page view
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    view_name = models.CharField(max_length=200)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-bucket_start']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'view_name', 'bucket_start'], name='core_pageview_unique_bucket'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket_start'], name='core_pageview_bucket_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user} - {self.view_name} - {self.bucket_start:%Y-%m-%d %H:%M}: {self.count}"
+
+class MetricRollup(models.Model):
+    """
+    Pre-aggregated time series of the report charts: one row per metric,
+    period, bucket start and dimension (e.g. the service), kept up to date
+    incrementally by the model signals (see core/rollups.py)
+    """
+    DAY = 'day'
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIOD_CHOICES = [
+        (DAY, 'Day'),
+        (WEEK, 'Week'),
+        (MONTH, 'Month'),
+    ]
+
+    metrique = models.CharField(max_length=50)
+    periode = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    debut = models.DateField()
+    dimension = models.CharField(max_length=100, blank=True, default='')
+    nombre = models.IntegerField(default=0)
+    somme = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['metrique', 'periode', 'debut']
+        constraints = [
+            # Also the index of the chart range scans
+            models.UniqueConstraint(fields=['metrique', 'periode', 'debut', 'dimension'], name='core_rollup_unique_bucket'),
+        ]
+
+    def __str__(self):
+        return f"{self.metrique} {self.periode} {self.debut} {self.dimension}: {self.nombre} / {self.somme}"
+
+class Facture(models.Model):
+    """
+    Invoice of a client. The totals are maintained from the lines (see
+    core/invoicing.py); the PDF/HTML renderings are content-addressed files
+    named after `empreinte`, the hash of everything they show.
+    """
+    STATUT_CHOICES = [
+        ('Draft', 'Draft'),
+        ('Issued', 'Issued'),
+        ('Paid', 'Paid'),
+        ('Cancelled', 'Cancelled'),
+    ]
+
+    numero = models.CharField(max_length=30, unique=True)
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='factures')
+    date_emission = models.DateField(default=timezone.localdate)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='Issued')
+    taux_tva = models.DecimalField(max_digits=5, decimal_places=2, default=20)
+    total_ht = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_tva = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_ttc = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    empreinte = models.CharField(max_length=64, blank=True)
+    fichier_pdf = models.CharField(max_length=255, blank=True)
+    fichier_html = models.CharField(max_length=255, blank=True)
+    date_rendu = models.DateTimeField(null=True, blank=True)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date_emission', '-id']
+        indexes = [
+            models.Index(fields=['date_emission'], name='core_facture_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Facture {self.numero} - {self.client}"
+
+class LigneFacture(models.Model):
+    facture = models.ForeignKey(Facture, on_delete=models.CASCADE, related_name='lignes')
+    description = models.CharField(max_length=255)
+    quantite = models.PositiveIntegerField(default=1)
+    prix_unitaire = models.DecimalField(max_digits=10, decimal_places=2)
+    # What the line bills: a reservation's service or a product
+    reservation = models.ForeignKey(Reservation, on_delete=models.SET_NULL, null=True, blank=True, related_name='lignes_facture')
+    produit = models.ForeignKey(Produit, on_delete=models.SET_NULL, null=True, blank=True, related_name='lignes_facture')
+
+    class Meta:
+        ordering = ['id']
+        constraints = [
+            # A reservation is billed once
+            models.UniqueConstraint(
+                fields=['reservation'],
+                condition=models.Q(reservation__isnull=False),
+                name='core_lignefacture_unique_reservation',
+            ),
+        ]
+
+    @property
+    def total(self):
+        return self.quantite * self.prix_unitaire
+
+    def __str__(self):
+        return f"{self.description} x{self.quantite}"
+
+class Vente(models.Model):
+    """
+    Store checkout: the stock of its lines was decremented atomically when
+    it was recorded (see core/sales.py)
+    """
+    date_vente = models.DateTimeField(default=timezone.now)
+    vendeur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventes')
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventes')
+    facture = models.ForeignKey(Facture, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventes')
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-date_vente']
+        indexes = [
+            models.Index(fields=['date_vente'], name='core_vente_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"Vente #{self.pk} - {self.total} MAD"
+
+class LigneVente(models.Model):
+    vente = models.ForeignKey(Vente, on_delete=models.CASCADE, related_name='lignes')
+    produit = models.ForeignKey(Produit, on_delete=models.SET_NULL, null=True, related_name='lignes_vente')
+    # Copied at checkout: the product may be renamed, repriced or deleted later
+    nom_produit = models.CharField(max_length=100)
+    quantite = models.PositiveIntegerField()
+    prix_unitaire = models.DecimalField(max_digits=10, decimal_places=2)
+
+    class Meta:
+        ordering = ['id']
+
+    @property
+    def total(self):
+        return self.quantite * self.prix_unitaire
+
+    def __str__(self):
+        return f"{self.nom_produit} x{self.quantite}"
+
+class StockAlert(models.Model):
+    """
+    Low-stock or expiry alert of a product, opened and resolved by
+    core/alerts.py as the product changes. At most one open alert per
+    product and type.
+    """
+    LOW_STOCK = 'low_stock'
+    EXPIRING = 'expiring'
+    TYPE_CHOICES = [
+        (LOW_STOCK, 'Low stock'),
+        (EXPIRING, 'Expiring soon'),
+    ]
+
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='alertes')
+    type = models.CharField(max_length=20, choices=TYPE_CHOICES)
+    # Product state when the alert opened
+    quantite = models.PositiveIntegerField()
+    seuil = models.PositiveIntegerField(null=True, blank=True)
+    date_expiration = models.DateField(null=True, blank=True)
+    date_ouverture = models.DateTimeField(default=timezone.now)
+    date_resolution = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-date_ouverture']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['produit', 'type'],
+                condition=models.Q(date_resolution__isnull=True),
+                name='core_stockalert_unique_open',
+            ),
+        ]
+        indexes = [
+            # Open alerts of the dashboard and stock pages
+            models.Index(
+                fields=['type', 'date_ouverture'],
+                condition=models.Q(date_resolution__isnull=True),
+                name='core_stockalert_open_idx',
+            ),
+        ]
+
+    @property
+    def is_open(self):
+        return self.date_resolution is None
+
+    def __str__(self):
+        return f"{self.get_type_display()}: {self.produit_id}"
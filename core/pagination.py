@@ -0,0 +1,178 @@
+import base64
+import datetime
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_MAX_PAGE_SIZE = 500
+
+
+class KeysetPage:
+    """
+    One page of a keyset (cursor) paginated queryset.
+
+    Iterable like a list, and exposes the opaque cursors to the
+    previous/next pages for the templates.
+    """
+
+    def __init__(self, object_list, page_size, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.page_size = page_size
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+def get_page_size(request):
+    """
+    Page size from the `per_page` query parameter, bounded by the
+    PAGINATION_PAGE_SIZE / PAGINATION_MAX_PAGE_SIZE settings
+    """
+    default = getattr(settings, 'PAGINATION_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE)
+    try:
+        page_size = int(request.GET.get('per_page', default))
+    except (TypeError, ValueError):
+        page_size = default
+    return max(1, min(page_size, maximum))
+
+
+def _cursor_value(value):
+    # DjangoJSONEncoder cuts datetimes to milliseconds: rows less than 1 ms
+    # apart would be skipped or repeated. decode_cursor() parses them back
+    # with the field's to_python().
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(direction, values):
+    """Encode a direction ('n' or 'p') and boundary values into a URL-safe token"""
+    values = [_cursor_value(value) for value in values]
+    raw = json.dumps({'d': direction, 'v': values}, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, model, ordering):
+    """
+    Decode a cursor token back into (direction, values).
+    Returns (None, None) for missing or tampered cursors.
+    """
+    if not token:
+        return None, None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        direction = data['d']
+        raw_values = data['v']
+        if direction not in ('n', 'p') or len(raw_values) != len(ordering):
+            return None, None
+        values = [
+            model._meta.get_field(field.lstrip('-')).to_python(value)
+            for field, value in zip(ordering, raw_values)
+        ]
+    except Exception:
+        return None, None
+    return direction, values
+
+
+def _keyset_filter(ordering, values, backwards):
+    """
+    Build the row-value comparison "(a, b, ...) > (va, vb, ...)" as a Q object,
+    honoring the direction of each ordering field.
+    """
+    condition = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        if backwards:
+            descending = not descending
+        term = Q(**{f"{name}__{'lt' if descending else 'gt'}": values[index]})
+        for previous, value in zip(ordering[:index], values[:index]):
+            term &= Q(**{previous.lstrip('-'): value})
+        condition |= term
+    return condition
+
+
+def _reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+def _row_values(obj, ordering):
+    return [getattr(obj, obj._meta.get_field(field.lstrip('-')).attname) for field in ordering]
+
+
+def keyset_paginate(request, queryset, ordering=('id',), page_size=None):
+    """
+    Paginate a queryset with keyset (seek) pagination.
+
+    Args:
+        request: Django request object (reads `cursor` and `per_page`)
+        queryset: Queryset to paginate (search filters already applied)
+        ordering: Local, non-null fields ending with a unique one, e.g. ('-date_action', '-id')
+        page_size: Overrides the page size taken from the request
+
+    Each page costs one indexed query of page_size + 1 rows, whatever the
+    position in the table.
+    """
+    ordering = list(ordering)
+    page_size = page_size or get_page_size(request)
+    direction, values = decode_cursor(request.GET.get('cursor'), queryset.model, ordering)
+
+    backwards = direction == 'p'
+    qs = queryset
+    if values is not None:
+        qs = qs.filter(_keyset_filter(ordering, values, backwards))
+    qs = qs.order_by(*(_reverse_ordering(ordering) if backwards else ordering))
+
+    rows = list(qs[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    if not rows:
+        return KeysetPage(rows, page_size)
+
+    # Going forward, a previous page exists whenever we came from a cursor;
+    # going backward, a next page always exists (the one we came from).
+    has_next = has_more if not backwards else True
+    has_previous = has_more if backwards else values is not None
+
+    return KeysetPage(
+        rows,
+        page_size,
+        next_cursor=encode_cursor('n', _row_values(rows[-1], ordering)) if has_next else None,
+        prev_cursor=encode_cursor('p', _row_values(rows[0], ordering)) if has_previous else None,
+    )
+
+
+def lazy_keyset_paginate(request, queryset, **kwargs):
+    """
+    keyset_paginate() run on first use of the page: the query is skipped
+    when the template serves the list from a cached fragment
+    """
+    return SimpleLazyObject(lambda: keyset_paginate(request, queryset, **kwargs))
@@ -0,0 +1,90 @@
+import zlib
+
+# A4 portrait, in points
+PAGE_WIDTH = 595.28
+PAGE_HEIGHT = 841.89
+
+# Helvetica advance widths (1/1000 em) of the characters used in amounts and
+# short labels; other characters use the average width
+_HELVETICA_WIDTHS = {
+    ' ': 278, '.': 278, ',': 278, ':': 278, '-': 333, '%': 889, '(': 333, ')': 333, '/': 278,
+    **{digit: 556 for digit in '0123456789'},
+    'M': 833, 'A': 667, 'D': 722, 'T': 611, 'V': 667,
+}
+_AVERAGE_WIDTH = 520
+_BOLD_FACTOR = 1.05
+
+
+def _escape(text):
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def text_width(text, size, bold=False):
+    """Approximate width of a Helvetica string, in points"""
+    units = sum(_HELVETICA_WIDTHS.get(char, _AVERAGE_WIDTH) for char in text)
+    return units * size / 1000 * (_BOLD_FACTOR if bold else 1)
+
+
+class PdfDocument:
+    """
+    Minimal PDF 1.4 writer: text in the standard Helvetica fonts (WinAnsi
+    encoding, so French accents work), lines and filled rectangles on A4
+    pages. Enough for invoices without a PDF library dependency.
+    """
+
+    def __init__(self):
+        self.pages = []
+        self.add_page()
+
+    def add_page(self):
+        self.pages.append([])
+
+    def _draw(self, operation):
+        self.pages[-1].append(operation)
+
+    def text(self, x, y, text, size=10, bold=False, align='left'):
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        elif align == 'center':
+            x -= text_width(text, size, bold) / 2
+        font = b'/F2' if bold else b'/F1'
+        self._draw(b'BT %s %g Tf %.2f %.2f Td (%s) Tj ET' % (font, size, x, y, _escape(text)))
+
+    def line(self, x1, y1, x2, y2, width=0.5, gray=0.6):
+        self._draw(b'%.2f G %g w %.2f %.2f m %.2f %.2f l S' % (gray, width, x1, y1, x2, y2))
+
+    def rect(self, x, y, width, height, gray=0.93):
+        self._draw(b'%.2f g %.2f %.2f %.2f %.2f re f 0 g' % (gray, x, y, width, height))
+
+    def render(self):
+        """The document as bytes"""
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # page tree, once the page ids are known
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        page_ids = []
+        for operations in self.pages:
+            stream = zlib.compress(b'\n'.join(operations))
+            objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            objects.append(
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] '
+                b'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>'
+                % (PAGE_WIDTH, PAGE_HEIGHT, len(objects))
+            )
+            page_ids.append(len(objects))
+        kids = b' '.join(b'%d 0 R' % page_id for page_id in page_ids)
+        objects[1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids))
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(output)
@@ -0,0 +1,86 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import UserProfile
+
+SESSION_KEY = '_user_permissions'
+DEFAULT_ROLE = 'receptionist'
+DEFAULT_THEME = 'dark'
+
+# Roles allowed for each capability (superusers have them all)
+CAPABILITIES = {
+    'is_admin': ['admin'],
+    'can_manage_users': ['admin'],
+    'can_view_logs': ['admin', 'veterinarian'],
+    'can_view_reports': ['admin', 'veterinarian'],
+    'can_manage_stock': ['admin', 'veterinarian', 'assistant'],
+}
+
+
+def _version_key(user_id):
+    return f'role_version:{user_id}'
+
+
+def _role_version(user_id):
+    # In the shared cache (settings.CACHES): a per-process cache would keep
+    # the old role on the other workers and make sessions flip between them
+    version = cache.get(_version_key(user_id))
+    if version is None:
+        # Time-based, so a lost version never matches an old session entry
+        cache.add(_version_key(user_id), time.time_ns(), None)
+        version = cache.get(_version_key(user_id))
+    return version
+
+
+def invalidate_user_role(user_id):
+    """Make every session of this user reload its role (after commit)"""
+    transaction.on_commit(lambda: cache.set(_version_key(user_id), time.time_ns(), None))
+
+
+def _load_profile(user):
+    profile, _ = UserProfile.objects.get_or_create(user=user)
+    return {'role': profile.role, 'theme': profile.theme}
+
+
+def get_user_permissions(request):
+    """
+    Role, theme and capability flags of the current user.
+
+    Resolved at most once per request. The role comes from the session when
+    its version still matches the user's role version in the cache, so the
+    profile is only queried after it changed (or on a new session).
+    """
+    if hasattr(request, '_user_permissions'):
+        return request._user_permissions
+
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        request._user_permissions = None
+        return None
+
+    version = _role_version(user.id)
+    session = getattr(request, 'session', None)
+    cached = session.get(SESSION_KEY) if session is not None else None
+    if cached and cached.get('user_id') == user.id and cached.get('version') == version:
+        profile_data = cached
+    else:
+        profile_data = _load_profile(user)
+        if session is not None:
+            session[SESSION_KEY] = {'user_id': user.id, 'version': version, **profile_data}
+
+    permissions = {
+        'user_role': profile_data['role'],
+        'user_theme': profile_data['theme'],
+    }
+    for capability, roles in CAPABILITIES.items():
+        permissions[capability] = profile_data['role'] in roles or user.is_superuser
+
+    request._user_permissions = permissions
+    return permissions
+
+
+def get_user_role(request):
+    permissions = get_user_permissions(request)
+    return permissions['user_role'] if permissions else None
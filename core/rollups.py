@@ -0,0 +1,282 @@
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.utils import timezone
+
+from .models import MetricRollup
+
+# Time series kept pre-aggregated for the report charts: each row of `model`
+# counts once in the buckets of its `date` field, per `dimension` value, and
+# adds its `amount` field to their sum
+ROLLUP_METRICS = {
+    'reservations': {
+        'model': 'core.Reservation',
+        'date': 'date_reservation',
+        'dimension': 'service',
+        'label': 'Rendez-vous',
+    },
+    'ventes': {
+        'model': 'core.Vente',
+        'date': 'date_vente',
+        'amount': 'total',
+        'label': 'Chiffre d\'affaires (MAD)',
+    },
+    'animaux': {
+        'model': 'core.Animal',
+        'date': 'date_ajout',
+        'label': 'Nouveaux animaux',
+    },
+}
+
+PERIODS = (MetricRollup.DAY, MetricRollup.WEEK, MetricRollup.MONTH)
+
+# Rows read / written per batch by the rebuild
+ROLLUP_BATCH_SIZE = 5000
+
+# Facts collected by the rollup_batch() of the current thread
+_batch = threading.local()
+
+
+def _model(key):
+    return apps.get_model(ROLLUP_METRICS[key]['model'])
+
+
+def _fields(key):
+    config = ROLLUP_METRICS[key]
+    return [config['date'], config.get('dimension'), config.get('amount')]
+
+
+def bucket_start(day, periode):
+    """First day of the bucket holding `day` (weeks start on Monday)"""
+    if periode == MetricRollup.WEEK:
+        return day - timedelta(days=day.weekday())
+    if periode == MetricRollup.MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, periode):
+    if periode == MetricRollup.WEEK:
+        return start + timedelta(days=7)
+    if periode == MetricRollup.MONTH:
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def window_start(end, periode, buckets):
+    """First day of the last `buckets` buckets up to `end`"""
+    start = bucket_start(end, periode)
+    if periode == MetricRollup.MONTH:
+        months = start.year * 12 + start.month - buckets
+        return date(months // 12, months % 12 + 1, 1)
+    return start - timedelta(days=(7 if periode == MetricRollup.WEEK else 1) * (buckets - 1))
+
+
+def _day(value):
+    if isinstance(value, datetime):
+        return timezone.localdate(value) if timezone.is_aware(value) else value.date()
+    return value
+
+
+def _instance_values(fields, instance):
+    return [getattr(instance, field) if field else None for field in fields]
+
+
+def _row_values(fields, row):
+    """values_list() row of the configured fields back in _fields() order"""
+    values = iter(row)
+    return [next(values) if field else None for field in fields]
+
+
+def _fact(key, values, sign=1):
+    """(metric, day, dimension, count, amount) of one row's field values"""
+    day, dimension, amount = values
+    if day is None:
+        return None
+    max_length = MetricRollup._meta.get_field('dimension').max_length
+    return key, _day(day), (dimension or '')[:max_length], sign, sign * Decimal(amount or 0)
+
+
+def _add(delta, fact):
+    key, day, dimension, count, amount = fact
+    for periode in PERIODS:
+        bucket = (key, periode, bucket_start(day, periode), dimension)
+        current = delta.get(bucket, (0, Decimal('0')))
+        delta[bucket] = (current[0] + count, current[1] + amount)
+
+
+def apply_rollup_changes(facts):
+    """
+    Add rows to (positive facts) or remove them from (negative ones) the
+    day, week and month buckets: one upsert adding each bucket's change,
+    creating the missing buckets (safe against concurrent writers of the
+    same buckets). Facts cancelling out write nothing.
+    """
+    delta = {}
+    for fact in facts:
+        if fact is not None:
+            _add(delta, fact)
+    rows = [
+        (
+            key, periode, connection.ops.adapt_datefield_value(debut), dimension,
+            count, connection.ops.adapt_decimalfield_value(amount, 14, 2),
+        )
+        for (key, periode, debut, dimension), (count, amount) in delta.items()
+        if (count, amount) != (0, 0)
+    ]
+    if not rows:
+        return
+    table = connection.ops.quote_name(MetricRollup._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (metrique, periode, debut, dimension, nombre, somme) '
+            f'VALUES (%s, %s, %s, %s, %s, %s) '
+            f'ON CONFLICT (metrique, periode, debut, dimension) DO UPDATE SET '
+            f'nombre = {table}.nombre + excluded.nombre, somme = {table}.somme + excluded.somme',
+            rows,
+        )
+
+
+def add_rollup_rows(key, objects):
+    """Count rows inserted without post_save (bulk_create)"""
+    fields = _fields(key)
+    _record([_fact(key, _instance_values(fields, obj)) for obj in objects])
+
+
+def _flush_facts(facts):
+    try:
+        # In a savepoint: a failed update must not leave the caller's
+        # transaction aborted (PostgreSQL) or half applied
+        with transaction.atomic():
+            apply_rollup_changes(facts)
+    except Exception as e:
+        # A missed update only skews the charts until rebuild_rollups
+        print(f"Rollup update failed: {e}")
+
+
+@contextmanager
+def rollup_batch():
+    """
+    Apply the rollup changes of the rows saved or deleted in the block
+    together on exit, instead of once per row (a cascading delete signals
+    every row). Use it inside the transaction of the changes, so they
+    commit or roll back with them.
+    """
+    if getattr(_batch, 'facts', None) is not None:
+        yield
+        return
+    _batch.facts = []
+    try:
+        yield
+        facts = _batch.facts
+    finally:
+        _batch.facts = None
+    _flush_facts(facts)
+
+
+def _record(facts):
+    """Apply facts now, in the transaction of their rows (or with the current rollup_batch)"""
+    batch = getattr(_batch, 'facts', None)
+    if batch is not None:
+        batch.extend(facts)
+    else:
+        _flush_facts(facts)
+
+
+def rebuild_rollups(keys=None):
+    """
+    Recompute metrics from their source tables (backfill, or after bulk
+    loads that skipped the signals). One pass over the rows, summed per day
+    in memory, then bulk inserts. Returns {metric: number of rollup rows}.
+    """
+    written = {}
+    for key in keys or ROLLUP_METRICS:
+        fields = _fields(key)
+        rows = _model(key).objects.values_list(*[field for field in fields if field])
+        days = {}
+        for row in rows.iterator(chunk_size=ROLLUP_BATCH_SIZE):
+            fact = _fact(key, _row_values(fields, row))
+            if fact is not None:
+                count, amount = days.get(fact[1:3], (0, Decimal('0')))
+                days[fact[1:3]] = (count + 1, amount + fact[4])
+        delta = {}
+        for (day, dimension), (count, amount) in days.items():
+            _add(delta, (key, day, dimension, count, amount))
+        with transaction.atomic():
+            MetricRollup.objects.filter(metrique=key).delete()
+            MetricRollup.objects.bulk_create([
+                MetricRollup(metrique=key, periode=periode, debut=debut, dimension=dimension, nombre=count, somme=amount)
+                for (_, periode, debut, dimension), (count, amount) in delta.items()
+            ], batch_size=ROLLUP_BATCH_SIZE)
+        written[key] = len(delta)
+    return written
+
+
+def rollup_series(key, periode, start, end):
+    """
+    Chart data of one metric between two days: the bucket starts and, per
+    dimension, one value per bucket (the amounts if the metric has some,
+    else the counts; empty buckets are 0). A range scan of the rollup table.
+    """
+    value = 'somme' if ROLLUP_METRICS[key].get('amount') else 'nombre'
+    first = bucket_start(start, periode)
+    labels = []
+    bucket = first
+    while bucket <= end:
+        labels.append(bucket)
+        bucket = next_bucket(bucket, periode)
+    position = {bucket: index for index, bucket in enumerate(labels)}
+
+    series = {}
+    rows = MetricRollup.objects.filter(
+        metrique=key, periode=periode, debut__gte=first, debut__lte=end,
+    ).values_list('debut', 'dimension', value)
+    for debut, dimension, amount in rows:
+        values = series.setdefault(dimension, [0] * len(labels))
+        values[position[debut]] = float(amount) if isinstance(amount, Decimal) else amount
+    return {
+        'metric': key,
+        'label': ROLLUP_METRICS[key]['label'],
+        'period': periode,
+        'labels': [bucket.isoformat() for bucket in labels],
+        'series': [{'name': name, 'data': series[name]} for name in sorted(series)],
+    }
+
+
+def connect_rollup_signals():
+    """Keep every metric in step with model saves and deletes"""
+    for key in ROLLUP_METRICS:
+        model = _model(key)
+        fields = _fields(key)
+        tracked = [field for field in fields if field]
+
+        def remember(sender, instance, tracked=tracked, update_fields=None, **kwargs):
+            # Stored values, so post_save moves the row between buckets
+            instance._rollup_old = None
+            if instance._state.adding or instance.pk is None:
+                return
+            if update_fields is not None and not set(tracked) & set(update_fields):
+                instance._rollup_old = False
+                return
+            instance._rollup_old = sender.objects.filter(pk=instance.pk).values_list(*tracked).first()
+
+        def saved(sender, instance, key=key, fields=fields, **kwargs):
+            old = getattr(instance, '_rollup_old', None)
+            if old is False:
+                return
+            facts = [_fact(key, _instance_values(fields, instance))]
+            if old is not None:
+                facts.append(_fact(key, _row_values(fields, old), sign=-1))
+            _record(facts)
+
+        def deleted(sender, instance, key=key, fields=fields, **kwargs):
+            _record([_fact(key, _instance_values(fields, instance), sign=-1)])
+
+        pre_save.connect(remember, sender=model, weak=False, dispatch_uid=f'rollup_remember_{key}')
+        post_save.connect(saved, sender=model, weak=False, dispatch_uid=f'rollup_save_{key}')
+        post_delete.connect(deleted, sender=model, weak=False, dispatch_uid=f'rollup_delete_{key}')
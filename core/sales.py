@@ -0,0 +1,144 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .alerts import evaluate_products
+from .fragments import invalidate_fragments
+from .inventory import apply_inventory_changes
+from .invoicing import DEFAULT_VAT_RATE, recalculate_totals
+from .models import Client, Facture, LigneFacture, LigneVente, Produit, Vente
+from .stats import invalidate_dashboard_stats
+
+# Largest quantity of one product accepted in a cart
+MAX_LINE_QUANTITY = 10000
+# Most distinct products accepted in a cart
+MAX_CART_LINES = 200
+
+
+class CheckoutError(Exception):
+    """The cart can't be sold; no stock was changed"""
+
+    def __init__(self, message, shortages=None):
+        super().__init__(message)
+        self.shortages = shortages or []
+
+
+class _Oversold(Exception):
+    pass
+
+
+def normalize_cart(items):
+    """
+    Posted cart lines ([{'id': ..., 'quantity': ...}]) as {produit_id: quantity},
+    duplicate lines merged; raises CheckoutError
+    """
+    if not isinstance(items, list) or not items:
+        raise CheckoutError('The cart is empty.')
+    cart = {}
+    for item in items:
+        try:
+            produit_id = int(item['id'])
+            quantity = int(item['quantity'])
+        except (KeyError, TypeError, ValueError):
+            raise CheckoutError('Invalid cart line.')
+        if quantity < 1:
+            raise CheckoutError('Quantities must be at least 1.')
+        cart[produit_id] = cart.get(produit_id, 0) + quantity
+        if cart[produit_id] > MAX_LINE_QUANTITY:
+            raise CheckoutError(f'At most {MAX_LINE_QUANTITY} units of a product per sale.')
+    if len(cart) > MAX_CART_LINES:
+        raise CheckoutError(f'At most {MAX_CART_LINES} products per sale.')
+    return cart
+
+
+def _shortages(cart):
+    available = dict(Produit.objects.filter(pk__in=cart).values_list('id', 'quantite'))
+    return [
+        {'id': produit_id, 'requested': quantity, 'available': available.get(produit_id)}
+        for produit_id, quantity in sorted(cart.items())
+        if available.get(produit_id) is None or available[produit_id] < quantity
+    ]
+
+
+def checkout(items, vendeur=None, client_id=None, invoice=False):
+    """
+    Sell a cart: the stock of every line is decremented by a single
+    conditional UPDATE (quantite >= requested, per product), so concurrent
+    terminals can't oversell and no row is read or locked beforehand. If
+    any line lacks stock the transaction rolls back and CheckoutError lists
+    the shortages. Prices are the current product prices, never the posted
+    ones. With `invoice`, a Facture for `client_id` is created as well.
+    Returns the Vente.
+    """
+    cart = normalize_cart(items)
+    client = None
+    if invoice or client_id:
+        if not client_id:
+            raise CheckoutError('Choose a client to invoice.')
+        try:
+            client_id = int(client_id)
+        except (TypeError, ValueError):
+            raise CheckoutError('Unknown client.')
+        client = Client.objects.filter(pk=client_id).first()
+        if client is None:
+            raise CheckoutError('Unknown client.')
+
+    requested = Case(
+        *[When(pk=produit_id, then=Value(quantity)) for produit_id, quantity in cart.items()],
+        output_field=IntegerField(),
+    )
+    try:
+        with transaction.atomic():
+            updated = Produit.objects.filter(pk__in=cart, quantite__gte=requested).update(
+                quantite=F('quantite') - requested,
+            )
+            if updated != len(cart):
+                raise _Oversold()
+
+            # Our UPDATE holds the rows until commit: these are the new values
+            produits = list(Produit.objects.filter(pk__in=cart).values_list('id', 'nom', 'prix', 'quantite'))
+            apply_inventory_changes([
+                ((quantite + cart[produit_id], prix), (quantite, prix))
+                for produit_id, _, prix, quantite in produits
+            ])
+
+            # Saved with its total, so the revenue rollup counts it once
+            vente = Vente.objects.create(
+                vendeur=vendeur, client=client,
+                total=sum((prix * cart[produit_id] for produit_id, _, prix, _ in produits), Decimal('0')),
+            )
+            lignes = [
+                LigneVente(vente=vente, produit_id=produit_id, nom_produit=nom, quantite=cart[produit_id], prix_unitaire=prix)
+                for produit_id, nom, prix, _ in sorted(produits)
+            ]
+            LigneVente.objects.bulk_create(lignes)
+
+            if invoice:
+                vente.facture = _invoice_sale(vente, client, lignes)
+                vente.save(update_fields=['facture'])
+
+            # update() sends no post_save: do what the Produit signals would
+            evaluate_products(cart)
+            invalidate_fragments('produit')
+            invalidate_dashboard_stats()
+    except _Oversold:
+        raise CheckoutError('Insufficient stock.', _shortages(cart))
+    return vente
+
+
+def _invoice_sale(vente, client, lignes):
+    facture = Facture.objects.create(
+        numero=f'V{timezone.localdate():%Y%m}-{vente.pk:06d}',
+        client=client,
+        taux_tva=Decimal(getattr(settings, 'INVOICE_VAT_RATE', DEFAULT_VAT_RATE)),
+    )
+    LigneFacture.objects.bulk_create([
+        LigneFacture(facture=facture, produit_id=ligne.produit_id, description=ligne.nom_produit,
+                     quantite=ligne.quantite, prix_unitaire=ligne.prix_unitaire)
+        for ligne in lignes
+    ])
+    recalculate_totals([facture.pk])
+    return facture
@@ -0,0 +1,200 @@
+import math
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Reservation
+
+# Appointment length per service (minutes), matched case-insensitively;
+# SERVICE_DURATIONS entries take precedence
+DEFAULT_SERVICE_DURATIONS = {
+    'Consultation': 30,
+    'Vaccination': 15,
+    'Contrôle': 20,
+    'Toilettage': 60,
+    'Détartrage': 45,
+    'Chirurgie': 120,
+}
+DEFAULT_DURATION_MINUTES = 30
+# Longest accepted appointment: overlap queries only scan the bookings
+# starting less than this before the checked interval
+DEFAULT_MAX_APPOINTMENT_MINUTES = 480
+DEFAULT_SLOT_MINUTES = 15
+DEFAULT_OPENING_HOURS = ('08:00', '18:00')
+DEFAULT_OPEN_DAYS = (0, 1, 2, 3, 4, 5)  # Monday to Saturday
+DEFAULT_CAPACITY = 1
+# Longest range searched by free_slots()
+MAX_SEARCH_DAYS = 62
+
+# Bookings with these statuses don't occupy their slot
+INACTIVE_STATUSES = ('Cancelled',)
+
+
+class SchedulingConflict(Exception):
+    """The requested interval clashes with existing bookings"""
+
+    def __init__(self, message, conflicts):
+        super().__init__(message)
+        self.conflicts = conflicts
+
+
+def service_durations():
+    durations = {name.lower(): minutes for name, minutes in DEFAULT_SERVICE_DURATIONS.items()}
+    durations.update({name.lower(): minutes for name, minutes in getattr(settings, 'SERVICE_DURATIONS', {}).items()})
+    return durations
+
+
+def duration_for(service):
+    """Default appointment length of a service, in minutes"""
+    default = getattr(settings, 'DEFAULT_APPOINTMENT_MINUTES', DEFAULT_DURATION_MINUTES)
+    return service_durations().get((service or '').strip().lower(), default)
+
+
+def max_duration():
+    return getattr(settings, 'MAX_APPOINTMENT_MINUTES', DEFAULT_MAX_APPOINTMENT_MINUTES)
+
+
+def validate_duration(minutes):
+    """
+    Raise ValueError unless 1 <= minutes <= max_duration(): overlapping()
+    would miss the longer bookings. Checked on every Reservation save.
+    """
+    if not 1 <= minutes <= max_duration():
+        raise ValueError(f'The duration must be between 1 and {max_duration()} minutes.')
+
+
+def clean_duration(value, service):
+    """Duration given in a form (blank: the service's), as minutes; raises ValueError"""
+    if value in (None, ''):
+        return duration_for(service)
+    try:
+        minutes = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Invalid duration.')
+    validate_duration(minutes)
+    return minutes
+
+
+def overlapping(start, end, queryset=None):
+    """
+    Bookings overlapping [start, end). The date_reservation range is bounded
+    by the longest duration, so the (date_reservation, date_fin) index is
+    scanned over a few hours whatever the size of the table.
+    """
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        date_reservation__gte=start - timedelta(minutes=max_duration()),
+        date_reservation__lt=end,
+        date_fin__gt=start,
+    )
+
+
+def _active_intervals(start, end, exclude_id=None):
+    qs = overlapping(start, end).exclude(statut__in=INACTIVE_STATUSES)
+    if exclude_id:
+        qs = qs.exclude(pk=exclude_id)
+    return list(qs.order_by('date_reservation').values_list('id', 'animal_id', 'date_reservation', 'date_fin'))
+
+
+def _full_intervals(intervals, capacity):
+    """Sorted intervals during which at least `capacity` bookings run at once"""
+    events = []
+    for begin, finish in intervals:
+        events.append((begin, 1))
+        events.append((finish, -1))
+    # At equal times ends come first: back-to-back bookings don't overlap
+    events.sort(key=lambda event: (event[0], event[1]))
+    full, running, opened = [], 0, None
+    for moment, delta in events:
+        running += delta
+        if running >= capacity and opened is None:
+            opened = moment
+        elif running < capacity and opened is not None:
+            if moment > opened:
+                full.append((opened, moment))
+            opened = None
+    return full
+
+
+def _merge(intervals):
+    merged = []
+    for begin, finish in sorted(intervals):
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], finish))
+        else:
+            merged.append((begin, finish))
+    return merged
+
+
+def find_conflicts(start, end, animal_id=None, exclude_id=None):
+    """
+    Ids of the bookings preventing an appointment on [start, end): any
+    booking of the same animal, or the overlapping bookings when the clinic
+    is already at APPOINTMENT_CAPACITY during part of the interval
+    """
+    rows = _active_intervals(start, end, exclude_id)
+    conflicts = [res_id for res_id, row_animal, _, _ in rows if animal_id and str(row_animal) == str(animal_id)]
+    capacity = getattr(settings, 'APPOINTMENT_CAPACITY', DEFAULT_CAPACITY)
+    if _full_intervals([(max(begin, start), min(finish, end)) for _, _, begin, finish in rows], capacity):
+        conflicts = [res_id for res_id, _, _, _ in rows]
+    return conflicts
+
+
+def ensure_available(start, end, animal_id=None, exclude_id=None):
+    """Raise SchedulingConflict if [start, end) can't be booked"""
+    conflicts = find_conflicts(start, end, animal_id, exclude_id)
+    if conflicts:
+        local = timezone.localtime(start)
+        raise SchedulingConflict(
+            f"The slot of {local:%d/%m/%Y %H:%M} ({int((end - start).total_seconds() // 60)} min) "
+            f"overlaps {len(conflicts)} other appointment(s).",
+            conflicts,
+        )
+
+
+def _opening_hours():
+    opening, closing = getattr(settings, 'CLINIC_OPENING_HOURS', DEFAULT_OPENING_HOURS)
+    return time.fromisoformat(opening), time.fromisoformat(closing)
+
+
+def free_slots(start, end, duration, count=10, animal_id=None):
+    """
+    Start/end of the first `count` free slots of `duration` minutes starting
+    in [start, end), on the APPOINTMENT_SLOT_MINUTES grid of the opening
+    hours. The bookings of the range are loaded with one indexed query.
+    """
+    end = min(end, start + timedelta(days=MAX_SEARCH_DAYS))
+    length = timedelta(minutes=duration)
+    step = timedelta(minutes=getattr(settings, 'APPOINTMENT_SLOT_MINUTES', DEFAULT_SLOT_MINUTES))
+    opening, closing = _opening_hours()
+    open_days = getattr(settings, 'CLINIC_OPEN_DAYS', DEFAULT_OPEN_DAYS)
+    capacity = getattr(settings, 'APPOINTMENT_CAPACITY', DEFAULT_CAPACITY)
+
+    rows = _active_intervals(start, end + length)
+    blocked = _full_intervals([(begin, finish) for _, _, begin, finish in rows], capacity)
+    if animal_id:
+        blocked += [(begin, finish) for _, row_animal, begin, finish in rows if str(row_animal) == str(animal_id)]
+    blocked = _merge(blocked)
+
+    slots = []
+    index = 0
+    day = timezone.localtime(start).date()
+    while len(slots) < count and day <= timezone.localtime(end).date():
+        if day.weekday() in open_days:
+            day_open = timezone.make_aware(datetime.combine(day, opening))
+            day_close = timezone.make_aware(datetime.combine(day, closing))
+            moment = day_open
+            if start > day_open:
+                moment = day_open + step * math.ceil((start - day_open) / step)
+            while len(slots) < count and moment < end and moment + length <= day_close:
+                while index < len(blocked) and blocked[index][1] <= moment:
+                    index += 1
+                if index < len(blocked) and blocked[index][0] < moment + length:
+                    # Jump past the blocking interval, back on the grid
+                    moment = day_open + step * math.ceil((blocked[index][1] - day_open) / step)
+                    continue
+                slots.append((moment, moment + length))
+                moment += step
+        day += timedelta(days=1)
+    return slots
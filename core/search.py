@@ -0,0 +1,262 @@
+import re
+from functools import partial
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+
+from .transactions import on_commit_batch
+
+# One FTS5 table per searchable entity (created by migration 0010 with an
+# accent-insensitive unicode61 tokenizer and prefix indexes). Each indexed row
+# is the primary key (as rowid) plus the text of the listed fields.
+# follow_related: reindex rows when a related object (client, user...) changes.
+SEARCH_INDEXES = {
+    'client': {
+        'model': 'core.Client',
+        'fields': ['nom', 'prenom', 'telephone', 'email'],
+    },
+    'animal': {
+        'model': 'core.Animal',
+        'fields': ['nom', 'type', 'race', 'client__nom', 'client__prenom'],
+    },
+    'reservation': {
+        'model': 'core.Reservation',
+        'fields': ['client__nom', 'client__prenom', 'animal__nom', 'service', 'statut'],
+    },
+    'produit': {
+        'model': 'core.Produit',
+        'fields': ['nom', 'categorie__nom', 'fournisseur__nom', 'description'],
+    },
+    'rapport': {
+        'model': 'core.RapportEnvoye',
+        'fields': ['user__username', 'user__first_name', 'user__last_name', 'sujet', 'destinataire'],
+    },
+    'user': {
+        'model': 'auth.User',
+        'fields': ['username', 'first_name', 'last_name', 'email', 'profile__role'],
+    },
+    'log': {
+        'model': 'core.Log',
+        'fields': ['user__username', 'user__first_name', 'user__last_name', 'action', 'description', 'table_cible'],
+        # Renaming a user would rewrite their whole history: logs keep the names they were written with
+        'follow_related': False,
+    },
+}
+
+INDEX_BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def index_table(key):
+    return f'core_search_{key}'
+
+
+def search_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _model(key):
+    return apps.get_model(SEARCH_INDEXES[key]['model'])
+
+
+def build_match_expression(query):
+    """
+    Turn free text into an FTS5 MATCH expression: every word must match
+    as a prefix, e.g. 'jean dup' -> '"jean"* AND "dup"*'
+    """
+    tokens = _TOKEN_RE.findall(query)
+    return ' AND '.join(f'"{token}"*' for token in tokens)
+
+
+def _icontains_filter(qs, fields, query):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    return qs.filter(condition)
+
+
+def apply_search(qs, key, query):
+    """
+    Filter a queryset with the search box text through the FTS index.
+
+    The index resolves the query to the matching primary keys; the table
+    itself is never scanned. Falls back to the icontains filters on
+    databases without FTS5 or for queries without any word characters.
+    """
+    query = (query or '').strip()
+    if not query:
+        return qs
+    fields = SEARCH_INDEXES[key]['fields']
+    expression = build_match_expression(query)
+    if not expression or not search_enabled():
+        return _icontains_filter(qs, fields, query)
+    table = index_table(key)
+    return qs.filter(pk__in=RawSQL(f'SELECT rowid FROM {table} WHERE {table} MATCH %s', [expression]))
+
+
+def search_ids(key, query, limit=None):
+    """Primary keys matching the search text, best matches first"""
+    expression = build_match_expression(query or '')
+    if not expression or not search_enabled():
+        return []
+    table = index_table(key)
+    sql = f'SELECT rowid FROM {table} WHERE {table} MATCH %s ORDER BY rank'
+    params = [expression]
+    if limit:
+        sql += ' LIMIT %s'
+        params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _document(values):
+    return ' '.join(str(value) for value in values if value not in (None, ''))
+
+
+def _write_rows(key, rows):
+    table = index_table(key)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, body) VALUES (%s, %s)',
+            [(row[0], _document(row[1:])) for row in rows],
+        )
+
+
+def remove_objects(key, pks):
+    """Drop rows from an index"""
+    if not search_enabled():
+        return
+    pks = list(pks)
+    table = index_table(key)
+    with connection.cursor() as cursor:
+        for start in range(0, len(pks), INDEX_BATCH_SIZE):
+            batch = pks[start:start + INDEX_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {table} WHERE rowid IN ({placeholders})', batch)
+
+
+def index_objects(key, pks):
+    """(Re)index the given primary keys of an entity"""
+    if not search_enabled():
+        return
+    pks = [pk for pk in pks if pk is not None]
+    if not pks:
+        return
+    fields = SEARCH_INDEXES[key]['fields']
+    model = _model(key)
+    with transaction.atomic():
+        remove_objects(key, pks)
+        for start in range(0, len(pks), INDEX_BATCH_SIZE):
+            batch = pks[start:start + INDEX_BATCH_SIZE]
+            _write_rows(key, model.objects.filter(pk__in=batch).values_list('pk', *fields))
+
+
+def index_new_objects(key, objects):
+    """
+    Index objects just inserted with bulk_create. When the index only uses
+    local fields, rows are written from the in-memory values (no DELETE
+    and no re-read); otherwise falls back to index_objects().
+    """
+    fields = SEARCH_INDEXES[key]['fields']
+    if any('__' in field for field in fields):
+        index_objects(key, [obj.pk for obj in objects])
+        return
+    if not search_enabled():
+        return
+    rows = [(obj.pk, *(getattr(obj, field) for field in fields)) for obj in objects]
+    for start in range(0, len(rows), INDEX_BATCH_SIZE):
+        _write_rows(key, rows[start:start + INDEX_BATCH_SIZE])
+
+
+def rebuild_index(key):
+    """Rebuild one index from scratch; returns the number of indexed rows"""
+    if not search_enabled():
+        return 0
+    fields = SEARCH_INDEXES[key]['fields']
+    model = _model(key)
+    count = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {index_table(key)}')
+        batch = []
+        for row in model.objects.order_by('pk').values_list('pk', *fields).iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(row)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                _write_rows(key, batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            _write_rows(key, batch)
+            count += len(batch)
+    return count
+
+
+def _related_paths(key):
+    """
+    (related model, lookup) pairs whose changes affect an index,
+    e.g. Client -> Animal.objects.filter(client=...)
+    """
+    if not SEARCH_INDEXES[key].get('follow_related', True):
+        return []
+    model = _model(key)
+    paths = {}
+    for field in SEARCH_INDEXES[key]['fields']:
+        if '__' not in field:
+            continue
+        hop = field.split('__', 1)[0]
+        related_model = model._meta.get_field(hop).related_model
+        paths[hop] = related_model
+    return [(related_model, hop) for hop, related_model in paths.items()]
+
+
+def _safely(func, *args):
+    """Run an index update without breaking the request that triggered it"""
+    def run():
+        try:
+            func(*args)
+        except Exception as e:
+            # The index can be repaired later with rebuild_search_index
+            print(f"Search indexing failed: {e}")
+    return run
+
+
+def _reindex(key, pks):
+    _safely(index_objects, key, sorted(pks))()
+
+
+def _mark_dirty(key, pks):
+    """
+    Reindex rows of an index once the current transaction commits.
+
+    Rows saved or deleted in the same transaction are reindexed together,
+    one batch per index, instead of one statement per object (a cascading
+    bulk delete signals every row). index_objects() drops rows that no
+    longer exist, so pks of rolled back work are harmless.
+    """
+    on_commit_batch(('search', key), partial(_reindex, key), [pk for pk in pks if pk is not None])
+
+
+def connect_search_signals():
+    """Keep every index in sync with model saves and deletes"""
+    for key in SEARCH_INDEXES:
+        model = _model(key)
+
+        def changed(sender, instance, key=key, **kwargs):
+            _mark_dirty(key, [instance.pk])
+
+        post_save.connect(changed, sender=model, weak=False, dispatch_uid=f'search_index_save_{key}')
+        post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f'search_index_delete_{key}')
+
+        for related_model, hop in _related_paths(key):
+            def related_saved(sender, instance, key=key, model=model, hop=hop, **kwargs):
+                _mark_dirty(key, model.objects.filter(**{hop: instance}).values_list('pk', flat=True))
+
+            post_save.connect(
+                related_saved, sender=related_model, weak=False,
+                dispatch_uid=f'search_index_related_{key}_{hop}',
+            )
@@ -0,0 +1,310 @@
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .alerts import sweep_all
+from .fragments import FRAGMENT_MODELS, invalidate_fragments
+from .inventory import rebuild_inventory_stats
+from .models import Animal, Categorie, Client, Fournisseur, LigneVente, Log, Produit, Reservation, UserProfile, Vente
+from .rollups import rebuild_rollups
+from .scheduling import duration_for
+from .search import SEARCH_INDEXES, rebuild_index
+from .stats import invalidate_dashboard_stats
+
+# Rows created by `manage.py seed_data` (before --scale)
+DEFAULT_COUNTS = {
+    'users': 20,
+    'clients': 100000,
+    'animals': 250000,
+    'reservations': 1000000,
+    'products': 5000,
+    'sales': 200000,
+    'logs': 10000000,
+}
+
+DEFAULT_BATCH_SIZE = 5000
+
+FIRST_NAMES = ['Yasmine', 'Karim', 'Sofia', 'Mehdi', 'Lina', 'Omar', 'Camille', 'Hugo', 'Nadia', 'Louis',
+               'Inès', 'Adam', 'Sarah', 'Youssef', 'Léa', 'Amine', 'Chloé', 'Rayan', 'Zineb', 'Lucas']
+LAST_NAMES = ['Benali', 'Dupont', 'El Amrani', 'Martin', 'Haddad', 'Bernard', 'Alaoui', 'Petit', 'Tazi',
+              'Moreau', 'Chraibi', 'Laurent', 'Idrissi', 'Lefèvre', 'Fassi', 'Roux', 'Bennani', 'Girard']
+ANIMAL_NAMES = ['Rex', 'Mina', 'Simba', 'Luna', 'Rocky', 'Nala', 'Oscar', 'Bella', 'Tiger', 'Coco',
+                'Max', 'Kiwi', 'Pistache', 'Milo', 'Daisy', 'Filou', 'Caramel', 'Ziggy']
+SPECIES = {
+    'Chien': ['Berger allemand', 'Labrador', 'Caniche', 'Golden retriever', 'Bulldog'],
+    'Chat': ['Européen', 'Persan', 'Siamois', 'Maine coon'],
+    'Lapin': ['Bélier', 'Nain'],
+    'Oiseau': ['Perruche', 'Canari'],
+}
+SERVICES = ['Consultation', 'Vaccination', 'Chirurgie', 'Toilettage', 'Détartrage', 'Contrôle']
+STATUSES = ['Scheduled', 'Completed', 'Cancelled']
+CATEGORIES = ['Médicaments', 'Alimentation', 'Accessoires', 'Hygiène', 'Antiparasitaires', 'Vaccins']
+PRODUCT_WORDS = ['Croquettes', 'Shampoing', 'Collier', 'Vermifuge', 'Pipette', 'Litière', 'Friandises',
+                 'Laisse', 'Vitamines', 'Pommade', 'Gamelle', 'Brosse']
+
+
+def scaled_counts(scale=1.0, **overrides):
+    """DEFAULT_COUNTS multiplied by scale, with explicit counts taking precedence"""
+    counts = {name: max(1, int(count * scale)) for name, count in DEFAULT_COUNTS.items()}
+    counts.update({name: count for name, count in overrides.items() if count is not None})
+    return counts
+
+
+def _in_batches(total, batch_size, make):
+    """Call make(i) for i in range(total), yielding lists of batch_size objects"""
+    for start in range(0, total, batch_size):
+        yield [make(i) for i in range(start, min(start + batch_size, total))]
+
+
+class DatasetSeeder:
+    """
+    Deterministic synthetic dataset: the same seed and counts always produce
+    the same rows (dates are relative to the day of the run).
+
+    Rows are generated and written batch by batch with bulk_create, so memory
+    stays bounded whatever the counts (only the client/animal ids are kept).
+    bulk_create sends no signals: the search indexes, the inventory statistics
+    and the dashboard snapshot are refreshed once at the end instead.
+    """
+
+    def __init__(self, counts, seed=42, batch_size=DEFAULT_BATCH_SIZE, stdout=None):
+        self.counts = counts
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.stdout = stdout
+        now = timezone.now()
+        self.anchor = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.user_ids = []
+        self.client_ids = []
+        self.animals = []
+
+    def log(self, message):
+        if self.stdout is not None:
+            self.stdout.write(message)
+
+    def run(self, refresh=True):
+        """Create every table's rows; returns the number of rows per table"""
+        created = {}
+        with transaction.atomic():
+            created['users'] = self.seed_users(self.counts.get('users', 0))
+            created['clients'] = self.seed_clients(self.counts.get('clients', 0))
+            created['animals'] = self.seed_animals(self.counts.get('animals', 0))
+            created['reservations'] = self.seed_reservations(self.counts.get('reservations', 0))
+            created['products'] = self.seed_products(self.counts.get('products', 0))
+            created['sales'] = self.seed_sales(self.counts.get('sales', 0))
+            created['logs'] = self.seed_logs(self.counts.get('logs', 0))
+        if refresh:
+            self.refresh_derived_data()
+        return created
+
+    def _bulk_create(self, model, total, make):
+        written = 0
+        for batch in _in_batches(total, self.batch_size, make):
+            model.objects.bulk_create(batch)
+            written += len(batch)
+            if written % (self.batch_size * 20) == 0:
+                self.log(f'  {model.__name__}: {written}/{total}')
+        self.log(f'{model.__name__}: {written} rows')
+        return written
+
+    def _new_ids(self, model, first_id):
+        return list(model.objects.filter(pk__gt=first_id).order_by('pk').values_list('pk', flat=True))
+
+    def _last_id(self, model):
+        return model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def seed_users(self, total):
+        rng = self.rng
+        first_id = self._last_id(User)
+        prefix = f'seed{first_id}'
+        roles = [role for role, _ in UserProfile.ROLE_CHOICES]
+
+        def make(i):
+            return User(
+                username=f'{prefix}_user{i}',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                email=f'{prefix}_user{i}@example.com',
+                password='!',  # unusable password
+            )
+        written = self._bulk_create(User, total, make)
+        self.user_ids = self._new_ids(User, first_id)
+        # bulk_create skips the post_save signal that creates the profiles
+        UserProfile.objects.bulk_create(
+            [UserProfile(user_id=user_id, role=rng.choice(roles)) for user_id in self.user_ids],
+            batch_size=self.batch_size,
+        )
+        return written
+
+    def seed_clients(self, total):
+        rng = self.rng
+        first_id = self._last_id(Client)
+
+        def make(i):
+            prenom, nom = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            return Client(
+                nom=nom,
+                prenom=prenom,
+                telephone=f'06{rng.randint(0, 99999999):08d}',
+                email=f"{prenom.lower()}.{nom.lower().replace(' ', '')}{i}@example.com",
+            )
+        written = self._bulk_create(Client, total, make)
+        self.client_ids = self._new_ids(Client, first_id)
+        return written
+
+    def seed_animals(self, total):
+        rng = self.rng
+        first_id = self._last_id(Animal)
+        client_ids = self.client_ids or list(Client.objects.values_list('pk', flat=True))
+        if not client_ids:
+            return 0
+        today = self.anchor.date()
+
+        def make(i):
+            species = rng.choice(list(SPECIES))
+            return Animal(
+                nom=rng.choice(ANIMAL_NAMES),
+                type=species,
+                race=rng.choice(SPECIES[species]),
+                age=rng.randint(0, 18),
+                client_id=client_ids[i] if i < len(client_ids) else rng.choice(client_ids),
+                date_ajout=today - timedelta(days=rng.randint(0, 3 * 365)),
+            )
+        written = self._bulk_create(Animal, total, make)
+        # (animal id, owner id) pairs, so reservations stay consistent
+        self.animals = list(
+            Animal.objects.filter(pk__gt=first_id).order_by('pk').values_list('pk', 'client_id')
+        )
+        return written
+
+    def seed_reservations(self, total):
+        rng = self.rng
+        animals = self.animals
+        if not animals:
+            return 0
+        durations = {service: duration_for(service) for service in SERVICES}
+
+        def make(i):
+            animal_id, client_id = rng.choice(animals)
+            # Three years of history, one year ahead, on 15 minute slots
+            slot = rng.randint(-3 * 365 * 96, 365 * 96)
+            date_reservation = self.anchor + timedelta(minutes=15 * slot)
+            service = rng.choice(SERVICES)
+            # bulk_create skips Reservation.save(), which derives date_fin
+            duree = durations[service]
+            return Reservation(
+                client_id=client_id,
+                animal_id=animal_id,
+                date_reservation=date_reservation,
+                duree_minutes=duree,
+                date_fin=date_reservation + timedelta(minutes=duree),
+                service=service,
+                statut='Scheduled' if slot > 0 else rng.choice(STATUSES),
+            )
+        return self._bulk_create(Reservation, total, make)
+
+    def seed_products(self, total):
+        rng = self.rng
+        categories = [Categorie.objects.get_or_create(nom=nom)[0].pk for nom in CATEGORIES]
+        suppliers = [
+            Fournisseur.objects.get_or_create(
+                nom=f'Fournisseur {i}',
+                defaults={'telephone': f'05{i:08d}', 'email': f'fournisseur{i}@example.com', 'adresse': f'{i} rue du Commerce'},
+            )[0].pk
+            for i in range(1, 11)
+        ]
+        today = self.anchor.date()
+
+        def make(i):
+            return Produit(
+                nom=f'{rng.choice(PRODUCT_WORDS)} {i}',
+                categorie_id=rng.choice(categories),
+                fournisseur_id=rng.choice(suppliers),
+                quantite=rng.randint(0, 200),
+                prix=Decimal(rng.randint(100, 50000)) / 100,
+                date_expiration=today + timedelta(days=rng.randint(-30, 3 * 365)),
+                description=f'Produit de démonstration {i}',
+            )
+        return self._bulk_create(Produit, total, make)
+
+    def seed_sales(self, total):
+        """Two years of store sales, a few best sellers making most of them"""
+        rng = self.rng
+        products = list(Produit.objects.order_by('pk').values_list('pk', 'nom', 'prix'))
+        if not products:
+            return 0
+        popularity = [rng.paretovariate(1.2) for _ in products]
+        cumulative, running = [], 0.0
+        for weight in popularity:
+            running += weight
+            cumulative.append(running)
+        user_ids = self.user_ids or list(User.objects.values_list('pk', flat=True)[:100])
+        span = 2 * 365 * 86400
+
+        written = 0
+        for start in range(0, total, self.batch_size):
+            ventes, lignes = [], []
+            for _ in range(min(self.batch_size, total - start)):
+                vente = Vente(
+                    date_vente=self.anchor - timedelta(seconds=rng.randint(1, span)),
+                    vendeur_id=rng.choice(user_ids) if user_ids else None,
+                )
+                picked = rng.choices(products, cum_weights=cumulative, k=rng.randint(1, 3))
+                for produit_id, nom, prix in {line[0]: line for line in picked}.values():
+                    ligne = LigneVente(vente=vente, produit_id=produit_id, nom_produit=nom,
+                                       quantite=rng.randint(1, 4), prix_unitaire=prix)
+                    vente.total += ligne.total
+                    lignes.append(ligne)
+                ventes.append(vente)
+            Vente.objects.bulk_create(ventes)
+            for ligne in lignes:
+                ligne.vente_id = ligne.vente.pk
+            LigneVente.objects.bulk_create(lignes)
+            written += len(ventes)
+        self.log(f'Vente: {written} rows')
+        return written
+
+    def seed_logs(self, total):
+        rng = self.rng
+        user_ids = self.user_ids or list(User.objects.values_list('pk', flat=True)[:100])
+        actions = [action for action, _ in Log.ACTION_CHOICES]
+        tables = ['core_client', 'core_animal', 'core_reservation', 'core_produit', 'page_view']
+        span = 3 * 365 * 86400
+
+        def make(i):
+            action = rng.choice(actions)
+            return Log(
+                user_id=rng.choice(user_ids) if user_ids and rng.random() < 0.9 else None,
+                action=action,
+                description=f'Seeded {action} #{i}',
+                table_cible=rng.choice(tables),
+                id_element=rng.randint(1, 100000),
+                ip_address=f'10.0.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+                date_action=self.anchor - timedelta(seconds=rng.randint(0, span)),
+            )
+        return self._bulk_create(Log, total, make)
+
+    def refresh_derived_data(self):
+        """Rebuild what the skipped signals would have maintained"""
+        for key in SEARCH_INDEXES:
+            self.log(f'Search index {key}: {rebuild_index(key)} rows')
+        rebuild_inventory_stats()
+        opened, _ = sweep_all()
+        self.log(f'Stock alerts: {opened} opened')
+        for key, rows in rebuild_rollups().items():
+            self.log(f'Rollup {key}: {rows} rows')
+        invalidate_dashboard_stats()
+        invalidate_fragments(*FRAGMENT_MODELS)
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+
+def seed_dataset(counts=None, seed=42, batch_size=DEFAULT_BATCH_SIZE, refresh=True, stdout=None):
+    """Seed a deterministic dataset; returns the number of created rows per table"""
+    seeder = DatasetSeeder(counts or DEFAULT_COUNTS, seed=seed, batch_size=batch_size, stdout=stdout)
+    return seeder.run(refresh=refresh)
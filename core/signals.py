@@ -0,0 +1,115 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .alerts import EVALUATION_BATCH_SIZE, evaluate_products
+from .models import Animal, Categorie, Client, Fournisseur, Produit, Reservation, UserProfile
+from .fragments import invalidate_fragments
+from .images import schedule_renditions
+from .inventory import apply_inventory_delta
+from .permissions import invalidate_user_role
+from .rollups import connect_rollup_signals
+from .scheduling import validate_duration
+from .search import connect_search_signals
+from .stats import invalidate_dashboard_stats
+
+
+@receiver(post_save, sender=Client)
+@receiver(post_delete, sender=Client)
+@receiver(post_save, sender=Animal)
+@receiver(post_delete, sender=Animal)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=Produit)
+@receiver(post_delete, sender=Produit)
+def dashboard_stats_changed(sender, **kwargs):
+    """Invalidate the dashboard statistics snapshot"""
+    invalidate_dashboard_stats()
+
+
+@receiver(pre_save, sender=Reservation)
+def check_reservation_duration(sender, instance, **kwargs):
+    """Refuse bookings longer than the overlap queries look back"""
+    validate_duration(instance.duree_minutes)
+
+
+@receiver(pre_save, sender=Produit)
+def remember_produit_stock(sender, instance, **kwargs):
+    """Keep the stored quantity/price so post_save can apply a delta"""
+    instance._inventory_old = None
+    if instance.pk:
+        instance._inventory_old = Produit.objects.filter(pk=instance.pk).values_list('quantite', 'prix').first()
+
+
+@receiver(post_save, sender=Produit)
+def produit_saved_inventory(sender, instance, **kwargs):
+    """Update the materialized inventory statistics"""
+    apply_inventory_delta(
+        old=getattr(instance, '_inventory_old', None),
+        new=(instance.quantite, instance.prix),
+    )
+
+
+@receiver(post_delete, sender=Produit)
+def produit_deleted_inventory(sender, instance, **kwargs):
+    """Update the materialized inventory statistics"""
+    apply_inventory_delta(old=(instance.quantite, instance.prix))
+
+
+@receiver(post_save, sender=Produit)
+def produit_saved_image(sender, instance, **kwargs):
+    """Build the resized renditions of a new or replaced product image"""
+    renditions = instance.image_renditions or {}
+    if instance.image:
+        if renditions.get('source') != instance.image.name:
+            schedule_renditions(instance)
+    elif renditions:
+        # update() sends no post_save
+        Produit.objects.filter(pk=instance.pk).update(image_renditions={})
+        instance.image_renditions = {}
+
+
+@receiver(post_save, sender=Produit)
+def produit_saved_alerts(sender, instance, **kwargs):
+    """Open or resolve the product's stock alerts"""
+    evaluate_products([instance.pk])
+
+
+@receiver(pre_save, sender=Categorie)
+def remember_categorie_threshold(sender, instance, **kwargs):
+    instance._seuil_old = None
+    if instance.pk:
+        instance._seuil_old = Categorie.objects.filter(pk=instance.pk).values_list('seuil_stock', flat=True).first()
+
+
+@receiver(post_save, sender=Categorie)
+def categorie_saved_alerts(sender, instance, created, **kwargs):
+    """A new category threshold applies to the products without their own"""
+    if not created and instance.seuil_stock != getattr(instance, '_seuil_old', None):
+        ids = list(Produit.objects.filter(categorie=instance, seuil_stock__isnull=True).values_list('id', flat=True))
+        for start in range(0, len(ids), EVALUATION_BATCH_SIZE):
+            evaluate_products(ids[start:start + EVALUATION_BATCH_SIZE])
+
+
+@receiver(post_save, sender=Produit)
+@receiver(post_delete, sender=Produit)
+@receiver(post_save, sender=Categorie)
+@receiver(post_delete, sender=Categorie)
+@receiver(post_save, sender=Fournisseur)
+@receiver(post_delete, sender=Fournisseur)
+def stock_fragments_changed(sender, **kwargs):
+    """Stale the cached stock/store fragments showing this model"""
+    invalidate_fragments(sender._meta.model_name)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_changed(sender, instance, **kwargs):
+    """Sessions of this user must reload their cached role"""
+    invalidate_user_role(instance.user_id)
+
+
+# Full-text search indexes follow every indexed model
+connect_search_signals()
+
+# Report chart rollups follow their source models
+connect_rollup_signals()
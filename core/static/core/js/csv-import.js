@@ -0,0 +1,44 @@
+// CSV import: pick a file, upload it to an import endpoint and report the result
+function getCsrfToken() {
+    const input = document.querySelector('input[name="csrfmiddlewaretoken"]');
+    if (input) {
+        return input.value;
+    }
+    const match = document.cookie.match(/(?:^|;\s*)csrftoken=([^;]+)/);
+    return match ? decodeURIComponent(match[1]) : '';
+}
+
+function importCsv(url) {
+    const input = document.createElement('input');
+    input.type = 'file';
+    input.accept = '.csv,text/csv';
+    input.addEventListener('change', function() {
+        if (!input.files.length) {
+            return;
+        }
+        const formData = new FormData();
+        formData.append('file', input.files[0]);
+
+        fetch(url, {
+            method: 'POST',
+            headers: {'X-CSRFToken': getCsrfToken()},
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            let message = data.message;
+            if (data.errors && data.errors.length) {
+                message += '\n' + data.errors.slice(0, 10).map(error => `Line ${error.line}: ${error.message}`).join('\n');
+            }
+            alert(message);
+            if (data.created) {
+                window.location.reload();
+            }
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            alert('An error occurred while importing the file');
+        });
+    });
+    input.click();
+}
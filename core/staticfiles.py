@@ -0,0 +1,233 @@
+import gzip
+import os
+import re
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # optional: only the .gz variants are written without it
+    brotli = None
+
+# Precompressed variants are written for these hashed files
+COMPRESSED_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.map', '.xml', '.html')
+# Below this size compression doesn't pay for the Content-Encoding overhead
+COMPRESS_MIN_SIZE = 256
+# STATIC_BROTLI: True requires brotli, False writes .gz variants only; by
+# default .br variants are written when brotli is installed
+DEFAULT_STATIC_BROTLI = None
+
+_CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')|(/\*.*?\*/)|(\s+)''', re.S)
+_CSS_STRINGS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''', re.S)
+_CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(source):
+    """Remove comments and redundant whitespace (strings are kept as is)"""
+    def replace(match):
+        string, comment, _ = match.groups()
+        if string:
+            return string
+        # /*! ... */ marks a comment to keep (licenses)
+        if comment:
+            return comment if comment.startswith('/*!') else ''
+        return ' '
+    parts = _CSS_STRINGS.split(_CSS_TOKENS.sub(replace, source))
+    for index in range(0, len(parts), 2):  # odd indexes are strings
+        parts[index] = _CSS_PUNCTUATION.sub(r'\1', parts[index]).replace(';}', '}')
+    return ''.join(parts).strip()
+
+
+# A "/" after one of these starts a regular expression, not a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'void', 'delete', 'new', 'throw',
+                   'yield', 'await'}
+_JS_WORD = re.compile(r'[\w$]+$')
+
+
+def _is_word_char(char):
+    return char.isalnum() or char in '_$\\' or ord(char) > 127
+
+
+def _skip_literal(source, start):
+    """End of the string or regular expression literal starting at `start`"""
+    quote = source[start]
+    in_class = False
+    index = start + 1
+    while index < len(source):
+        char = source[index]
+        if char == '\\':
+            index += 2
+            continue
+        if char == '\n':
+            return index  # unterminated: leave the rest alone
+        if quote == '/':
+            if char == '[':
+                in_class = True
+            elif char == ']':
+                in_class = False
+            elif char == '/' and not in_class:
+                return index + 1
+        elif char == quote:
+            return index + 1
+        index += 1
+    return index
+
+
+def _skip_template(source, start):
+    """(end, opens_substitution) of the template literal text from `start`"""
+    index = start
+    while index < len(source):
+        if source[index] == '\\':
+            index += 2
+        elif source[index] == '`':
+            return index + 1, False
+        elif source.startswith('${', index):
+            return index + 2, True
+        else:
+            index += 1
+    return index, False
+
+
+def minify_js(source):
+    """
+    Remove comments, indentation, blank lines and redundant spaces.
+    Line breaks are kept so automatic semicolon insertion behaves the same;
+    strings, template literals and regular expressions are copied verbatim.
+    """
+    out = []
+    # One open brace count per ${...} template substitution being read
+    substitutions = []
+    pending_space = False
+    index, length = 0, len(source)
+
+    def last_char():
+        return out[-1][-1] if out else '\n'
+
+    def write(text):
+        nonlocal pending_space
+        before = last_char()
+        if pending_space and before != '\n' and (
+            (_is_word_char(before) and _is_word_char(text[0]))
+            or (before in '+-' and text[0] in '+-')
+            or '/' in (before, text[0])
+        ):
+            out.append(' ')
+        pending_space = False
+        out.append(text)
+
+    def regex_allowed():
+        before = last_char()
+        if before == '\n' or before in _REGEX_PRECEDERS:
+            return True
+        word = _JS_WORD.search(''.join(out[-12:]))
+        return bool(word) and word.group() in _REGEX_KEYWORDS
+
+    while index < length:
+        char = source[index]
+        if char == '\n':
+            pending_space = False
+            if out and last_char() != '\n':
+                out.append('\n')
+            index += 1
+        elif char in ' \t\r\f\v\ufeff':
+            pending_space = True
+            index += 1
+        elif source.startswith('//', index):
+            end = source.find('\n', index)
+            index = length if end == -1 else end
+        elif source.startswith('/*', index):
+            end = source.find('*/', index + 2)
+            index = length if end == -1 else end + 2
+            pending_space = True
+        elif char in '"\'' or (char == '/' and regex_allowed()):
+            end = _skip_literal(source, index)
+            write(source[index:end])
+            index = end
+        elif char == '`' or (char == '}' and substitutions and substitutions[-1] == 0):
+            if char == '}':
+                substitutions.pop()
+            end, opens_substitution = _skip_template(source, index + 1)
+            write(source[index:end])
+            if opens_substitution:
+                substitutions.append(0)
+            index = end
+        else:
+            if substitutions and char == '{':
+                substitutions[-1] += 1
+            elif substitutions and char == '}':
+                substitutions[-1] -= 1
+            write(char)
+            index += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage: CSS/JS files are minified as they are collected,
+    then copied under content-hashed names listed in staticfiles.json (used by
+    {% static %}), with .gz (and .br, see STATIC_BROTLI) variants of the
+    hashed files for core.middleware.StaticAssetsMiddleware.
+    """
+
+    @property
+    def use_brotli(self):
+        wanted = getattr(settings, 'STATIC_BROTLI', DEFAULT_STATIC_BROTLI)
+        if wanted and brotli is None:
+            raise ImproperlyConfigured('STATIC_BROTLI is enabled but the brotli package is not installed.')
+        if wanted is None and brotli is None:
+            print("brotli is not installed: only .gz variants are written (set STATIC_BROTLI = False to silence this).")
+        return brotli is not None and wanted is not False
+
+    def _save(self, name, content):
+        minify = MINIFIERS.get(os.path.splitext(name)[1])
+        if minify is not None:
+            # The hashing step may have read the file already
+            content.seek(0)
+            try:
+                content = ContentFile(minify(content.read().decode('utf-8')).encode('utf-8'))
+            except UnicodeDecodeError:
+                content.seek(0)
+        return super()._save(name, content)
+
+    def stored_name(self, name):
+        # Before the first collectstatic (development, test runs) the plain files are referenced
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        use_brotli = self.use_brotli
+        for name in sorted(set(self.hashed_files.values())):
+            if name.endswith(COMPRESSED_EXTENSIONS):
+                self.compress(name, use_brotli)
+
+    def compress(self, name, use_brotli):
+        """Write the .gz/.br variants of a hashed file (same name, same content: kept if present)"""
+        encoders = [('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+        if use_brotli:
+            encoders.append(('.br', lambda data: brotli.compress(data, quality=11)))
+        data = None
+        for suffix, encode in encoders:
+            if self.exists(name + suffix):
+                continue
+            if data is None:
+                with self.open(name) as handle:
+                    data = handle.read()
+                if len(data) < COMPRESS_MIN_SIZE:
+                    return
+            compressed = encode(data)
+            if len(compressed) < len(data):
+                super()._save(name + suffix, ContentFile(compressed))
@@ -0,0 +1,111 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from .models import Animal, Client, Produit, Reservation
+from .transactions import on_commit_batch
+
+DASHBOARD_STATS_VERSION_KEY = 'dashboard_stats:version'
+DEFAULT_DASHBOARD_STATS_TIMEOUT = 300
+# Longest a rebuild may hold the lock before others give up waiting
+REBUILD_LOCK_TIMEOUT = 10
+
+_rebuild_lock = threading.Lock()
+
+
+def compute_dashboard_stats():
+    """
+    Compute the dashboard statistics block with database-side aggregates
+    """
+    since = timezone.now().date() - timedelta(days=30)
+    stock_value = F('prix') * F('quantite')
+    money = DecimalField(max_digits=20, decimal_places=2)
+
+    produit_stats = Produit.objects.aggregate(
+        total_products=Count('id'),
+        total_revenue=Sum(stock_value, output_field=money),
+        monthly_revenue=Sum(stock_value, output_field=money, filter=Q(date_ajout__gte=since)),
+    )
+    total_clients = Client.objects.count()
+
+    return {
+        'total_clients': total_clients,
+        'total_animals': Animal.objects.count(),
+        'total_reservations': Reservation.objects.count(),
+        'total_products': produit_stats['total_products'],
+        # Since Client model doesn't have date_creation, we use total clients for now
+        'new_clients_this_month': total_clients,
+        # Revenue from products (since reservations don't have price)
+        'total_revenue': produit_stats['total_revenue'] or 0,
+        'monthly_revenue': produit_stats['monthly_revenue'] or 0,
+    }
+
+
+def _new_version():
+    # Time-based, so a lost version key never resurrects an old snapshot
+    return time.time_ns()
+
+
+def _stats_key():
+    version = cache.get(DASHBOARD_STATS_VERSION_KEY)
+    if version is None:
+        cache.add(DASHBOARD_STATS_VERSION_KEY, _new_version(), None)
+        version = cache.get(DASHBOARD_STATS_VERSION_KEY)
+    return f'dashboard_stats:{version}'
+
+
+def get_dashboard_stats():
+    """
+    Return the cached dashboard statistics snapshot, rebuilding it if needed.
+
+    Rebuilds are single-flight: one thread per process holds a lock, and a
+    cache.add() lock in the shared cache (settings.CACHES) makes the other
+    processes wait for the result instead of recomputing it. The add() is
+    atomic on Redis; on the file cache two processes may rarely both rebuild.
+    """
+    key = _stats_key()
+    stats = cache.get(key)
+    if stats is not None:
+        return stats
+
+    timeout = getattr(settings, 'DASHBOARD_STATS_TIMEOUT', DEFAULT_DASHBOARD_STATS_TIMEOUT)
+    with _rebuild_lock:
+        stats = cache.get(key)
+        if stats is not None:
+            return stats
+
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+            try:
+                stats = compute_dashboard_stats()
+                cache.set(key, stats, timeout)
+            finally:
+                cache.delete(lock_key)
+            return stats
+
+        # Another process is rebuilding: wait for its snapshot
+        deadline = time.monotonic() + REBUILD_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            stats = cache.get(key)
+            if stats is not None:
+                return stats
+        return compute_dashboard_stats()
+
+
+def _bump_version():
+    try:
+        cache.incr(DASHBOARD_STATS_VERSION_KEY)
+    except ValueError:
+        cache.set(DASHBOARD_STATS_VERSION_KEY, _new_version(), None)
+
+
+def invalidate_dashboard_stats():
+    """Drop the current snapshot once the surrounding transaction commits"""
+    # Once per transaction, however many rows it changes
+    on_commit_batch('dashboard_stats', lambda items: _bump_version())
@@ -1,3 +1,703 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .alerts import evaluate_products, open_alerts, sweep_expiry
+from .importers import ClientImporter, ImportFormatError
+from .inventory import compute_inventory_stats, get_inventory_stats, rebuild_inventory_stats
+from .logbuffer import LogBuffer
+from .models import (
+    Animal, Categorie, Client, Fournisseur, Log, MetricRollup, Produit, Reservation, StockAlert, Vente,
+)
+from .rollups import add_rollup_rows, rebuild_rollups, rollup_batch
+from .pagination import encode_cursor, keyset_paginate, lazy_keyset_paginate
+from .sales import CheckoutError, checkout
+from .staticfiles import CompressedManifestStaticFilesStorage
+from .scheduling import SchedulingConflict, clean_duration, ensure_available, find_conflicts, free_slots, overlapping
+
+
+def make_produit(nom='Croquettes', quantite=10, prix='25.00', **kwargs):
+    categorie = Categorie.objects.get_or_create(nom='Alimentation')[0]
+    fournisseur = Fournisseur.objects.get_or_create(
+        nom='Fournisseur', defaults={'telephone': '0600000000', 'email': 'f@example.com', 'adresse': '-'},
+    )[0]
+    return Produit.objects.create(
+        nom=nom, categorie=categorie, fournisseur=fournisseur, quantite=quantite,
+        prix=Decimal(prix), date_expiration=date(2030, 1, 1), **kwargs,
+    )
+
+
+def make_animal(nom='Rex'):
+    client = Client.objects.create(nom='Benali', prenom='Yasmine', telephone='0600000000', email='y@example.com')
+    return Animal.objects.create(nom=nom, type='Chien', race='Labrador', age=3, client=client)
+
+
+def at(hour, minute=0, day=7):
+    """Aware datetime in January 2030 (the 7th is a Monday)"""
+    return timezone.make_aware(datetime(2030, 1, day, hour, minute))
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.croquettes = make_produit('Croquettes', quantite=5, prix='25.00')
+        self.collier = make_produit('Collier', quantite=3, prix='40.00')
+
+    def stock(self):
+        return dict(Produit.objects.values_list('nom', 'quantite'))
+
+    def test_sale_decrements_each_line(self):
+        vente = checkout([
+            {'id': self.croquettes.pk, 'quantity': 2},
+            {'id': self.collier.pk, 'quantity': 3},
+        ])
+        self.assertEqual(self.stock(), {'Croquettes': 3, 'Collier': 0})
+        self.assertEqual(vente.total, Decimal('170.00'))
+        self.assertEqual(
+            sorted(vente.lignes.values_list('nom_produit', 'quantite')),
+            [('Collier', 3), ('Croquettes', 2)],
+        )
+
+    def test_duplicate_lines_are_merged(self):
+        checkout([{'id': self.croquettes.pk, 'quantity': 2}, {'id': self.croquettes.pk, 'quantity': 1}])
+        self.assertEqual(self.stock()['Croquettes'], 2)
+
+    def test_oversell_is_rejected_and_stock_unchanged(self):
+        with self.assertRaises(CheckoutError) as raised:
+            checkout([{'id': self.croquettes.pk, 'quantity': 6}])
+        self.assertEqual(raised.exception.shortages, [{'id': self.croquettes.pk, 'requested': 6, 'available': 5}])
+        self.assertEqual(self.stock(), {'Croquettes': 5, 'Collier': 3})
+        self.assertFalse(Vente.objects.exists())
+
+    def test_one_short_line_cancels_the_whole_cart(self):
+        with self.assertRaises(CheckoutError) as raised:
+            checkout([
+                {'id': self.croquettes.pk, 'quantity': 2},
+                {'id': self.collier.pk, 'quantity': 4},
+            ])
+        self.assertEqual([shortage['id'] for shortage in raised.exception.shortages], [self.collier.pk])
+        self.assertEqual(self.stock(), {'Croquettes': 5, 'Collier': 3})
+        self.assertFalse(Vente.objects.exists())
+
+    def test_unknown_product_is_a_shortage(self):
+        with self.assertRaises(CheckoutError) as raised:
+            checkout([{'id': self.croquettes.pk, 'quantity': 1}, {'id': 999999, 'quantity': 1}])
+        self.assertEqual(raised.exception.shortages, [{'id': 999999, 'requested': 1, 'available': None}])
+        self.assertEqual(self.stock()['Croquettes'], 5)
+
+    def test_invalid_quantities(self):
+        for items in ([], [{'id': self.croquettes.pk, 'quantity': 0}], [{'id': 'x', 'quantity': 1}]):
+            with self.assertRaises(CheckoutError):
+                checkout(items)
+        self.assertEqual(self.stock()['Croquettes'], 5)
+
+
+class CheckoutApiTests(TestCase):
+    def setUp(self):
+        self.produit = make_produit(quantite=2)
+        self.user = User.objects.create_user('vendeur', password='x')
+        self.client.force_login(self.user)
+
+    def post(self, body):
+        return self.client.post(reverse('checkout'), data=json.dumps(body), content_type='application/json')
+
+    def test_sale(self):
+        response = self.post({'items': [{'id': self.produit.pk, 'quantity': 2}]})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertTrue(data['success'])
+        self.assertEqual(data['stock'], {str(self.produit.pk): 0})
+        self.assertEqual(Vente.objects.get().vendeur, self.user)
+
+    def test_oversell_returns_409_with_shortages(self):
+        response = self.post({'items': [{'id': self.produit.pk, 'quantity': 3}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {
+            'success': False,
+            'message': 'Insufficient stock.',
+            'shortages': [{'id': self.produit.pk, 'requested': 3, 'available': 2}],
+        })
+        self.produit.refresh_from_db()
+        self.assertEqual(self.produit.quantite, 2)
+
+    def test_invalid_cart_returns_400(self):
+        response = self.post({'items': [{'id': self.produit.pk, 'quantity': -1}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['shortages'], [])
+
+    def test_body_must_be_an_object(self):
+        for body in ([1, 2], 'x'):
+            self.assertEqual(self.post(body).status_code, 400)
+
+    def test_get_is_refused(self):
+        self.assertEqual(self.client.get(reverse('checkout')).status_code, 405)
+
+
+class BulkDeleteTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='x'))
+
+    def post(self, ids):
+        return self.client.post(
+            reverse('bulk_delete_animals'), data=json.dumps({'animal_ids': ids}), content_type='application/json',
+        )
+
+    def test_string_ids_are_matched(self):
+        rex, felix = make_animal('Rex'), make_animal('Felix')
+        response = self.post([str(rex.pk), felix.pk, str(rex.pk), '999999'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['deleted'], 2)
+        self.assertEqual(response.json()['not_found'], 1)
+        self.assertFalse(Animal.objects.exists())
+
+    def test_non_numeric_ids_are_rejected(self):
+        rex = make_animal('Rex')
+        for ids in ([rex.pk, 'abc'], [True], [1.5], 'abc'):
+            self.assertEqual(self.post(ids).status_code, 400)
+        self.assertTrue(Animal.objects.exists())
+
+
+@override_settings(
+    APPOINTMENT_CAPACITY=1, APPOINTMENT_SLOT_MINUTES=15, CLINIC_OPENING_HOURS=('08:00', '12:00'),
+    CLINIC_OPEN_DAYS=(0, 1, 2, 3, 4), MAX_APPOINTMENT_MINUTES=480,
+)
+class SchedulingTests(TestCase):
+    def setUp(self):
+        self.rex = make_animal('Rex')
+        self.mina = make_animal('Mina')
+
+    def book(self, start, minutes=30, animal=None, statut='Scheduled'):
+        animal = animal or self.rex
+        return Reservation.objects.create(
+            client=animal.client, animal=animal, date_reservation=start,
+            duree_minutes=minutes, service='Consultation', statut=statut,
+        )
+
+    def test_date_fin_follows_the_duration(self):
+        self.assertEqual(self.book(at(9), 45).date_fin, at(9, 45))
+
+    def test_overlapping_excludes_touching_bookings(self):
+        booking = self.book(at(9), 30)
+        self.assertEqual(list(overlapping(at(9, 29), at(10))), [booking])
+        self.assertEqual(list(overlapping(at(8, 30), at(9, 1))), [booking])
+        self.assertFalse(overlapping(at(9, 30), at(10)).exists())
+        self.assertFalse(overlapping(at(8, 30), at(9)).exists())
+
+    def test_overlapping_finds_long_bookings_started_earlier(self):
+        booking = self.book(at(8), 240)
+        self.assertEqual(list(overlapping(at(11, 45), at(12))), [booking])
+
+    def test_back_to_back_bookings_are_available(self):
+        self.book(at(9), 30)
+        ensure_available(at(9, 30), at(10), animal_id=self.mina.pk)
+        ensure_available(at(8, 30), at(9), animal_id=self.mina.pk)
+
+    def test_overlap_is_a_conflict(self):
+        booking = self.book(at(9), 30)
+        with self.assertRaises(SchedulingConflict) as raised:
+            ensure_available(at(9, 15), at(9, 45), animal_id=self.mina.pk)
+        self.assertEqual(raised.exception.conflicts, [booking.pk])
+
+    def test_cancelled_bookings_free_their_slot(self):
+        self.book(at(9), 30, statut='Cancelled')
+        ensure_available(at(9), at(9, 30), animal_id=self.rex.pk)
+
+    def test_the_edited_booking_doesnt_conflict_with_itself(self):
+        booking = self.book(at(9), 30)
+        ensure_available(at(9, 15), at(9, 45), animal_id=self.rex.pk, exclude_id=booking.pk)
+
+    @override_settings(APPOINTMENT_CAPACITY=2)
+    def test_capacity(self):
+        first = self.book(at(9), 30)
+        self.assertEqual(find_conflicts(at(9), at(9, 30), animal_id=self.mina.pk), [])
+        # The same animal can't be in two appointments at once
+        self.assertEqual(find_conflicts(at(9), at(9, 30), animal_id=self.rex.pk), [first.pk])
+        second = self.book(at(9, 15), 30, animal=self.mina)
+        self.assertEqual(
+            sorted(find_conflicts(at(9, 10), at(9, 20))), sorted([first.pk, second.pk]),
+        )
+        self.assertEqual(find_conflicts(at(9, 30), at(9, 40)), [])
+
+    def test_free_slots_skip_bookings_on_the_grid(self):
+        self.book(at(8, 15), 20)
+        slots = free_slots(at(8), at(10), 30, count=3)
+        self.assertEqual(slots, [(at(8, 45), at(9, 15)), (at(9), at(9, 30)), (at(9, 15), at(9, 45))])
+
+    def test_free_slots_ignore_cancelled_bookings(self):
+        self.book(at(8), 60, statut='Cancelled')
+        self.assertEqual(free_slots(at(8), at(9), 30, count=1), [(at(8), at(8, 30))])
+
+    def test_free_slots_of_an_animal_avoid_its_bookings(self):
+        self.book(at(8), 30)
+        with override_settings(APPOINTMENT_CAPACITY=2):
+            self.assertEqual(free_slots(at(8), at(9), 30, count=1), [(at(8), at(8, 30))])
+            self.assertEqual(free_slots(at(8), at(9), 30, count=1, animal_id=self.rex.pk), [(at(8, 30), at(9))])
+
+    def test_free_slots_follow_opening_hours_and_days(self):
+        # Friday 11:00: the last slot ends at closing time, then Monday 8:00
+        slots = free_slots(at(11, day=11), at(8, 15, day=14), 60, count=5)
+        self.assertEqual(slots, [(at(11, day=11), at(12, day=11)), (at(8, day=14), at(9, day=14))])
+
+    def test_maximum_duration(self):
+        self.assertEqual(clean_duration('', 'Chirurgie'), 120)
+        self.assertEqual(clean_duration('480', 'Chirurgie'), 480)
+        for value in ('0', '481', 'x'):
+            with self.assertRaises(ValueError):
+                clean_duration(value, 'Consultation')
+        with self.assertRaises(ValueError):
+            self.book(at(8), 481)
+        self.assertFalse(Reservation.objects.exists())
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def page(self, queryset, cursor=None, ordering=('id',), **params):
+        if cursor:
+            params['cursor'] = cursor
+        return keyset_paginate(self.factory.get('/', params), queryset, ordering=ordering, page_size=3)
+
+    def walk(self, queryset, ordering):
+        """Ids of every page going forward, then going back from the last one"""
+        forward, page = [], self.page(queryset, ordering=ordering)
+        forward.append([obj.pk for obj in page])
+        while page.has_next:
+            page = self.page(queryset, page.next_cursor, ordering)
+            forward.append([obj.pk for obj in page])
+        backward = []
+        while page.has_previous:
+            page = self.page(queryset, page.prev_cursor, ordering)
+            backward.append([obj.pk for obj in page])
+        return forward, backward
+
+    def make_clients(self, count):
+        return [
+            Client.objects.create(nom=f'Client {i}', prenom='Test', telephone='0600000000', email=f'c{i}@example.com').pk
+            for i in range(count)
+        ]
+
+    def make_logs(self, dates):
+        logs = Log.objects.bulk_create([Log(action='system', date_action=moment) for moment in dates])
+        return [log.pk for log in logs]
+
+    def test_round_trip(self):
+        ids = self.make_clients(7)
+        forward, backward = self.walk(Client.objects.all(), ('id',))
+        self.assertEqual(forward, [ids[0:3], ids[3:6], ids[6:7]])
+        self.assertEqual(backward, [ids[3:6], ids[0:3]])
+
+    def test_first_and_last_pages(self):
+        self.make_clients(3)
+        page = self.page(Client.objects.all())
+        self.assertFalse(page.has_previous)
+        self.assertFalse(page.has_next)
+        self.assertEqual(len(page), 3)
+
+    def test_descending_order_with_ties(self):
+        moment = at(9)
+        # Equal dates, and dates a few microseconds apart
+        dates = [moment] * 4 + [moment + timedelta(microseconds=n) for n in (1, 2, 100)] + [moment - timedelta(days=1)]
+        self.make_logs(dates)
+        expected = list(Log.objects.order_by('-date_action', '-id').values_list('pk', flat=True))
+        forward, backward = self.walk(Log.objects.all(), ('-date_action', '-id'))
+        self.assertEqual([pk for page in forward for pk in page], expected)
+        self.assertEqual(backward, [expected[3:6], expected[0:3]])
+
+    def test_invalid_cursors_give_the_first_page(self):
+        ids = self.make_clients(4)
+
+        def b64(raw):
+            return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+        for cursor in (
+            'not a cursor!',
+            b64('not json'),
+            b64('[1, 2]'),
+            encode_cursor('x', [ids[0]]),
+            encode_cursor('n', [ids[0], ids[1]]),
+            encode_cursor('n', ['abc']),
+        ):
+            page = self.page(Client.objects.all(), cursor)
+            self.assertEqual([obj.pk for obj in page], ids[:3], cursor)
+            self.assertFalse(page.has_previous)
+
+    def test_page_size_bounds(self):
+        self.make_clients(4)
+        request = self.factory.get('/', {'per_page': '2'})
+        self.assertEqual(len(keyset_paginate(request, Client.objects.all())), 2)
+        with override_settings(PAGINATION_MAX_PAGE_SIZE=3):
+            request = self.factory.get('/', {'per_page': '100'})
+            self.assertEqual(len(keyset_paginate(request, Client.objects.all())), 3)
+        request = self.factory.get('/', {'per_page': 'x'})
+        self.assertEqual(len(keyset_paginate(request, Client.objects.all())), 4)
+
+    def test_lazy_page_queries_on_first_use(self):
+        self.make_clients(2)
+        with self.assertNumQueries(0):
+            page = lazy_keyset_paginate(self.factory.get('/'), Client.objects.all())
+        with self.assertNumQueries(1):
+            self.assertEqual(len(page), 2)
+            self.assertFalse(page.has_next)
+
+
+# Child process queueing one entry then exiting at once: only the atexit
+# flush can write it (the flusher thread would wait an hour)
+LOG_AT_EXIT_SCRIPT = """
+import sys
+import django
+from django.conf import settings
+settings.DATABASES['default']['NAME'] = sys.argv[1]
+settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+settings.LOG_BUFFER_FLUSH_INTERVAL = 3600
+django.setup()
+from django.core.management import call_command
+call_command('migrate', verbosity=0)
+from core.logbuffer import log_buffer
+from core.models import Log
+log_buffer.add(Log(action='system', description='at exit'))
+"""
+
+
+class _StopFlusher(Exception):
+    pass
+
+
+@override_settings(LOG_BUFFER_SYNC=False, LOG_BUFFER_BATCH_SIZE=3, LOG_BUFFER_MAX_SIZE=10, LOG_BUFFER_FLUSH_INTERVAL=5)
+class LogBufferTests(TestCase):
+    def setUp(self):
+        self.buffer = LogBuffer()
+        # The tests flush themselves: no background thread
+        patcher = mock.patch.object(self.buffer, '_ensure_flusher')
+        self.ensure_flusher = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add(self, count):
+        for i in range(count):
+            self.buffer.add(Log(action='system', description=f'entry {i}'))
+
+    def test_entries_wait_for_the_flush(self):
+        self.add(2)
+        self.assertFalse(Log.objects.exists())
+        self.assertEqual(self.buffer.stats()['queue_depth'], 2)
+        self.ensure_flusher.assert_called()
+        with CaptureQueriesContext(connection) as queries:
+            self.buffer.flush()
+        inserts = [query for query in queries.captured_queries if query['sql'].startswith('INSERT INTO "core_log"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Log.objects.count(), 2)
+        self.assertEqual(self.buffer.stats()['queue_depth'], 0)
+        self.assertEqual(self.buffer.flushed_count, 2)
+
+    def test_a_full_batch_wakes_the_flusher(self):
+        self.add(2)
+        self.assertFalse(self.buffer._wakeup.is_set())
+        self.add(1)
+        self.assertTrue(self.buffer._wakeup.is_set())
+
+    def test_flush_writes_every_batch(self):
+        self.add(7)
+        self.buffer.flush()
+        self.assertEqual(Log.objects.count(), 7)
+        self.assertEqual(self.buffer.flushed_count, 7)
+
+    def test_flusher_flushes_every_interval(self):
+        waits = []
+
+        def wait(timeout):
+            waits.append(timeout)
+            if len(waits) > 1:
+                raise _StopFlusher
+
+        self.add(2)
+        with mock.patch.object(self.buffer._wakeup, 'wait', side_effect=wait), \
+                mock.patch('core.logbuffer.connection'), self.assertRaises(_StopFlusher):
+            self.buffer._run()
+        self.assertEqual(waits, [5, 5])
+        self.assertEqual(Log.objects.count(), 2)
+
+    def test_failed_write_drops_the_batch(self):
+        self.add(4)
+        with mock.patch.object(Log.objects, 'bulk_create', side_effect=DatabaseError('disk full')), \
+                redirect_stdout(io.StringIO()) as output:
+            self.buffer.flush()
+        self.assertIn('Logging failed: disk full', output.getvalue())
+        stats = self.buffer.stats()
+        self.assertEqual((stats['dropped'], stats['failed_flushes'], stats['flushed']), (3, 1, 0))
+        # The next batch stays queued for the next flush
+        self.assertEqual(stats['queue_depth'], 1)
+        self.assertFalse(Log.objects.exists())
+        self.buffer.flush()
+        self.assertEqual(Log.objects.count(), 1)
+
+    def test_full_queue_drops_new_entries(self):
+        self.add(12)
+        self.assertEqual(self.buffer.stats()['queue_depth'], 10)
+        self.assertEqual(self.buffer.dropped_count, 2)
+
+    @override_settings(LOG_BUFFER_SYNC=True)
+    def test_sync_mode_saves_at_once(self):
+        self.add(2)
+        self.assertEqual(Log.objects.count(), 2)
+        self.ensure_flusher.assert_not_called()
+
+    def test_pending_entries_are_flushed_at_exit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            database = Path(directory) / 'db.sqlite3'
+            subprocess.run(
+                [sys.executable, '-c', LOG_AT_EXIT_SCRIPT, str(database)],
+                cwd=settings.BASE_DIR, check=True, capture_output=True,
+                env={'DJANGO_SETTINGS_MODULE': 'veterinaire_gestion.settings', 'PATH': ''},
+            )
+            with sqlite3.connect(database) as db:
+                rows = db.execute("SELECT description FROM core_log").fetchall()
+        self.assertEqual(rows, [('at exit',)])
+
+
+@override_settings(STOCK_ALERT_THRESHOLD=10, STOCK_EXPIRY_ALERT_DAYS=30)
+class StockAlertTests(TestCase):
+    def alerts(self, produit):
+        return list(produit.alertes.order_by('pk').values_list('type', 'quantite', 'seuil', 'date_resolution'))
+
+    def test_low_stock_opens_one_alert(self):
+        produit = make_produit(quantite=4)
+        produit.quantite = 3
+        produit.save()
+        evaluate_products([produit.pk])
+        self.assertEqual(self.alerts(produit), [(StockAlert.LOW_STOCK, 4, 10, None)])
+
+    def test_restocking_resolves_the_alert(self):
+        produit = make_produit(quantite=4)
+        produit.quantite = 50
+        produit.save()
+        [(alert_type, _, _, resolved)] = self.alerts(produit)
+        self.assertEqual(alert_type, StockAlert.LOW_STOCK)
+        self.assertIsNotNone(resolved)
+        self.assertFalse(open_alerts().exists())
+
+        # A new shortage opens a new alert, next to the resolved one
+        produit.quantite = 2
+        produit.save()
+        self.assertEqual(open_alerts(StockAlert.LOW_STOCK).get().quantite, 2)
+        self.assertEqual(produit.alertes.count(), 2)
+
+    def test_product_and_category_thresholds(self):
+        produit = make_produit(quantite=5, seuil_stock=3)
+        self.assertFalse(open_alerts().exists())
+        produit.seuil_stock = None
+        produit.save()
+        self.assertEqual(open_alerts().get().seuil, 10)
+        categorie = produit.categorie
+        categorie.seuil_stock = 2
+        categorie.save()
+        self.assertFalse(open_alerts().exists())
+
+    def test_one_open_alert_per_product_and_type(self):
+        produit = make_produit(quantite=4)
+        duplicate = StockAlert(produit=produit, type=StockAlert.LOW_STOCK, quantite=4, seuil=10)
+        # A concurrent evaluation inserting the same alert is ignored...
+        StockAlert.objects.bulk_create([duplicate], ignore_conflicts=True)
+        self.assertEqual(open_alerts().count(), 1)
+        # ...and refused when inserted on its own
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            StockAlert.objects.create(produit=produit, type=StockAlert.LOW_STOCK, quantite=4, seuil=10)
+        # Other types and resolved alerts don't count
+        StockAlert.objects.create(produit=produit, type=StockAlert.EXPIRING, quantite=4)
+        StockAlert.objects.create(produit=produit, type=StockAlert.LOW_STOCK, quantite=4, date_resolution=timezone.now())
+        self.assertEqual(produit.alertes.count(), 3)
+
+    def test_expiry_alerts_follow_the_date(self):
+        produit = make_produit(quantite=50)
+        self.assertEqual(sweep_expiry(today=date(2029, 11, 1)), (0, 0))
+        self.assertEqual(sweep_expiry(today=date(2029, 12, 15)), (1, 0))
+        self.assertEqual(open_alerts(StockAlert.EXPIRING).get().produit, produit)
+        self.assertEqual(sweep_expiry(today=date(2029, 12, 16)), (0, 0))
+        produit.date_expiration = date(2031, 1, 1)
+        produit.save()
+        self.assertEqual(sweep_expiry(today=date(2029, 12, 16)), (0, 0))
+        self.assertFalse(open_alerts().exists())
+
+
+class InventoryStatsTests(TestCase):
+    def test_incremental_figures_match_a_rebuild(self):
+        rebuild_inventory_stats()
+        croquettes = make_produit('Croquettes', quantite=4, prix='10.00')
+        collier = make_produit('Collier', quantite=20, prix='2.50')
+        croquettes.quantite = 6
+        croquettes.save()
+        collier.delete()
+        checkout([{'id': croquettes.pk, 'quantity': 1}])
+        self.assertEqual(get_inventory_stats(), compute_inventory_stats())
+        self.assertEqual(get_inventory_stats(), {'total_products': 1, 'total_value': Decimal('50.00')})
+
+
+class _Rollback(Exception):
+    pass
+
+
+class RollupTests(TestCase):
+    def rollups(self):
+        # Buckets emptied by deletes stay at zero; a rebuild doesn't create them
+        return set(MetricRollup.objects.exclude(nombre=0, somme=0).values_list(
+            'metrique', 'periode', 'debut', 'dimension', 'nombre', 'somme',
+        ))
+
+    def assertMatchesRebuild(self):
+        incremental = self.rollups()
+        rebuild_rollups()
+        self.assertEqual(incremental, self.rollups())
+
+    def book(self, animal, start, service='Consultation'):
+        return Reservation.objects.create(
+            client=animal.client, animal=animal, date_reservation=start, service=service, statut='Scheduled',
+        )
+
+    def test_saves_updates_and_deletes_match_a_rebuild(self):
+        rex = make_animal('Rex')
+        mina = make_animal('Mina')
+        first = self.book(rex, at(9, day=7))
+        self.book(rex, at(10, day=7), 'Vaccination')
+        self.book(mina, at(9, day=20))
+        # Moved to another day, week and month, and to another service
+        first.date_reservation = at(9, day=31)
+        first.service = 'Chirurgie'
+        first.save()
+        vente = Vente.objects.create(total=Decimal('120.50'), date_vente=at(11, day=8))
+        Vente.objects.create(total=Decimal('30.00'), date_vente=at(12, day=8))
+        vente.total = Decimal('99.99')
+        vente.save()
+        mina.delete()
+        self.assertMatchesRebuild()
+
+    def test_cascading_delete_in_a_batch_matches_a_rebuild(self):
+        rex = make_animal('Rex')
+        for day in (7, 8, 15):
+            self.book(rex, at(9, day=day))
+        with transaction.atomic(), rollup_batch():
+            rex.client.delete()
+        self.assertFalse(self.rollups())
+        self.assertMatchesRebuild()
+
+    def test_rolled_back_changes_leave_the_rollups_alone(self):
+        rex = make_animal('Rex')
+        self.book(rex, at(9))
+        with self.assertRaises(_Rollback), transaction.atomic(), rollup_batch():
+            self.book(rex, at(10))
+            raise _Rollback
+        try:
+            with transaction.atomic():
+                self.book(rex, at(11))
+                raise _Rollback
+        except _Rollback:
+            pass
+        self.assertMatchesRebuild()
+
+    def test_bulk_created_rows(self):
+        client = make_animal('Rex').client
+        animals = Animal.objects.bulk_create([
+            Animal(nom=f'Animal {i}', type='Chat', race='Persan', age=1, client=client, date_ajout=date(2030, 1, i + 1))
+            for i in range(3)
+        ])
+        add_rollup_rows('animaux', animals)
+        self.assertMatchesRebuild()
+
+    def test_failed_update_is_rolled_back_alone(self):
+        rex = make_animal('Rex')
+
+        def fail(facts):
+            MetricRollup.objects.create(metrique='partial', periode=MetricRollup.DAY, debut=date(2030, 1, 1))
+            raise DatabaseError('rollups locked')
+
+        with transaction.atomic():
+            with mock.patch('core.rollups.apply_rollup_changes', side_effect=fail), \
+                    redirect_stdout(io.StringIO()) as output:
+                booking = self.book(rex, at(9))
+            # The caller's transaction goes on
+            booking.note = 'Saved'
+            booking.save()
+        self.assertIn('Rollup update failed: rollups locked', output.getvalue())
+        self.assertEqual(Reservation.objects.get().note, 'Saved')
+        self.assertFalse(MetricRollup.objects.filter(metrique='partial').exists())
+
+
+class ImporterTests(TestCase):
+    def run_import(self, text, chunk_size=2):
+        return ClientImporter(chunk_size=chunk_size).run(io.StringIO(text))
+
+    def test_bad_header_is_a_format_error(self):
+        with self.assertRaisesMessage(ImportFormatError, 'Missing column(s): phone, email.'):
+            self.run_import('first name,last name\nJean,Dupont\n')
+        with self.assertRaises(ImportFormatError):
+            self.run_import('')
+
+    def test_invalid_rows_are_counted_once(self):
+        report = self.run_import(
+            'first name;last name;phone;email\n'
+            'Jean;Dupont;0600000001;jean@example.com\n'
+            'Paul;Martin;0600000002;not an email\n'
+            'Anne;Durand;0600000003;jean@example.com\n'
+        )
+        self.assertEqual(report.created, 1)
+        self.assertEqual(report.error_count, 2)
+        self.assertEqual([error['line'] for error in report.errors], [3, 4])
+
+    def test_failed_batch_rejects_its_valid_rows_only(self):
+        create = Client.objects.bulk_create
+
+        def fail_second_chunk(objects, *args, **kwargs):
+            if objects[0].prenom == 'Paul':
+                raise DatabaseError('database is locked')
+            return create(objects, *args, **kwargs)
+
+        with mock.patch.object(Client.objects, 'bulk_create', side_effect=fail_second_chunk):
+            report = self.run_import(
+                'first name,last name,phone,email\n'
+                'Jean,Dupont,0600000001,jean@example.com\n'
+                'Anne,Durand,0600000002,anne@example.com\n'
+                'Paul,Martin,0600000003,paul@example.com\n'
+                'Eve,Bernard,0600000004,bad email\n'
+                'Marc,Petit,0600000005,marc@example.com\n'
+            )
+        self.assertEqual(report.created, 3)
+        self.assertEqual(report.error_count, 2)
+        self.assertEqual([error['line'] for error in report.errors], [5, 4])
+        self.assertEqual(report.errors[1]['message'], 'Database error: database is locked')
+        self.assertEqual(
+            sorted(Client.objects.values_list('prenom', flat=True)), ['Anne', 'Jean', 'Marc'],
+        )
+
+
+class CompressedStaticFilesTests(TestCase):
+    def collect(self, **overrides):
+        with tempfile.TemporaryDirectory() as root, override_settings(**overrides):
+            storage = CompressedManifestStaticFilesStorage(location=root)
+            storage.save('app.css', io.BytesIO(b'body { color: red; }\n' * 50))
+            with redirect_stdout(io.StringIO()) as output:
+                list(storage.post_process({'app.css': (storage, 'app.css')}))
+            return sorted(path.name for path in Path(root).glob('app.*.css*')), output.getvalue()
+
+    @mock.patch('core.staticfiles.brotli', None)
+    def test_missing_brotli_is_reported(self):
+        files, output = self.collect()
+        self.assertEqual([name.endswith('.gz') for name in files], [False, True])
+        self.assertIn('brotli is not installed', output)
+        self.assertEqual(self.collect(STATIC_BROTLI=False)[1], '')
+        with self.assertRaises(ImproperlyConfigured):
+            self.collect(STATIC_BROTLI=True)
@@ -0,0 +1,35 @@
+from django.db import transaction
+
+
+def on_commit_batch(key, flush, items=()):
+    """
+    Call flush(items) once after the current transaction commits, with the
+    items of every call made under `key` meanwhile (right away outside a
+    transaction): rows changed in a loop or by a cascading delete are
+    handled together instead of once per row.
+
+    Every call registers its own callback and the first one to run does the
+    work, so a rolled back savepoint can't lose the batch. Items added by
+    rolled back work stay in the batch and are flushed with the next one:
+    `flush` must tolerate them (reindex, invalidate; not counters).
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        flush(set(items))
+        return
+
+    batches = connection.__dict__.setdefault('_commit_batches', {})
+    batch = batches.get(key)
+    if batch is None:
+        batch = batches[key] = {'items': set(), 'done': False}
+    batch['items'].update(items)
+
+    def run():
+        if batch['done']:
+            return
+        batch['done'] = True
+        if batches.get(key) is batch:
+            del batches[key]
+        flush(batch['items'])
+
+    transaction.on_commit(run)
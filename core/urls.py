@@ -15,6 +15,7 @@ urlpatterns = [
     path('clients/', views.clients, name='clients'),
     path('animals/', views.animals, name='animals'),
     path('facture/', views.facture, name='facture'),
+    path('factures/<int:pk>/<str:fmt>/', views.invoice_document, name='invoice_document'),
     path('report/', views.report, name='report'),
     path('settings/', views.settings_view, name='settings'),
     # Export URLs
@@ -24,6 +25,10 @@ urlpatterns = [
     path('export/products/csv/', views.export_products_csv, name='export_products_csv'),
     path('export/logs/csv/', views.export_logs_csv, name='export_logs_csv'),
     path('export/reports/csv/', views.export_reports_csv, name='export_reports_csv'),
+    # Import URLs
+    path('import/clients/csv/', views.import_clients_csv, name='import_clients_csv'),
+    path('import/animals/csv/', views.import_animals_csv, name='import_animals_csv'),
+    path('import/products/csv/', views.import_products_csv, name='import_products_csv'),
     # Bulk Delete URLs
     path('bulk-delete/clients/', views.bulk_delete_clients, name='bulk_delete_clients'),
     path('bulk-delete/animals/', views.bulk_delete_animals, name='bulk_delete_animals'),
@@ -33,6 +38,10 @@ urlpatterns = [
     path('export/users/csv/', views.export_users_csv, name='export_users_csv'),
     # All appointments API
     path('api/all_appointments/', views.all_appointments, name='all_appointments'),
+    # Free appointment slots API
+    path('api/free_slots/', views.free_slots_api, name='free_slots'),
+    path('api/checkout/', views.checkout_api, name='checkout'),
+    path('api/forecast/', views.forecast_api, name='forecast'),
     # Category Management URLs
     path('delete-category/<int:category_id>/', views.delete_category, name='delete_category'),
     # Supplier Management URLs
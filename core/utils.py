@@ -1,8 +1,37 @@
 from django.contrib.auth.models import User
 from django.utils import timezone
 from .models import Log
+from .logbuffer import log_buffer
+from .search import index_objects
 import json
 
+def build_log_entry(request, action, description, table_cible=None, id_element=None):
+    """Unsaved Log instance for an action of the request's user"""
+    # Get user from request
+    user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
+    
+    # Get IP address
+    ip_address = None
+    if hasattr(request, 'META'):
+        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            ip_address = x_forwarded_for.split(',')[0]
+        else:
+            ip_address = request.META.get('REMOTE_ADDR')
+    
+    # Get user agent
+    user_agent = request.META.get('HTTP_USER_AGENT', '') if hasattr(request, 'META') else ''
+    
+    return Log(
+        user=user,
+        action=action,
+        description=description,
+        table_cible=table_cible,
+        id_element=id_element,
+        ip_address=ip_address,
+        user_agent=user_agent
+    )
+
 def log_activity(request, action, description, table_cible=None, id_element=None):
     """
     Log an activity in the system
@@ -15,31 +44,8 @@ def log_activity(request, action, description, table_cible=None, id_element=None
         id_element: ID of the affected element (optional)
     """
     try:
-        # Get user from request
-        user = request.user if hasattr(request, 'user') and request.user.is_authenticated else None
-        
-        # Get IP address
-        ip_address = None
-        if hasattr(request, 'META'):
-            x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-            if x_forwarded_for:
-                ip_address = x_forwarded_for.split(',')[0]
-            else:
-                ip_address = request.META.get('REMOTE_ADDR')
-        
-        # Get user agent
-        user_agent = request.META.get('HTTP_USER_AGENT', '') if hasattr(request, 'META') else ''
-        
-        # Create log entry
-        Log.objects.create(
-            user=user,
-            action=action,
-            description=description,
-            table_cible=table_cible,
-            id_element=id_element,
-            ip_address=ip_address,
-            user_agent=user_agent
-        )
+        # Queue log entry (written in batches by the log buffer)
+        log_buffer.add(build_log_entry(request, action, description, table_cible, id_element))
     except Exception as e:
         # If logging fails, don't break the main functionality
         print(f"Logging failed: {e}")
@@ -94,6 +100,19 @@ def log_delete(request, model_name, object_id, object_name):
         id_element=object_id
     )
 
+def log_bulk_delete(request, model_name, deleted):
+    """
+    Log the deletion of many records with one bulk_create, in the current
+    transaction (the audit rows commit or roll back with the deletes).
+    `deleted` is a list of (object_id, object_name) pairs.
+    """
+    entries = Log.objects.bulk_create([
+        build_log_entry(request, 'delete', f"Deleted {model_name}: {object_name}", model_name, object_id)
+        for object_id, object_name in deleted
+    ])
+    # bulk_create sends no post_save: index the new rows here
+    index_objects('log', [entry.pk for entry in entries])
+
 def log_view(request, model_name, object_id=None, object_name=None):
     """Log record view"""
     description = f"Viewed {model_name}"
@@ -117,6 +136,15 @@ def log_export(request, model_name, format_type):
         table_cible=model_name
     )
 
+def log_import(request, model_name, created, rejected):
+    """Log data import"""
+    log_activity(
+        request=request,
+        action='import',
+        description=f"Imported {created} {model_name} record(s) from CSV ({rejected} row(s) rejected)",
+        table_cible=model_name
+    )
+
 def log_password_change(request, user):
     """Log password change"""
     log_activity(
@@ -165,6 +193,15 @@ def log_stock_alert(request, product_name, current_quantity, threshold=10):
         table_cible='core_produit'
     )
 
+def log_expiry_alert(request, product_name, date_expiration):
+    """Log expiry alert"""
+    log_activity(
+        request=request,
+        action='stock_alert',
+        description=f"Expiry alert: {product_name} expires on {date_expiration:%d/%m/%Y}",
+        table_cible='core_produit'
+    )
+
 def log_system_action(request, description):
     """Log system-level actions"""
     log_activity(
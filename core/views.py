@@ -1,15 +1,32 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib.auth import authenticate, login as auth_login, logout as auth_logout
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib import messages
-from django.http import HttpResponseRedirect, JsonResponse
-from .models import Client, Animal, Reservation, Produit, Categorie, Fournisseur, Log, RapportEnvoye, UserProfile
+from django.http import FileResponse, Http404, HttpResponseRedirect, JsonResponse
+from django.core.files.storage import default_storage
+from django.conf import settings
+from .models import Client, Animal, Reservation, Produit, Categorie, Fournisseur, Log, RapportEnvoye, UserProfile, Facture, StockAlert
 from .decorators import admin_required, veterinarian_required, assistant_required, receptionist_required
-from .utils import log_login, log_logout, log_create, log_update, log_delete, log_export, log_password_change, log_profile_update, log_theme_change, log_report_sent
-from django.db import models
+from .permissions import get_user_role
+from .pagination import keyset_paginate, lazy_keyset_paginate
+from .logbuffer import log_buffer
+from .stats import get_dashboard_stats
+from .fragments import fragment_cache_context
+from .inventory import compute_inventory_stats, get_inventory_stats
+from .search import apply_search
+from .scheduling import INACTIVE_STATUSES, SchedulingConflict, clean_duration, ensure_available, free_slots, overlapping
+from .alerts import open_alerts
+from .forecasting import ForecastUnavailable, forecast
+from .invoicing import ensure_rendered
+from .rollups import rollup_batch, rollup_series, window_start
+from .sales import CheckoutError, checkout
+from .importers import AnimalImporter, ClientImporter, ImportFormatError, ProduitImporter, open_csv
+from .utils import log_login, log_logout, log_create, log_update, log_delete, log_export, log_import, log_bulk_delete, log_password_change, log_profile_update, log_theme_change, log_report_sent
+from django.db import OperationalError, models, transaction
 import csv
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 import json
 
 def root_redirect(request):
@@ -131,33 +148,23 @@ def dashboard(request):
     from django.utils import timezone
     from datetime import datetime, timedelta
     
-    # Basic counts
-    total_clients = Client.objects.count()
-    total_animals = Animal.objects.count()
-    total_reservations = Reservation.objects.count()
-    total_products = Produit.objects.count()
+    # Counts and revenue figures (cached snapshot, see core/stats.py)
+    stats = get_dashboard_stats()
     
-    # Since Client model doesn't have date_creation, we'll use total clients for now
-    # You can add this field later if needed
-    new_clients_this_month = total_clients  # Placeholder - can be enhanced later
-    
-    # Calculate revenue from products (since reservations don't have price)
-    total_revenue = sum(product.prix * product.quantite for product in Produit.objects.all())
-    
-    # Recent products for revenue calculation
-    recent_products = Produit.objects.filter(
-        date_ajout__gte=timezone.now().date() - timedelta(days=30)
+    # Open low-stock alerts (maintained by core/alerts.py), lowest stock first
+    stock_alerts = (
+        open_alerts(StockAlert.LOW_STOCK)
+        .select_related('produit__categorie', 'produit__fournisseur')
+        .order_by('produit__quantite')[:5]
     )
-    monthly_revenue = sum(product.prix * product.quantite for product in recent_products)
-    
-    # Stock alerts
-    stock_alerts = Produit.objects.filter(quantite__lte=5).order_by('quantite')[:5]
     
     # Upcoming appointments (today and tomorrow)
     today = timezone.now().date()
-    tomorrow = today + timedelta(days=1)
+    # Plain range on date_reservation so the index is used (no __date cast)
+    window_start = timezone.make_aware(datetime.combine(today, datetime.min.time()))
     upcoming_appointments = Reservation.objects.filter(
-        date_reservation__date__in=[today, tomorrow]
+        date_reservation__gte=window_start,
+        date_reservation__lt=window_start + timedelta(days=2),
     ).order_by('date_reservation')[:5]
     
     # Team members (users with profiles)
@@ -166,87 +173,75 @@ def dashboard(request):
     # Recent logs (using date_action instead of date_creation)
     recent_logs = Log.objects.order_by('-date_action')[:3]
     
-    # Show different data based on user role
-    if hasattr(request.user, 'profile'):
-        user_role = request.user.profile.role
-    else:
-        # Create profile if it doesn't exist
-        UserProfile.objects.create(user=request.user)
-        user_role = request.user.profile.role
-    
-    can_manage_users = user_role == 'admin' or request.user.is_superuser
-    can_view_logs = user_role in ['admin', 'veterinarian'] or request.user.is_superuser
-    can_view_reports = user_role in ['admin', 'veterinarian'] or request.user.is_superuser
-    can_manage_stock = user_role in ['admin', 'veterinarian', 'assistant'] or request.user.is_superuser
+    # Role and capability flags (can_manage_users, ...) come from the
+    # user_permissions context processor
     
     return render(request, 'core/dashboard.html', {
-        'total_clients': total_clients,
-        'total_animals': total_animals,
-        'total_reservations': total_reservations,
-        'total_products': total_products,
-        'new_clients_this_month': new_clients_this_month,
-        'total_revenue': total_revenue,
-        'monthly_revenue': monthly_revenue,
+        **stats,
         'stock_alerts': stock_alerts,
         'upcoming_appointments': upcoming_appointments,
         'team_members': team_members,
         'recent_logs': recent_logs,
-        'can_manage_users': can_manage_users,
-        'can_view_logs': can_view_logs,
-        'can_view_reports': can_view_reports,
-        'can_manage_stock': can_manage_stock,
-        'user_role': user_role,
     })
 
 @login_required(login_url='login')
 def reservation(request):
     from django.shortcuts import get_object_or_404
+    from datetime import timedelta
     search_query = request.GET.get('search', '')
     qs = Reservation.objects.select_related('client', 'animal').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(client__nom__icontains=search_query) |
-            models.Q(client__prenom__icontains=search_query) |
-            models.Q(animal__nom__icontains=search_query) |
-            models.Q(service__icontains=search_query) |
-            models.Q(statut__icontains=search_query)
-        )
+    qs = apply_search(qs, 'reservation', search_query)
     clients = Client.objects.all()
     animals = Animal.objects.all()
     if request.method == 'POST':
         edit_id = request.POST.get('edit_id')
         client_id = request.POST.get('client')
         animal_id = request.POST.get('animal')
-        date_reservation = request.POST.get('date_reservation')
+        date_reservation = _parse_calendar_bound(request.POST.get('date_reservation'))
         service = request.POST.get('service')
         statut = request.POST.get('statut')
         note = request.POST.get('note')
+        try:
+            duree_minutes = clean_duration(request.POST.get('duree_minutes'), service)
+        except ValueError as e:
+            messages.error(request, str(e))
+            return redirect('reservation')
+        if date_reservation is None and (edit_id or request.POST.get('date_reservation')):
+            messages.error(request, 'Invalid appointment date.')
+            return redirect('reservation')
         if edit_id:
             reservation = get_object_or_404(Reservation, id=edit_id)
-            reservation.client_id = client_id
-            reservation.animal_id = animal_id
-            reservation.date_reservation = date_reservation
-            reservation.service = service
-            reservation.statut = statut
-            reservation.note = note
-            reservation.save()
+        elif not (client_id and animal_id and date_reservation and service and statut):
+            return redirect('reservation')
         else:
-            if client_id and animal_id and date_reservation and service and statut:
-                Reservation.objects.create(
-                    client_id=client_id,
-                    animal_id=animal_id,
-                    date_reservation=date_reservation,
-                    service=service,
-                    statut=statut,
-                    note=note
-                )
+            reservation = Reservation()
+        reservation.client_id = client_id
+        reservation.animal_id = animal_id
+        reservation.date_reservation = date_reservation
+        reservation.duree_minutes = duree_minutes
+        reservation.service = service
+        reservation.statut = statut
+        reservation.note = note
+        try:
+            with transaction.atomic():
+                # Cancelled appointments don't hold their slot
+                if statut not in INACTIVE_STATUSES:
+                    ensure_available(
+                        date_reservation,
+                        date_reservation + timedelta(minutes=duree_minutes),
+                        animal_id=animal_id,
+                        exclude_id=reservation.pk,
+                    )
+                reservation.save()
+        except SchedulingConflict as e:
+            messages.error(request, str(e))
         return redirect('reservation')
     elif request.method == 'GET' and 'delete' in request.GET:
         reservation = get_object_or_404(Reservation, id=request.GET.get('delete'))
         reservation.delete()
         return redirect('reservation')
     elif request.method == 'GET' and 'edit' in request.GET:
-        all_reservations = qs
+        all_reservations = keyset_paginate(request, qs)
         reservation_to_edit = get_object_or_404(Reservation, id=request.GET.get('edit'))
         return render(request, 'core/reservation.html', {
             'reservations': all_reservations,
@@ -255,7 +250,7 @@ def reservation(request):
             'animals': animals,
             'search_query': search_query
         })
-    all_reservations = qs
+    all_reservations = keyset_paginate(request, qs)
     return render(request, 'core/reservation.html', {
         'reservations': all_reservations,
         'clients': clients,
@@ -263,17 +258,42 @@ def reservation(request):
         'search_query': search_query
     })
 
+def _stock_header_stats(produits, search_query):
+    """
+    Header figures of the stock page: read from the materialized inventory
+    statistics and the open stock alerts, restricted to the search results
+    when filtering
+    """
+    alerts = open_alerts()
+    if search_query:
+        figures = compute_inventory_stats(produits)
+        alerts = alerts.filter(produit__in=produits.values('pk'))
+    else:
+        figures = get_inventory_stats()
+    
+    # Low-stock and expiring-soon counts come from the open stock alerts
+    alert_counts = dict(alerts.values('type').annotate(count=models.Count('id')).values_list('type', 'count'))
+    
+    return {
+        'total_products': figures['total_products'],
+        'low_stock_count': alert_counts.get(StockAlert.LOW_STOCK, 0),
+        'total_value': float(figures['total_value']),
+        'expiring_soon_count': alert_counts.get(StockAlert.EXPIRING, 0),
+    }
+
+def _optional_threshold(value):
+    """Alert threshold posted by the stock forms (blank or invalid: None, the inherited one)"""
+    try:
+        return max(0, int(value))
+    except (TypeError, ValueError):
+        return None
+
 @assistant_required
 def stock(request):
     from django.shortcuts import get_object_or_404
     search_query = request.GET.get('search', '')
     qs = Produit.objects.select_related('categorie', 'fournisseur').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(categorie__nom__icontains=search_query) |
-            models.Q(fournisseur__nom__icontains=search_query)
-        )
+    qs = apply_search(qs, 'produit', search_query)
     
     # Filter categories based on search query
     categories = Categorie.objects.all()
@@ -297,13 +317,15 @@ def stock(request):
     if request.method == 'POST' and 'cat_form' in request.POST:
         cat_edit_id = request.POST.get('cat_edit_id')
         nom = request.POST.get('cat_nom')
+        seuil_stock = _optional_threshold(request.POST.get('cat_seuil_stock'))
         if cat_edit_id:
             cat = get_object_or_404(Categorie, id=cat_edit_id)
             cat.nom = nom
+            cat.seuil_stock = seuil_stock
             cat.save()
         else:
             if nom:
-                Categorie.objects.create(nom=nom)
+                Categorie.objects.create(nom=nom, seuil_stock=seuil_stock)
         return redirect('stock')
     elif request.method == 'GET' and 'cat_delete' in request.GET:
         cat = get_object_or_404(Categorie, id=request.GET.get('cat_delete'))
@@ -312,23 +334,15 @@ def stock(request):
     elif request.method == 'GET' and 'cat_edit' in request.GET:
         all_produits = qs
         cat_to_edit = get_object_or_404(Categorie, id=request.GET.get('cat_edit'))
-        # Calculate statistics
-        from datetime import timedelta
-        from django.utils import timezone
-        low_stock_count = all_produits.filter(quantite__lte=10).count()
-        total_value = sum(float(p.prix) * p.quantite for p in all_produits)
-        thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-        expiring_soon_count = all_produits.filter(date_expiration__lte=thirty_days_from_now).count()
         
         return render(request, 'core/stock.html', {
-            'produits': all_produits,
+            'produits': lazy_keyset_paginate(request, all_produits),
             'cat_to_edit': cat_to_edit,
             'categories': categories,
             'fournisseurs': fournisseurs,
             'search_query': search_query,
-            'low_stock_count': low_stock_count,
-            'total_value': total_value,
-            'expiring_soon_count': expiring_soon_count,
+            **_stock_header_stats(all_produits, search_query),
+            **fragment_cache_context(),
         })
     # Supplier CRUD
     if request.method == 'POST' and 'fourn_form' in request.POST:
@@ -356,11 +370,12 @@ def stock(request):
         all_produits = qs
         fourn_to_edit = get_object_or_404(Fournisseur, id=request.GET.get('fourn_edit'))
         return render(request, 'core/stock.html', {
-            'produits': all_produits,
+            'produits': lazy_keyset_paginate(request, all_produits),
             'fourn_to_edit': fourn_to_edit,
             'categories': categories,
             'fournisseurs': fournisseurs,
-            'search_query': search_query
+            'search_query': search_query,
+            **fragment_cache_context(),
         })
     # Product CRUD (already implemented)
     if request.method == 'POST' and 'prod_form' in request.POST:
@@ -372,6 +387,7 @@ def stock(request):
         categorie_id = request.POST.get('categorie')
         fournisseur_id = request.POST.get('fournisseur')
         description = request.POST.get('description', '')
+        seuil_stock = _optional_threshold(request.POST.get('seuil_stock'))
         
         if edit_id:
             produit = get_object_or_404(Produit, id=edit_id)
@@ -382,6 +398,7 @@ def stock(request):
             produit.categorie_id = categorie_id
             produit.fournisseur_id = fournisseur_id
             produit.description = description
+            produit.seuil_stock = seuil_stock
             
             # Handle image upload for edit
             if 'image' in request.FILES:
@@ -397,7 +414,8 @@ def stock(request):
                     date_expiration=date_expiration,
                     categorie_id=categorie_id,
                     fournisseur_id=fournisseur_id,
-                    description=description
+                    description=description,
+                    seuil_stock=seuil_stock
                 )
                 
                 # Handle image upload for new product
@@ -412,41 +430,16 @@ def stock(request):
         return redirect('stock')
     elif request.method == 'GET' and 'edit' in request.GET:
         produit_to_edit = get_object_or_404(Produit, id=request.GET.get('edit'))
-        # Calculate statistics
-        from datetime import timedelta
-        from django.utils import timezone
-        low_stock_count = produits.filter(quantite__lte=10).count()
-        total_value = sum(float(p.prix) * p.quantite for p in produits)
-        thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-        expiring_soon_count = produits.filter(date_expiration__lte=thirty_days_from_now).count()
         
         return render(request, 'core/stock.html', {
-            'produits': produits,
+            'produits': lazy_keyset_paginate(request, produits),
             'categories': categories,
             'fournisseurs': fournisseurs,
             'edit_produit': produit_to_edit,
             'search_query': search_query,
-            'low_stock_count': low_stock_count,
-            'total_value': total_value,
-            'expiring_soon_count': expiring_soon_count,
+            **_stock_header_stats(produits, search_query),
+            **fragment_cache_context(),
         })
-    # Calculate statistics for the dashboard
-    from datetime import datetime, timedelta
-    from django.utils import timezone
-    
-    # Calculate total products count
-    total_products = produits.count()
-    
-    # Calculate low stock count (products with quantity <= 10)
-    low_stock_count = produits.filter(quantite__lte=10).count()
-    
-    # Calculate total inventory value
-    total_value = sum(float(p.prix) * p.quantite for p in produits)
-    
-    # Calculate expiring soon count (products expiring within 30 days)
-    thirty_days_from_now = timezone.now().date() + timedelta(days=30)
-    expiring_soon_count = produits.filter(date_expiration__lte=thirty_days_from_now).count()
-    
     # Calculate categories count
     categories_count = categories.count()
     
@@ -454,16 +447,14 @@ def stock(request):
     fournisseurs_count = fournisseurs.count()
     
     return render(request, 'core/stock.html', {
-        'produits': produits,
+        'produits': lazy_keyset_paginate(request, produits),
         'categories': categories,
         'fournisseurs': fournisseurs,
         'search_query': search_query,
-        'total_products': total_products,
-        'low_stock_count': low_stock_count,
-        'total_value': total_value,
-        'expiring_soon_count': expiring_soon_count,
+        **_stock_header_stats(produits, search_query),
         'categories_count': categories_count,
         'fournisseurs_count': fournisseurs_count,
+        **fragment_cache_context(),
     })
 
 @login_required(login_url='login')
@@ -477,12 +468,7 @@ def store(request):
     # Get all products
     qs = Produit.objects.select_related('categorie', 'fournisseur').all()
     
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(categorie__nom__icontains=search_query) |
-            models.Q(description__icontains=search_query)
-        )
+    qs = apply_search(qs, 'produit', search_query)
     
     produits = qs
     
@@ -539,17 +525,22 @@ def store(request):
     
     # Calculate some statistics for the dashboard
     total_products = produits.count()
-    low_stock_count = produits.filter(quantite__lt=10).count()
+    # Open low-stock alerts, like the stock page (per-product thresholds)
+    low_stock_alerts = open_alerts(StockAlert.LOW_STOCK)
+    if search_query:
+        low_stock_alerts = low_stock_alerts.filter(produit__in=produits.values('pk'))
+    low_stock_count = low_stock_alerts.count()
     
     # Get unique categories count
     categories_count = produits.values('categorie').distinct().count()
     
     context = {
-        'produits': produits,
+        'produits': lazy_keyset_paginate(request, produits),
         'search_query': search_query,
         'total_products': total_products,
         'low_stock_count': low_stock_count,
         'categories_count': categories_count,
+        **fragment_cache_context(),
     }
     
     return render(request, 'core/store.html', context)
@@ -558,22 +549,15 @@ def store(request):
 def logs(request):
     search_query = request.GET.get('search', '')
     qs = Log.objects.select_related('user').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(user__username__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(action__icontains=search_query) |
-            models.Q(description__icontains=search_query) |
-            models.Q(table_cible__icontains=search_query)
-        )
+    qs = apply_search(qs, 'log', search_query)
     
-    # Get logs with pagination (show latest 100 logs by default)
-    logs = qs[:100]
+    # Newest first; date_action ties broken by id for a stable order
+    logs = keyset_paginate(request, qs, ordering=('-date_action', '-id'))
     
     return render(request, 'core/logs.html', {
         'logs': logs,
-        'search_query': search_query
+        'search_query': search_query,
+        'log_buffer_stats': log_buffer.stats(),
     })
 
 @login_required(login_url='login')
@@ -581,13 +565,7 @@ def clients(request):
     from django.shortcuts import get_object_or_404
     search_query = request.GET.get('search', '')
     qs = Client.objects.all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(prenom__icontains=search_query) |
-            models.Q(telephone__icontains=search_query) |
-            models.Q(email__icontains=search_query)
-        )
+    qs = apply_search(qs, 'client', search_query)
     if request.method == 'POST':
         edit_id = request.POST.get('edit_id')
         if edit_id:
@@ -614,31 +592,45 @@ def clients(request):
     elif request.method == 'GET' and 'delete' in request.GET:
         client = get_object_or_404(Client, id=request.GET.get('delete'))
         client_name = f"{client.prenom} {client.nom}"
-        client.delete()
+        # Cascades: one rollup update for all the deleted rows
+        with transaction.atomic(), rollup_batch():
+            client.delete()
         
         # Log client deletion
         log_delete(request, 'Client', client.id, f"Client: {client_name}")
         return redirect('clients')
     elif request.method == 'GET' and 'edit' in request.GET:
-        all_clients = qs
+        all_clients = keyset_paginate(request, qs)
         client_to_edit = get_object_or_404(Client, id=request.GET.get('edit'))
         return render(request, 'core/clients.html', {'clients': all_clients, 'edit_client': client_to_edit, 'search_query': search_query})
-    all_clients = qs
+    all_clients = keyset_paginate(request, qs)
     return render(request, 'core/clients.html', {'clients': all_clients, 'search_query': search_query})
 
+# Charts of the report page: metric and default period (?periode= overrides)
+REPORT_CHARTS = (('reservations', 'day'), ('ventes', 'week'), ('animaux', 'month'))
+# Buckets shown per period (settings.REPORT_CHART_BUCKETS)
+DEFAULT_REPORT_CHART_BUCKETS = {'day': 90, 'week': 104, 'month': 36}
+
+def _report_charts(request):
+    """Chart data of the report page, read from the rollup tables (one range scan per chart)"""
+    from django.utils import timezone
+    buckets = getattr(settings, 'REPORT_CHART_BUCKETS', DEFAULT_REPORT_CHART_BUCKETS)
+    periode = request.GET.get('periode')
+    if periode not in buckets:
+        periode = None
+    today = timezone.localdate()
+    charts = []
+    for key, default in REPORT_CHARTS:
+        chart_periode = periode or default
+        charts.append(rollup_series(key, chart_periode, window_start(today, chart_periode, buckets[chart_periode]), today))
+    return {'charts': charts, 'chart_periode': periode or ''}
+
 @veterinarian_required
 def report(request):
     from django.shortcuts import get_object_or_404
     search_query = request.GET.get('search', '')
     qs = RapportEnvoye.objects.select_related('user').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(user__username__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(sujet__icontains=search_query) |
-            models.Q(destinataire__icontains=search_query)
-        )
+    qs = apply_search(qs, 'rapport', search_query)
     users = User.objects.all()
     if request.method == 'POST':
         edit_id = request.POST.get('edit_id')
@@ -675,19 +667,21 @@ def report(request):
         log_delete(request, 'RapportEnvoye', rapport.id, f"Report: {rapport_sujet}")
         return redirect('report')
     elif request.method == 'GET' and 'edit' in request.GET:
-        all_reports = qs
+        all_reports = keyset_paginate(request, qs)
         report_to_edit = get_object_or_404(RapportEnvoye, id=request.GET.get('edit'))
         return render(request, 'core/report.html', {
             'reports': all_reports,
             'edit_report': report_to_edit,
             'users': users,
-            'search_query': search_query
+            'search_query': search_query,
+            **_report_charts(request),
         })
-    all_reports = qs
+    all_reports = keyset_paginate(request, qs)
     return render(request, 'core/report.html', {
         'reports': all_reports,
         'users': users,
-        'search_query': search_query
+        'search_query': search_query,
+        **_report_charts(request),
     })
 
 @login_required(login_url='login')
@@ -695,14 +689,7 @@ def animals(request):
     from django.shortcuts import get_object_or_404
     search_query = request.GET.get('search', '')
     qs = Animal.objects.select_related('client').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(type__icontains=search_query) |
-            models.Q(race__icontains=search_query) |
-            models.Q(client__nom__icontains=search_query) |
-            models.Q(client__prenom__icontains=search_query)
-        )
+    qs = apply_search(qs, 'animal', search_query)
     clients = Client.objects.all()
     if request.method == 'POST':
         edit_id = request.POST.get('edit_id')
@@ -732,13 +719,15 @@ def animals(request):
     elif request.method == 'GET' and 'delete' in request.GET:
         animal = get_object_or_404(Animal, id=request.GET.get('delete'))
         animal_name = animal.nom
-        animal.delete()
+        # Cascades: one rollup update for all the deleted rows
+        with transaction.atomic(), rollup_batch():
+            animal.delete()
         
         # Log animal deletion
         log_delete(request, 'Animal', animal.id, f"Animal: {animal_name}")
         return redirect('animals')
     elif request.method == 'GET' and 'edit' in request.GET:
-        all_animals = qs
+        all_animals = keyset_paginate(request, qs)
         animal_to_edit = get_object_or_404(Animal, id=request.GET.get('edit'))
         return render(request, 'core/animals.html', {
             'animals': all_animals,
@@ -746,216 +735,256 @@ def animals(request):
             'clients': clients,
             'search_query': search_query
         })
-    all_animals = qs
+    all_animals = keyset_paginate(request, qs)
     return render(request, 'core/animals.html', {
         'animals': all_animals,
         'clients': clients,
         'search_query': search_query
     })
 
+class Echo:
+    """
+    File-like object whose write() returns what it was given, so csv.writer
+    can format rows for a streaming response
+    """
+    def write(self, value):
+        return value
+
+# Rows fetched per database round trip and rows sent per streamed chunk
+CSV_EXPORT_CHUNK_SIZE = 2000
+CSV_EXPORT_ROWS_PER_WRITE = 500
+
+def csv_streaming_response(filename, header, rows):
+    """
+    Stream a CSV download: the header goes out immediately, then the rows
+    are written in small chunks as the queryset iterator produces them, so
+    memory stays flat whatever the row count.
+    """
+    writer = csv.writer(Echo())
+
+    def stream():
+        yield writer.writerow(header)
+        chunk = []
+        for row in rows:
+            chunk.append(writer.writerow(row))
+            if len(chunk) >= CSV_EXPORT_ROWS_PER_WRITE:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+
+    response = StreamingHttpResponse(stream(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 @login_required(login_url='login')
 def export_clients_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="clients.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['First Name', 'Last Name', 'Phone', 'Email'])
-    
     search_query = request.GET.get('search', '')
     qs = Client.objects.all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(prenom__icontains=search_query) |
-            models.Q(telephone__icontains=search_query) |
-            models.Q(email__icontains=search_query)
-        )
+    qs = apply_search(qs, 'client', search_query)
     
-    for client in qs:
-        writer.writerow([client.prenom, client.nom, client.telephone, client.email])
+    rows = qs.order_by('id').values_list('prenom', 'nom', 'telephone', 'email').iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
     
     # Log export activity
     log_export(request, 'Client', 'CSV')
     
-    return response
+    return csv_streaming_response('clients.csv', ['First Name', 'Last Name', 'Phone', 'Email'], rows)
 
 @login_required(login_url='login')
 def export_animals_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="animals.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Type', 'Breed', 'Age', 'Client'])
-    
     search_query = request.GET.get('search', '')
-    qs = Animal.objects.select_related('client').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(type__icontains=search_query) |
-            models.Q(race__icontains=search_query) |
-            models.Q(client__nom__icontains=search_query) |
-            models.Q(client__prenom__icontains=search_query)
-        )
-    
-    for animal in qs:
-        writer.writerow([animal.nom, animal.type, animal.race, animal.age, f"{animal.client.prenom} {animal.client.nom}"])
+    qs = Animal.objects.all()
+    qs = apply_search(qs, 'animal', search_query)
+    
+    rows = (
+        [nom, type_, race, age, f"{client_prenom} {client_nom}"]
+        for nom, type_, race, age, client_prenom, client_nom in qs.order_by('id').values_list(
+            'nom', 'type', 'race', 'age', 'client__prenom', 'client__nom'
+        ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
     
     # Log export activity
     log_export(request, 'Animal', 'CSV')
     
-    return response
+    return csv_streaming_response('animals.csv', ['Name', 'Type', 'Breed', 'Age', 'Client'], rows)
 
 @login_required(login_url='login')
 def export_reservations_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="reservations.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Client', 'Animal', 'Date', 'Service', 'Status', 'Note'])
-    
     search_query = request.GET.get('search', '')
-    qs = Reservation.objects.select_related('client', 'animal').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(client__nom__icontains=search_query) |
-            models.Q(client__prenom__icontains=search_query) |
-            models.Q(animal__nom__icontains=search_query) |
-            models.Q(service__icontains=search_query) |
-            models.Q(statut__icontains=search_query)
-        )
-    
-    for reservation in qs:
-        writer.writerow([
-            f"{reservation.client.prenom} {reservation.client.nom}",
-            reservation.animal.nom,
-            reservation.date_reservation.strftime('%Y-%m-%d %H:%M'),
-            reservation.service,
-            reservation.statut,
-            reservation.note
-        ])
+    qs = Reservation.objects.all()
+    qs = apply_search(qs, 'reservation', search_query)
+    
+    rows = (
+        [
+            f"{client_prenom} {client_nom}",
+            animal_nom,
+            date_reservation.strftime('%Y-%m-%d %H:%M'),
+            service,
+            statut,
+            note
+        ]
+        for client_prenom, client_nom, animal_nom, date_reservation, service, statut, note in qs.order_by('id').values_list(
+            'client__prenom', 'client__nom', 'animal__nom', 'date_reservation', 'service', 'statut', 'note'
+        ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
     
     # Log export activity
     log_export(request, 'Reservation', 'CSV')
     
-    return response
+    return csv_streaming_response('reservations.csv', ['Client', 'Animal', 'Date', 'Service', 'Status', 'Note'], rows)
 
 @login_required(login_url='login')
 def export_products_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="products.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Name', 'Category', 'Quantity', 'Price', 'Expiration', 'Supplier'])
-    
     search_query = request.GET.get('search', '')
-    qs = Produit.objects.select_related('categorie', 'fournisseur').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(nom__icontains=search_query) |
-            models.Q(categorie__nom__icontains=search_query) |
-            models.Q(fournisseur__nom__icontains=search_query)
-        )
-    
-    for produit in qs:
-        writer.writerow([
-            produit.nom,
-            produit.categorie.nom,
-            produit.quantite,
-            produit.prix,
-            produit.date_expiration.strftime('%Y-%m-%d'),
-            produit.fournisseur.nom
-        ])
+    qs = Produit.objects.all()
+    qs = apply_search(qs, 'produit', search_query)
+    
+    rows = (
+        [nom, categorie_nom, quantite, prix, date_expiration.strftime('%Y-%m-%d'), fournisseur_nom]
+        for nom, categorie_nom, quantite, prix, date_expiration, fournisseur_nom in qs.order_by('id').values_list(
+            'nom', 'categorie__nom', 'quantite', 'prix', 'date_expiration', 'fournisseur__nom'
+        ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
     
     # Log export activity
     log_export(request, 'Produit', 'CSV')
     
-    return response
+    return csv_streaming_response('products.csv', ['Name', 'Category', 'Quantity', 'Price', 'Expiration', 'Supplier'], rows)
 
 @login_required(login_url='login')
 def export_logs_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="logs.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['User', 'Action', 'Description', 'Date', 'Table', 'Element ID', 'IP Address'])
+    """
+    Export logs as CSV. With ?include_archive=1 the archived logs are appended,
+    read straight from the archive files (optionally limited to
+    archive_start/archive_end, YYYY-MM-DD).
+    """
+    import itertools
+    from .log_archive import iter_archived_logs, parse_archive_day
     
     search_query = request.GET.get('search', '')
     qs = Log.objects.select_related('user').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(user__username__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(action__icontains=search_query) |
-            models.Q(description__icontains=search_query) |
-            models.Q(table_cible__icontains=search_query)
-        )
+    qs = apply_search(qs, 'log', search_query)
     
-    for log in qs:
-        user_name = log.user.get_full_name() if log.user else 'Anonymous'
-        writer.writerow([
-            user_name,
+    rows = (
+        [
+            log.user.get_full_name() if log.user else 'Anonymous',
             log.get_action_display(),
             log.description,
             log.date_action.strftime('%Y-%m-%d %H:%M'),
             log.table_cible or '',
             log.id_element or '',
             log.ip_address or ''
-        ])
+        ]
+        for log in qs.only(
+            'action', 'description', 'date_action', 'table_cible', 'id_element', 'ip_address',
+            'user__first_name', 'user__last_name'
+        ).iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
+    
+    if request.GET.get('include_archive'):
+        action_labels = dict(Log.ACTION_CHOICES)
+        archived = iter_archived_logs(
+            start=parse_archive_day(request.GET.get('archive_start')),
+            end=parse_archive_day(request.GET.get('archive_end')),
+            search_query=search_query,
+            newest_first=True,
+        )
+        rows = itertools.chain(rows, (
+            [
+                entry['user'] or 'Anonymous',
+                action_labels.get(entry['action'], entry['action']),
+                entry['description'],
+                entry['date_action'].strftime('%Y-%m-%d %H:%M'),
+                entry['table_cible'] or '',
+                entry['id_element'] or '',
+                entry['ip_address'] or ''
+            ]
+            for entry in archived
+        ))
     
     # Log export activity
     log_export(request, 'Log', 'CSV')
     
-    return response
+    return csv_streaming_response('logs.csv', ['User', 'Action', 'Description', 'Date', 'Table', 'Element ID', 'IP Address'], rows)
 
 @login_required(login_url='login')
 def export_reports_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="reports.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['User', 'Subject', 'Message', 'Date', 'Recipient'])
-    
     search_query = request.GET.get('search', '')
     qs = RapportEnvoye.objects.select_related('user').all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(user__username__icontains=search_query) |
-            models.Q(user__first_name__icontains=search_query) |
-            models.Q(user__last_name__icontains=search_query) |
-            models.Q(sujet__icontains=search_query) |
-            models.Q(destinataire__icontains=search_query)
-        )
+    qs = apply_search(qs, 'rapport', search_query)
     
-    for report in qs:
-        user_name = report.user.get_full_name() or report.user.username
-        writer.writerow([
-            user_name,
+    rows = (
+        [
+            (report.user.get_full_name() or report.user.username) if report.user else 'Anonymous',
             report.sujet,
             report.message,
             report.date_envoi.strftime('%Y-%m-%d %H:%M'),
             report.destinataire
-        ])
+        ]
+        for report in qs.order_by('id').iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE)
+    )
     
     # Log export activity
     log_export(request, 'RapportEnvoye', 'CSV')
     
-    return response
+    return csv_streaming_response('reports.csv', ['User', 'Subject', 'Message', 'Date', 'Recipient'], rows)
+
+# CSV Import Views
+def csv_import_response(request, importer_class, label):
+    """
+    Run a CSV import on the uploaded `file` and report the result as JSON:
+    created rows, rejected row count and the first errors by line number
+    """
+    if request.method != 'POST':
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid request method'
+        }, status=405)
+
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({
+            'success': False,
+            'message': 'No CSV file uploaded'
+        }, status=400)
+
+    importer = importer_class()
+    try:
+        report = importer.run(open_csv(upload.file))
+    except (ImportFormatError, UnicodeDecodeError) as e:
+        return JsonResponse({
+            'success': False,
+            'message': f'Import failed: {e}'
+        }, status=400)
+
+    # Log import activity
+    log_import(request, importer.model.__name__, report.created, report.error_count)
+
+    return JsonResponse({
+        'success': report.created > 0 or report.error_count == 0,
+        'message': f'Imported {report.created} {label}, {report.error_count} row(s) rejected',
+        **report.as_dict(),
+    })
+
+@login_required(login_url='login')
+def import_clients_csv(request):
+    return csv_import_response(request, ClientImporter, 'client(s)')
+
+@login_required(login_url='login')
+def import_animals_csv(request):
+    return csv_import_response(request, AnimalImporter, 'animal(s)')
+
+@assistant_required
+def import_products_csv(request):
+    return csv_import_response(request, ProduitImporter, 'product(s)')
 
 # User Management Views
 @admin_required
 def users(request):
     search_query = request.GET.get('search', '')
-    qs = User.objects.all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(username__icontains=search_query) |
-            models.Q(first_name__icontains=search_query) |
-            models.Q(last_name__icontains=search_query) |
-            models.Q(email__icontains=search_query) |
-            models.Q(profile__role__icontains=search_query)
-        )
+    # users.html shows each user's role and phone
+    qs = User.objects.select_related('profile')
+    qs = apply_search(qs, 'user', search_query)
     
     if request.method == 'POST':
         edit_id = request.POST.get('edit_id')
@@ -1038,75 +1067,268 @@ def users(request):
     elif request.method == 'GET' and 'edit' in request.GET:
         user_to_edit = get_object_or_404(User, id=request.GET.get('edit'))
         return render(request, 'core/users.html', {
-            'users': qs,
+            'users': keyset_paginate(request, qs),
             'edit_user': user_to_edit,
             'search_query': search_query,
             'role_choices': UserProfile.ROLE_CHOICES
         })
     
     return render(request, 'core/users.html', {
-        'users': qs,
+        'users': keyset_paginate(request, qs),
         'search_query': search_query,
         'role_choices': UserProfile.ROLE_CHOICES
     })
 
 @admin_required
 def export_users_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="users.csv"'
-    
-    writer = csv.writer(response)
-    writer.writerow(['Username', 'First Name', 'Last Name', 'Email', 'Role', 'Phone','password'])
-    
     search_query = request.GET.get('search', '')
-    qs = User.objects.all()
-    if search_query:
-        qs = qs.filter(
-            models.Q(username__icontains=search_query) |
-            models.Q(first_name__icontains=search_query) |
-            models.Q(last_name__icontains=search_query) |
-            models.Q(email__icontains=search_query) |
-            models.Q(profile__role__icontains=search_query)
-        )
-    
-    for user in qs:
-        role = user.profile.get_role_display() if hasattr(user, 'profile') else 'No Role'
-        phone = user.profile.phone if hasattr(user, 'profile') else ''
-        first_name = user.first_name if hasattr(user, 'first_name') else ''
-        last_name = user.last_name if hasattr(user, 'last_name') else ''
-        password = user.password if hasattr(user, 'password') else ''
-        username=user.username if hasattr(user, 'username') else ''
-        email=user.email if hasattr(user, 'email') else ''
-        writer.writerow([
-            username,
-            first_name,
-            last_name,
-            email,
-            role,
-            phone,
-            password,
-        ])
-    
-    return response
+    qs = User.objects.select_related('profile').all()
+    qs = apply_search(qs, 'user', search_query)
+    
+    def rows():
+        for user in qs.order_by('id').iterator(chunk_size=CSV_EXPORT_CHUNK_SIZE):
+            role = user.profile.get_role_display() if hasattr(user, 'profile') else 'No Role'
+            phone = user.profile.phone if hasattr(user, 'profile') else ''
+            yield [
+                user.username,
+                user.first_name,
+                user.last_name,
+                user.email,
+                role,
+                phone,
+                user.password,
+            ]
+    
+    return csv_streaming_response('users.csv', ['Username', 'First Name', 'Last Name', 'Email', 'Role', 'Phone','password'], rows())
+
+# Latest invoices listed on the invoice page
+RECENT_INVOICES = 20
+
+@admin_required
 def facture(request):
-    return render(request, 'core/facture.html')
+    # Invoices generated by the monthly batch (manage.py generate_invoices)
+    factures = Facture.objects.select_related('client')[:RECENT_INVOICES]
+    return render(request, 'core/facture.html', {'factures': factures})
+
+@login_required(login_url='login')
+def invoice_document(request, pk, fmt):
+    """
+    PDF or HTML rendering of an invoice, rendered first if it changed.
+    Admins see every invoice, other users only those of their own sales
+    (404 otherwise, so invoice numbers can't be probed).
+    """
+    if fmt not in ('pdf', 'html'):
+        raise Http404('Unknown invoice format')
+    factures = Facture.objects.all()
+    if not (request.user.is_superuser or get_user_role(request) == 'admin'):
+        factures = factures.filter(ventes__vendeur=request.user).distinct()
+    facture = ensure_rendered(get_object_or_404(factures, pk=pk))
+    name = facture.fichier_pdf if fmt == 'pdf' else facture.fichier_html
+    return FileResponse(
+        default_storage.open(name, 'rb'),
+        as_attachment=fmt == 'pdf',
+        filename=f'facture-{facture.numero}.{fmt}',
+        content_type='application/pdf' if fmt == 'pdf' else 'text/html; charset=utf-8',
+    )
+
+# Calendar colors per reservation status (mirrors the status badges of reservation.html)
+APPOINTMENT_STATUS_COLORS = {
+    'Scheduled': '#F39C12',
+    'Pending': '#F39C12',
+    'Confirmed': '#3498DB',
+    'Completed': '#27AE60',
+    'Cancelled': '#E74C3C',
+}
 
+def _parse_calendar_bound(value):
+    """
+    Parse a FullCalendar `start`/`end` parameter (ISO date or datetime)
+    into an aware datetime, or None if missing/invalid.
+    """
+    from django.utils import timezone
+    from django.utils.dateparse import parse_date, parse_datetime
+    from datetime import datetime
+
+    if not value:
+        return None
+    value = value.strip()
+    # '+' in the UTC offset may arrive decoded as a space
+    if 'T' in value and ' ' in value:
+        value = value.replace(' ', '+')
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                return None
+            parsed = datetime.combine(parsed_date, datetime.min.time())
+    except ValueError:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+@login_required(login_url='login')
 def all_appointments(request):
     """
-    This view returns all reservations in the JSON format required by FullCalendar.
+    This view returns the reservations in the JSON format required by FullCalendar.
+    Only the visible window (`start`/`end` query parameters) is loaded, and the
+    response carries a strong ETag so unchanged windows are answered with 304.
     """
-    all_reservations = Reservation.objects.all()
+    import hashlib
+    from django.http import HttpResponseNotModified
+
+    start = _parse_calendar_bound(request.GET.get('start'))
+    end = _parse_calendar_bound(request.GET.get('end'))
+
+    # Range query on the indexed (date_reservation, date_fin) columns, joined in one query;
+    # appointments started before the window but still running are included
+    qs = Reservation.objects.all()
+    if start and end:
+        qs = overlapping(start, end, qs)
+    elif start:
+        qs = qs.filter(date_fin__gt=start)
+    elif end:
+        qs = qs.filter(date_reservation__lt=end)
+    rows = qs.order_by('date_reservation', 'id').values_list(
+        'id', 'service', 'statut', 'date_reservation', 'date_fin',
+        'animal__nom', 'client__prenom', 'client__nom',
+    )
+
     # Format the data into a list of event objects
     event_list = []
-    for reservation in all_reservations:
+    for res_id, service, statut, date_reservation, date_fin, animal_nom, client_prenom, client_nom in rows:
         event_list.append({
-            'id': reservation.id,
-            'title': f"{reservation.service} - {reservation.animal.nom}",
-            'start': reservation.date_reservation.strftime('%Y-%m-%dT%H:%M:%S'),
-            'color': '#F39C12'  # Default color for scheduled or pending
+            'id': res_id,
+            'title': f"{service} - {animal_nom}",
+            'start': date_reservation.strftime('%Y-%m-%dT%H:%M:%S'),
+            'end': date_fin.strftime('%Y-%m-%dT%H:%M:%S'),
+            'color': APPOINTMENT_STATUS_COLORS.get(statut, '#F39C12'),
+            'extendedProps': {
+                'statut': statut,
+                'client': f"{client_prenom} {client_nom}",
+            },
         })
-        
-    return JsonResponse(event_list, safe=False)
+
+    payload = json.dumps(event_list, separators=(',', ':'))
+    etag = '"%s"' % hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    if etag in [tag.strip() for tag in if_none_match.split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(payload, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+# Bounds of the free_slots API
+FREE_SLOTS_DEFAULT_DAYS = 14
+FREE_SLOTS_MAX_COUNT = 100
+
+@login_required(login_url='login')
+def free_slots_api(request):
+    """
+    Next free appointment slots as JSON.
+    Query parameters: service and/or duration (minutes), start and end
+    (ISO date/datetime, default: now and FREE_SLOTS_DEFAULT_DAYS later),
+    count (default 10) and animal (also skips that animal's appointments).
+    """
+    from datetime import timedelta
+    from django.utils import timezone
+
+    service = request.GET.get('service', '')
+    try:
+        duration = clean_duration(request.GET.get('duration'), service)
+        count = max(1, min(int(request.GET.get('count') or 10), FREE_SLOTS_MAX_COUNT))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    start = _parse_calendar_bound(request.GET.get('start')) or timezone.now()
+    end = _parse_calendar_bound(request.GET.get('end')) or start + timedelta(days=FREE_SLOTS_DEFAULT_DAYS)
+    if end <= start:
+        return JsonResponse({'error': 'end must be after start.'}, status=400)
+
+    slots = free_slots(start, end, duration, count=count, animal_id=request.GET.get('animal') or None)
+    return JsonResponse({
+        'service': service,
+        'duration_minutes': duration,
+        'slots': [
+            {
+                'start': timezone.localtime(slot_start).isoformat(),
+                'end': timezone.localtime(slot_end).isoformat(),
+                # datetime-local input value and display label
+                'local': timezone.localtime(slot_start).strftime('%Y-%m-%dT%H:%M'),
+                'label': timezone.localtime(slot_start).strftime('%d/%m %H:%M'),
+            }
+            for slot_start, slot_end in slots
+        ],
+    })
+
+# Products returned by the forecast API (most urgent first)
+FORECAST_DEFAULT_LIMIT = 100
+FORECAST_MAX_LIMIT = 5000
+
+@assistant_required
+def forecast_api(request):
+    """
+    Stock forecast as JSON: days until stockout and suggested orders per
+    product and supplier (see core/forecasting.py). Query parameters:
+    supplier (id), reorder (1: only the products to reorder) and limit.
+    """
+    try:
+        supplier_id = int(request.GET['supplier']) if request.GET.get('supplier') else None
+        limit = max(1, min(int(request.GET.get('limit') or FORECAST_DEFAULT_LIMIT), FORECAST_MAX_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'supplier and limit must be integers.'}, status=400)
+    try:
+        result = forecast(supplier_id=supplier_id, reorder_only=request.GET.get('reorder') == '1', limit=limit)
+    except ForecastUnavailable as e:
+        return JsonResponse({'error': str(e)}, status=503)
+    return JsonResponse(result)
+
+@login_required(login_url='login')
+def checkout_api(request):
+    """
+    Sell the store cart, posted as JSON: {"items": [{"id", "quantity"}],
+    "client_id", "invoice"}. Stock is decremented atomically (see
+    core/sales.py); an oversold cart is rejected with 409 and its shortages.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'message': 'Invalid request method'}, status=405)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Invalid JSON body'}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'message': 'The body must be a JSON object'}, status=400)
+
+    try:
+        vente = checkout(
+            data.get('items'),
+            vendeur=request.user,
+            client_id=data.get('client_id') or None,
+            invoice=bool(data.get('invoice')),
+        )
+    except CheckoutError as e:
+        return JsonResponse({
+            'success': False,
+            'message': str(e),
+            'shortages': e.shortages,
+        }, status=409 if e.shortages else 400)
+    except OperationalError as e:
+        # SQLite: another checkout held the write lock past the timeout
+        return JsonResponse({'success': False, 'message': f'Store busy, please retry ({e})'}, status=503)
+
+    log_create(request, 'Vente', vente.pk, f"{vente.total} MAD")
+    lignes = list(vente.lignes.values_list('produit_id', 'produit__quantite'))
+    return JsonResponse({
+        'success': True,
+        'message': f'Sale #{vente.pk} recorded',
+        'vente_id': vente.pk,
+        'total': str(vente.total),
+        'stock': {produit_id: quantite for produit_id, quantite in lignes},
+        'facture_url': reverse('invoice_document', args=[vente.facture_id, 'pdf']) if vente.facture_id else None,
+    })
 
 @login_required
 def delete_category(request, category_id):
@@ -1186,50 +1408,74 @@ def delete_supplier(request, supplier_id):
         'message': 'Invalid request method'
     }, status=405)
 
-@login_required(login_url='login')
-def bulk_delete_clients(request):
+# Rows deleted per DELETE statement (cascades included) by the bulk delete views
+BULK_DELETE_BATCH_SIZE = 500
+
+def bulk_delete_response(request, queryset, ids_key, model_name, label, display_fields, describe):
     """
-    Bulk delete multiple clients via AJAX request
+    Set-based bulk delete of the ids posted as JSON under `ids_key`.
+
+    Everything runs in one transaction: one joined values() query fetches the
+    display data, the audit rows are written with one bulk_create and the rows
+    are deleted BULK_DELETE_BATCH_SIZE at a time. The response carries counts.
     """
     if request.method == 'POST':
         try:
             data = json.loads(request.body)
-            client_ids = data.get('client_ids', [])
+            posted = data.get(ids_key, [])
             
-            if not client_ids:
+            if not posted:
                 return JsonResponse({
                     'success': False,
-                    'message': 'No clients selected for deletion'
+                    'message': f'No {label} selected for deletion'
                 }, status=400)
             
-            # Get the clients to delete
-            clients_to_delete = Client.objects.filter(id__in=client_ids)
-            
-            if not clients_to_delete.exists():
+            # Ids may be posted as numbers or numeric strings: compare them as ints
+            if not isinstance(posted, list) or not all(
+                (isinstance(value, int) and not isinstance(value, bool))
+                or (isinstance(value, str) and value.strip().isdecimal())
+                for value in posted
+            ):
                 return JsonResponse({
                     'success': False,
-                    'message': 'No valid clients found for deletion'
+                    'message': f'Invalid {label} ids'
                 }, status=400)
+            ids = {int(value) for value in posted}
             
-            # Log the deletion of each client
-            deleted_clients = []
-            for client in clients_to_delete:
-                client_name = f"{client.prenom} {client.nom}"
-                deleted_clients.append(client_name)
-                log_delete(request, 'Client', client.id, f"Client: {client_name}")
-            
-            # Delete all selected clients
-            clients_to_delete.delete()
+            with transaction.atomic(), rollup_batch():
+                rows = list(queryset.filter(id__in=ids).values('id', *display_fields))
+                
+                if not rows:
+                    return JsonResponse({
+                        'success': False,
+                        'message': f'No valid {label} found for deletion'
+                    }, status=400)
+                
+                # Log the deletion of each row (one INSERT for all of them)
+                log_bulk_delete(request, model_name, [(row['id'], describe(row)) for row in rows])
+                
+                # Delete in bounded batches; cascades are counted per model
+                deleted_ids = [row['id'] for row in rows]
+                deleted_by_model = {}
+                for start in range(0, len(deleted_ids), BULK_DELETE_BATCH_SIZE):
+                    _, counts = queryset.model.objects.filter(
+                        id__in=deleted_ids[start:start + BULK_DELETE_BATCH_SIZE]
+                    ).delete()
+                    for model_label, count in counts.items():
+                        deleted_by_model[model_label] = deleted_by_model.get(model_label, 0) + count
             
             return JsonResponse({
                 'success': True,
-                'message': f'Successfully deleted {len(deleted_clients)} client(s): {", ".join(deleted_clients)}'
+                'message': f'Successfully deleted {len(rows)} {label}',
+                'deleted': len(rows),
+                'not_found': len(ids) - len(rows),
+                'deleted_by_model': deleted_by_model,
             })
             
         except Exception as e:
             return JsonResponse({
                 'success': False,
-                'message': f'Error deleting clients: {str(e)}'
+                'message': f'Error deleting {label}: {str(e)}'
             }, status=500)
     
     return JsonResponse({
@@ -1237,107 +1483,36 @@ def bulk_delete_clients(request):
         'message': 'Invalid request method'
     }, status=405)
 
+@login_required(login_url='login')
+def bulk_delete_clients(request):
+    """
+    Bulk delete multiple clients via AJAX request
+    """
+    return bulk_delete_response(
+        request, Client.objects.all(), 'client_ids', 'Client', 'client(s)',
+        ('prenom', 'nom'),
+        lambda row: f"Client: {row['prenom']} {row['nom']}",
+    )
 
 @login_required(login_url='login')
 def bulk_delete_animals(request):
     """
     Bulk delete multiple animals via AJAX request
     """
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            animal_ids = data.get('animal_ids', [])
-            
-            if not animal_ids:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'No animals selected for deletion'
-                }, status=400)
-            
-            # Get the animals to delete
-            animals_to_delete = Animal.objects.filter(id__in=animal_ids)
-            
-            if not animals_to_delete.exists():
-                return JsonResponse({
-                    'success': False,
-                    'message': 'No valid animals found for deletion'
-                }, status=400)
-            
-            # Log the deletion of each animal
-            deleted_animals = []
-            for animal in animals_to_delete:
-                animal_name = animal.nom
-                deleted_animals.append(animal_name)
-                log_delete(request, 'Animal', animal.id, f"Animal: {animal_name}")
-            
-            # Delete all selected animals
-            animals_to_delete.delete()
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'Successfully deleted {len(deleted_animals)} animal(s): {", ".join(deleted_animals)}'
-            })
-            
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'message': f'Error deleting animals: {str(e)}'
-            }, status=500)
-    
-    return JsonResponse({
-        'success': False,
-        'message': 'Invalid request method'
-    }, status=405)
-
+    return bulk_delete_response(
+        request, Animal.objects.all(), 'animal_ids', 'Animal', 'animal(s)',
+        ('nom',),
+        lambda row: f"Animal: {row['nom']}",
+    )
 
 @login_required(login_url='login')
 def bulk_delete_reservations(request):
     """
     Bulk delete multiple reservations via AJAX request
     """
-    if request.method == 'POST':
-        try:
-            data = json.loads(request.body)
-            reservation_ids = data.get('reservation_ids', [])
-            
-            if not reservation_ids:
-                return JsonResponse({
-                    'success': False,
-                    'message': 'No reservations selected for deletion'
-                }, status=400)
-            
-            # Get the reservations to delete
-            reservations_to_delete = Reservation.objects.filter(id__in=reservation_ids)
-            
-            if not reservations_to_delete.exists():
-                return JsonResponse({
-                    'success': False,
-                    'message': 'No valid reservations found for deletion'
-                }, status=400)
-            
-            # Log the deletion of each reservation
-            deleted_reservations = []
-            for reservation in reservations_to_delete:
-                reservation_info = f"{reservation.client.prenom} {reservation.client.nom} - {reservation.animal.nom}"
-                deleted_reservations.append(reservation_info)
-                log_delete(request, 'Reservation', reservation.id, f"Reservation: {reservation_info}")
-            
-            # Delete all selected reservations
-            reservations_to_delete.delete()
-            
-            return JsonResponse({
-                'success': True,
-                'message': f'Successfully deleted {len(deleted_reservations)} reservation(s): {", ".join(deleted_reservations)}'
-            })
-            
-        except Exception as e:
-            return JsonResponse({
-                'success': False,
-                'message': f'Error deleting reservations: {str(e)}'
-            }, status=500)
-    
-    return JsonResponse({
-        'success': False,
-        'message': 'Invalid request method'
-    }, status=405)
+    return bulk_delete_response(
+        request, Reservation.objects.all(), 'reservation_ids', 'Reservation', 'reservation(s)',
+        ('client__prenom', 'client__nom', 'animal__nom'),
+        lambda row: f"Reservation: {row['client__prenom']} {row['client__nom']} - {row['animal__nom']}",
+    )
 
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
+import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +36,9 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 # Optional: reduce cookie age just in case
 SESSION_COOKIE_AGE = 420  # 5 min max session
 
+# Sessions are read from the cache and only hit the database when written
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 
 
 # Application definition
@@ -49,7 +54,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticAssetsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -64,7 +71,8 @@ ROOT_URLCONF = 'veterinaire_gestion.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates timing renders for RequestMetricsMiddleware
+        'BACKEND': 'core.metrics.InstrumentedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -72,6 +80,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.user_permissions',
             ],
         },
     },
@@ -87,10 +96,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Concurrent writers (store checkouts): WAL lets pages read during a
+        # write, IMMEDIATE transactions queue for the write lock up to
+        # `timeout` seconds instead of failing with "database is locked"
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+        },
     }
 }
 
 
+# Cache shared by every worker process: the dashboard stats snapshot, the
+# fragment generations and the user role versions are invalidated through
+# it, so a per-process cache would serve stale data from the other workers.
+# Redis (REDIS_URL, needs the redis package) when set, across hosts; else a
+# file cache, shared by the workers of this host. The test runner keeps a
+# per-process memory cache.
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    }
+elif os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': BASE_DIR / 'cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        },
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -131,13 +175,65 @@ STATICFILES_DIRS = [
     BASE_DIR / "core/static",
 ]
 
+# manage.py collectstatic minifies the CSS/JS, copies them under
+# content-hashed names (staticfiles.json manifest, used by {% static %}) and
+# writes .gz/.br variants (STATIC_BROTLI, see core/staticfiles.py);
+# core.middleware.StaticAssetsMiddleware serves STATIC_ROOT with immutable
+# cache headers for the hashed names.
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'core.staticfiles.CompressedManifestStaticFilesStorage',
+    },
+}
+
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Build the product image renditions inline instead of in background
+# threads (see core/images.py) under the test runner
+IMAGE_PROCESSING_SYNC = 'test' in sys.argv
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# The tunables of the core modules (page sizes, log buffer, scheduling,
+# stock alerts, forecasting, invoicing, cache lifetimes, log retention...)
+# default to the DEFAULT_* constants of their module; only the values that
+# differ are set here.
+
+# Write each activity log entry immediately instead of buffering it (see
+# core/logbuffer.py) under the test runner
+LOG_BUFFER_SYNC = 'test' in sys.argv
+
+# Page views: 'full' writes one Log row per authenticated page view,
+# 'aggregate' counts them per user / view / PAGE_VIEW_BUCKET_SECONDS bucket
+# (PageViewCount) and logs only PAGE_VIEW_SAMPLE_RATE of them in full.
+# Logins, CRUD and exports are always logged in full.
+ACTIVITY_LOG_PAGE_VIEWS = 'aggregate'
+PAGE_VIEW_SAMPLE_RATE = 0.05
+
+# Per-request metrics (core.middleware.RequestMetricsMiddleware): SQL query
+# count, DB, template and total time are sent as a Server-Timing header;
+# requests over either budget are logged to 'core.perf' with their SQL.
+PERF_QUERY_BUDGET = 50
+PERF_TIME_BUDGET_MS = 500
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.perf': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}